@@ -1,14 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
+import logging
 import os
-from backend.database import Base, engine
+from backend.database import Base, SessionLocal, engine
+from backend.migrations import run_migrations
+from backend.services.nutrient_rollup import run_periodic_check
+from backend.utils.label_map import label_food_map
+from backend.utils.model_config import MODEL_WARMUP
+from backend.utils.model_registry import inference_registry
 import backend.models  
-from backend.routes import auth, food_upload, report, dashboard 
+from backend.routes import admin, auth, food_upload, report, dashboard 
 try:
     from backend.routes import recommend as recommend_router
 except ImportError:
     from backend.routes import recommend_route as recommend_router
 
+logger = logging.getLogger(__name__)
+
+# 0 이면 시작 시 마이그레이션을 건너뛴다 (배포 단계에서 python -m backend.migrations 를 한 번 실행)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") != "0"
+
 
 app = FastAPI(
     title="FoodRec API",
@@ -18,6 +31,8 @@ app = FastAPI(
 )
 
 Base.metadata.create_all(bind=engine)
+if MIGRATE_ON_STARTUP:
+    run_migrations(engine)   # 워커 여러 개면 GET_LOCK 으로 하나씩 (migrations.py)
 
 origins_env = os.getenv("FRONT_ORIGINS", "*")  
 allow_origins = (
@@ -37,8 +52,47 @@ app.include_router(food_upload.router)
 app.include_router(dashboard.router)            
 app.include_router(recommend_router.router)      
 app.include_router(report.router)
+app.include_router(admin.router)
+
+
+@app.on_event("startup")
+def warmup_models():
+    # torch/모델 로딩은 백그라운드 스레드에서 → 서버는 바로 요청을 받는다
+    if MODEL_WARMUP:
+        inference_registry.start_background()
+
+
+@app.on_event("startup")
+async def start_upload_workers():
+    # async 업로드 워커 (DB upload_jobs). 재시작 전에 대기 중이던 작업이나 다른 워커가 넣은 작업도 가져가 실행
+    food_upload.upload_jobs.start()
+
+
+@app.on_event("startup")
+async def start_rollup_check():
+    # daily_nutrient_rollup 이 food_logs 원본 집계와 맞는지 주기 점검 (ROLLUP_VERIFY_INTERVAL, 0 이면 끔)
+    app.state.rollup_check = asyncio.create_task(run_periodic_check(SessionLocal))
+
+
+@app.on_event("startup")
+def build_label_map():
+    # 분류기 라벨 → foods 해석표 (해석 안 된 라벨은 로그로). 실패해도 업로드는 이름 매칭으로 동작
+    db = SessionLocal()
+    try:
+        label_food_map.rebuild(db)
+    except Exception:
+        logger.exception("[label_map] 해석표 생성 실패 (업로드 시 이름 매칭으로 대체)")
+    finally:
+        db.close()
 
 
 @app.get("/")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """ML 모델 준비 상태 (+ 단계별 import/로딩 시간). 준비 전이면 503"""
+    snap = inference_registry.snapshot()
+    return JSONResponse(snap, status_code=200 if inference_registry.ready else 503)
@@ -0,0 +1,209 @@
+"""
+스키마 마이그레이션 (create_all 이 하지 못하는 테이블 / 인덱스 / 제약 / 데이터 정리)
+
+- 적용 기록은 schema_migrations 테이블. run_migrations() 는 아직 적용되지 않은 단계만 순서대로 실행한다.
+- 서버 시작 시 main.py 가 create_all 다음에 호출한다 (MIGRATE_ON_STARTUP=0 이면 건너뜀 → 배포 단계에서 아래 수동 실행).
+- 워커 여러 개가 동시에 시작해도 MySQL GET_LOCK 으로 한 번에 하나만 실행하고,
+  잠금을 얻은 뒤 적용 기록을 다시 읽어 먼저 끝낸 워커가 적용한 단계는 건너뛴다.
+- 각 단계는 이미 적용된 상태(인덱스 존재 등)를 확인하고 실행하므로 기록이 없어도 다시 돌려도 안전하다.
+
+수동 실행:
+    python -m backend.migrations           # 미적용 단계 실행
+    python -m backend.migrations --list    # 단계별 적용 여부
+"""
+from __future__ import annotations
+import argparse
+import os
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.database import engine as default_engine
+
+# 워커 간 직렬화용 MySQL named lock (GET_LOCK 은 연결 단위)
+MIGRATION_LOCK = "foodrec_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))   # 초
+
+
+# =========================
+#  helpers
+# =========================
+def _has_table(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = :t
+    """), {"t": table}).scalar())
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return bool(conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = :t AND column_name = :c
+    """), {"t": table, "c": column}).scalar())
+
+
+def _has_index(conn: Connection, table: str, index: str) -> bool:
+    return bool(conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = :t AND index_name = :i
+    """), {"t": table, "i": index}).scalar())
+
+
+# =========================
+#  단계들
+# =========================
+def _m0001_idempotency_keys(conn: Connection) -> None:
+    """Idempotency-Key 저장 테이블 (models/idempotency.py)"""
+    from backend.models.idempotency import IdempotencyKey
+
+    IdempotencyKey.__table__.create(conn, checkfirst=True)
+
+
+def _m0002_daily_plan_unique(conn: Connection) -> None:
+    """
+    daily_plan (user_id, plan_date) UNIQUE — 업로드의 daily_plan 생성을 INSERT ... ON DUPLICATE KEY 한 문장으로
+    동시 업로드가 read-then-insert 로 같은 날 plan 을 여러 개 만들었을 수 있으므로 먼저 정리한다 (id 가 가장 작은 행 유지).
+    """
+    if not _has_table(conn, "daily_plan") or _has_index(conn, "daily_plan", "uq_daily_plan_user_date"):
+        return
+    dup = conn.execute(text("""
+        SELECT COUNT(*) FROM (
+            SELECT user_id, plan_date FROM daily_plan
+            GROUP BY user_id, plan_date HAVING COUNT(*) > 1
+        ) d
+    """)).scalar()
+    if dup:
+        if not _has_column(conn, "daily_plan", "id"):
+            raise RuntimeError(
+                f"daily_plan 에 (user_id, plan_date) 중복이 {dup}건 있습니다. 정리 후 다시 실행하세요."
+            )
+        conn.execute(text("""
+            DELETE d1 FROM daily_plan d1
+            JOIN daily_plan d2
+              ON d1.user_id = d2.user_id AND d1.plan_date = d2.plan_date AND d1.id > d2.id
+        """))
+        print(f"[migrations] daily_plan 중복 {dup}건 정리")
+    conn.execute(text("ALTER TABLE daily_plan ADD UNIQUE KEY uq_daily_plan_user_date (user_id, plan_date)"))
+
+
+def _m0003_foods_updated_at(conn: Connection) -> None:
+    """foods.updated_at (+ 인덱스) — nutrition_matcher 의 이름 인덱스가 바뀐 행만 다시 읽도록"""
+    if not _has_table(conn, "foods"):
+        return
+    if not _has_column(conn, "foods", "updated_at"):
+        conn.execute(text("""
+            ALTER TABLE foods ADD COLUMN updated_at DATETIME NOT NULL
+                DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """))
+    if not _has_index(conn, "foods", "ix_foods_updated_at"):
+        conn.execute(text("CREATE INDEX ix_foods_updated_at ON foods (updated_at)"))
+
+
+def _m0004_daily_nutrient_rollup(conn: Connection) -> None:
+    """daily_nutrient_rollup 생성 + 지금까지의 food_logs 로 백필 (이후는 기록 시점에 같이 갱신)"""
+    import backend.models.user  # noqa: F401  (users.id FK 해석용)
+    from backend.models.nutrient_rollup import DailyNutrientRollup
+    from backend.services.nutrient_rollup import backfill
+
+    DailyNutrientRollup.__table__.create(conn, checkfirst=True)
+    if _has_table(conn, "food_logs"):
+        print(f"[migrations] daily_nutrient_rollup 백필 {backfill(conn)}행")
+
+
+_FOOD_LOG_INDEXES = {
+    "ix_food_logs_user_consumed": "(user_id, consumed_at)",
+    "ix_food_logs_user_meal_consumed": "(user_id, meal_index, consumed_at)",
+}
+
+
+def _m0005_food_logs_indexes(conn: Connection) -> None:
+    """
+    food_logs 복합 인덱스 (PK 만 있어 사용자 기간 조회가 전체 스캔이었음)
+    조회는 DATE(consumed_at) 대신 consumed_at >= :start AND consumed_at < :end 반열림 구간으로 쓴다.
+    확인: python -m backend.query_plans
+    """
+    if not _has_table(conn, "food_logs"):
+        return
+    for name, cols in _FOOD_LOG_INDEXES.items():
+        if not _has_index(conn, "food_logs", name):
+            conn.execute(text(f"CREATE INDEX {name} ON food_logs {cols}"))
+            print(f"[migrations] food_logs 인덱스 {name} {cols}")
+
+
+def _m0006_upload_jobs(conn: Connection) -> None:
+    """async 업로드 작업 표 (models/upload_job.py) — 워커 프로세스 간 작업 / 결과 공유"""
+    from backend.models.upload_job import UploadJob
+
+    UploadJob.__table__.create(conn, checkfirst=True)
+
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_idempotency_keys", _m0001_idempotency_keys),
+    ("0002_daily_plan_unique_user_date", _m0002_daily_plan_unique),
+    ("0003_foods_updated_at", _m0003_foods_updated_at),
+    ("0004_daily_nutrient_rollup", _m0004_daily_nutrient_rollup),
+    ("0005_food_logs_indexes", _m0005_food_logs_indexes),
+    ("0006_upload_jobs", _m0006_upload_jobs),
+]
+
+
+# =========================
+#  실행
+# =========================
+def _applied(eng: Engine) -> List[str]:
+    with eng.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name VARCHAR(128) NOT NULL PRIMARY KEY,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        return [r[0] for r in conn.execute(text("SELECT name FROM schema_migrations"))]
+
+
+def run_migrations(eng: Optional[Engine] = None) -> List[str]:
+    """
+    미적용 단계를 순서대로 실행 → 이번에 적용한 단계 이름 목록
+    MIGRATION_LOCK 을 잡은 동안만 실행한다 (잠금 전용 연결을 끝까지 열어 둠).
+    MIGRATION_LOCK_TIMEOUT 안에 잠금을 못 얻으면 RuntimeError
+    """
+    eng = eng or default_engine
+    with eng.connect() as lock_conn:
+        got = lock_conn.execute(
+            text("SELECT GET_LOCK(:n, :t)"), {"n": MIGRATION_LOCK, "t": MIGRATION_LOCK_TIMEOUT}
+        ).scalar()
+        if got != 1:
+            raise RuntimeError(f"[migrations] {MIGRATION_LOCK_TIMEOUT}초 안에 마이그레이션 잠금을 얻지 못했습니다.")
+        try:
+            # 잠금을 기다리는 동안 다른 워커가 적용했을 수 있으므로 잠금을 얻은 뒤에 읽는다
+            done = set(_applied(eng))
+            ran: List[str] = []
+            for name, step in MIGRATIONS:
+                if name in done:
+                    continue
+                with eng.begin() as conn:
+                    step(conn)
+                    conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:n)"), {"n": name})
+                print(f"[migrations] applied {name}")
+                ran.append(name)
+            return ran
+        finally:
+            lock_conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": MIGRATION_LOCK})
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="DB 스키마 마이그레이션")
+    ap.add_argument("--list", action="store_true", help="단계별 적용 여부만 출력")
+    args = ap.parse_args(argv)
+    if args.list:
+        done = set(_applied(default_engine))
+        for name, _ in MIGRATIONS:
+            print(f"{'x' if name in done else ' '} {name}")
+        return
+    ran = run_migrations()
+    print(f"[migrations] {len(ran)}개 적용" if ran else "[migrations] 최신 상태")
+
+
+if __name__ == "__main__":
+    main()
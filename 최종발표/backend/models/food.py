@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DECIMAL
+from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, DateTime, text
 from backend.database import Base
 
 class Food(Base):
@@ -16,3 +16,8 @@ class Food(Base):
     sodium_mg    = Column(DECIMAL(10,2))
     fiber_g      = Column(DECIMAL(10,2))
     is_active    = Column(Boolean, nullable=False, default=True)
+    # 변경 시각 (raw SQL UPDATE 도 MySQL 이 갱신) — 음식 이름 인덱스의 증분 갱신 기준
+    updated_at   = Column(
+        DateTime, nullable=False, index=True,
+        server_default=text("CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+    )
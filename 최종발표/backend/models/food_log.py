@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from backend.database import Base
 
 class FoodLog(Base):
     __tablename__ = "food_logs"
+    __table_args__ = (
+        # 사용자별 기간 조회 (consumed_at 반열림 구간) / 끼니별 기간 조회 — migrations 0005
+        Index("ix_food_logs_user_consumed", "user_id", "consumed_at"),
+        Index("ix_food_logs_user_meal_consumed", "user_id", "meal_index", "consumed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, func
+from backend.database import Base
+
+class IdempotencyKey(Base):
+    """Idempotency-Key 헤더 → 처음 요청의 응답 (TTL 동안 재요청은 저장된 응답을 그대로 돌려준다)"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("username", "idem_key", name="uq_idem_user_key"),)
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String(50), nullable=False)
+    idem_key = Column(String(128), nullable=False)
+    request_hash = Column(String(64), nullable=False)   # 같은 키로 다른 요청이 오면 거절
+    status_code = Column(Integer, nullable=True)        # NULL = 처리 중
+    response = Column(Text(length=2**24), nullable=True)  # {"body": ..., "headers": ...} JSON (MEDIUMTEXT)
+    created_at = Column(DateTime(timezone=False), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=False), nullable=False, index=True)
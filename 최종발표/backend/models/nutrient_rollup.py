@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Date, DateTime, DECIMAL, ForeignKey, func
+from backend.database import Base
+
+class DailyNutrientRollup(Base):
+    """
+    (user_id, 날짜, 끼니) 별 섭취 영양 합 — food_logs 를 쓰는 트랜잭션 안에서 같이 갱신한다
+    (services/nutrient_rollup.py). 대시보드 / 추천 / 리포트는 food_logs × foods 대신 이 표를 읽는다.
+    """
+    __tablename__ = "daily_nutrient_rollup"
+
+    user_id    = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    log_date   = Column(Date, primary_key=True)
+    meal_index = Column(Integer, primary_key=True)   # 1=아침, 2=점심, 3=저녁, 4=간식
+    kcal       = Column(DECIMAL(12,3), nullable=False, default=0)
+    protein_g  = Column(DECIMAL(12,3), nullable=False, default=0)
+    fat_g      = Column(DECIMAL(12,3), nullable=False, default=0)
+    carb_g     = Column(DECIMAL(12,3), nullable=False, default=0)
+    sugar_g    = Column(DECIMAL(12,3), nullable=False, default=0)
+    sodium_mg  = Column(DECIMAL(12,3), nullable=False, default=0)
+    fiber_g    = Column(DECIMAL(12,3), nullable=False, default=0)
+    log_count  = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=False), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Float, LargeBinary, String, Text
+from backend.database import Base
+
+class UploadJob(Base):
+    """
+    async 업로드 작업 (utils/jobs.py). 워커 프로세스가 여러 개여도 같은 표를 보고
+    상태 / 진행 이벤트 / 결과를 공유하고, 대기 중인 작업은 어느 워커든 가져가 실행한다.
+    시각은 epoch 초 (워커 서버 간 시계는 NTP 로 맞춰 둔다)
+    """
+    __tablename__ = "upload_jobs"
+
+    id           = Column(String(32), primary_key=True)
+    dedup_key    = Column(String(64), nullable=True, unique=True)   # sha256(dedup key). failed 면 NULL (재시도 허용)
+    status       = Column(String(16), nullable=False, default="queued", index=True)  # queued → running → done | failed
+    stage        = Column(String(32), nullable=False, default="queued")
+    params       = Column(Text, nullable=True)                      # handler 인자 JSON (끝나면 비움)
+    data         = Column(LargeBinary(length=2**24), nullable=True) # 원본 바이트 (MEDIUMBLOB, 끝나면 비움)
+    events       = Column(Text(length=2**24), nullable=False)       # 진행 이벤트 JSON 목록
+    result       = Column(Text(length=2**24), nullable=True)        # done 응답 JSON
+    error        = Column(Text, nullable=True)                      # failed: {status_code, detail, headers} JSON
+    owner        = Column(String(64), nullable=True)                # 실행 중인 워커 (host:pid)
+    created_at   = Column(Float, nullable=False)
+    heartbeat_at = Column(Float, nullable=True)                     # running 동안 주기적으로 갱신
+    finished_at  = Column(Float, nullable=True)
+    expires_at   = Column(Float, nullable=True, index=True)         # finished_at + TTL
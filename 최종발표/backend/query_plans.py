@@ -0,0 +1,152 @@
+"""
+자주 도는 조회의 실행 계획 확인 (EXPLAIN)
+
+대시보드 / 추천 / 리포트 / 업로드 응답이 매번 실행하는 SQL 을 서비스 모듈의 상수 그대로 EXPLAIN 해서
+테이블 전체를 읽는(type=ALL) 조회가 있으면 실패(exit 1)한다.
+  - food_logs / daily_nutrient_rollup (WATCHED_TABLES) : type=ALL 이면 무조건 실패
+  - 그 밖의 테이블 : 사용할 인덱스(possible_keys)가 없을 때만 실패, 있으면 경고 (--strict 면 실패)
+SQL 의 별칭(fl, r 등)은 FROM / JOIN 절에서 실제 테이블 이름으로 바꿔 판단한다.
+
+    python -m backend.query_plans                 # 기본 점검
+    python -m backend.query_plans --strict        # 모든 테이블에서 type=ALL 이면 실패
+    python -m backend.query_plans --user alice    # 이 사용자 기준 파라미터로 (기본: 첫 사용자)
+
+작은 개발 DB 에서는 옵티마이저가 전체 스캔을 고를 수 있으므로 CI 는 시드한 DB 에 대고 돌린다:
+    QUERY_PLANS_DB_URL=mysql+pymysql://.../foodrec_test python -m pytest backend/tests/test_query_plans.py
+"""
+from __future__ import annotations
+import argparse
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
+
+from backend.database import engine as default_engine
+from backend.services.food_upload_service import TODAY_TOTALS_SQL
+from backend.services.nutrient_rollup import aggregate_sql
+from backend.services.nutrients_sql import MEALS_BREAKDOWN_SQL, MEALS_DONE_SQL, TOTAL_INTAKE_SQL
+from backend.services.report_service import WEEKLY_INTAKE_SQL
+
+Query = Tuple[str, Union[str, TextClause], Dict[str, Any]]
+
+# 행이 계속 늘어나는 표: 전체 스캔이면 인덱스 유무와 관계없이 실패
+WATCHED_TABLES = ("food_logs", "daily_nutrient_rollup")
+
+_FROM_JOIN = re.compile(
+    r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|LEFT|RIGHT|INNER|CROSS|GROUP|ORDER|LIMIT|USING)\b)(\w+))?",
+    re.IGNORECASE,
+)
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    plan: List[Dict[str, Any]]
+    bad: List[Dict[str, Any]]     # 실패 사유가 된 행
+    loose: List[Dict[str, Any]]   # 기본 모드에서 경고만 한 행
+
+
+def hot_queries(user_id: int, username: str, today: Optional[date] = None) -> List[Query]:
+    """(이름, SQL, 파라미터) — 서비스가 실제로 쓰는 SQL 상수"""
+    today = today or date.today()
+    week_start = today - timedelta(days=today.weekday() + 7)
+    agg, agg_params = aggregate_sql(today, today, user_id)
+    return [
+        ("dashboard.total_intake_today", TOTAL_INTAKE_SQL, {"uname": username, "d": today}),
+        ("recommend.meals_done_today", MEALS_DONE_SQL, {"uname": username, "d": today}),
+        ("dashboard.meals_breakdown_today", MEALS_BREAKDOWN_SQL, {"uname": username, "d": today}),
+        ("upload.today_totals", TODAY_TOTALS_SQL, {"uid": user_id, "d": today}),
+        ("report.weekly_intake_per_day", WEEKLY_INTAKE_SQL,
+         {"uid": user_id, "start": week_start, "end_excl": week_start + timedelta(days=7)}),
+        ("rollup.aggregate_food_logs", agg, agg_params),
+    ]
+
+
+def _sql_text(sql: Union[str, TextClause]) -> str:
+    return sql.text if isinstance(sql, TextClause) else sql
+
+
+def table_aliases(sql: Union[str, TextClause]) -> Dict[str, str]:
+    """FROM / JOIN 절의 별칭 → 테이블 이름 (EXPLAIN 의 table 열은 별칭으로 나온다)"""
+    out: Dict[str, str] = {}
+    for table, alias in _FROM_JOIN.findall(_sql_text(sql)):
+        out[table] = table
+        if alias:
+            out[alias] = table
+    return out
+
+
+def explain(conn: Connection, sql: Union[str, TextClause], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [dict(r._mapping) for r in conn.execute(text("EXPLAIN " + _sql_text(sql)), params)]
+
+
+def full_scans(
+    plan: List[Dict[str, Any]], aliases: Optional[Dict[str, str]] = None, strict: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    실패로 볼 type=ALL 행 (파생 테이블 <derivedN> 등은 제외).
+    WATCHED_TABLES 는 항상, 그 밖의 테이블은 strict 이거나 사용할 인덱스(possible_keys)가 없을 때
+    """
+    aliases = aliases or {}
+    out = []
+    for row in plan:
+        table = str(row.get("table") or "")
+        if (row.get("type") or "").upper() != "ALL" or table.startswith("<"):
+            continue
+        if strict or aliases.get(table, table) in WATCHED_TABLES or not row.get("possible_keys"):
+            out.append(row)
+    return out
+
+
+def run_checks(
+    conn: Connection, user_id: int, username: str, strict: bool = False, today: Optional[date] = None
+) -> List[PlanCheck]:
+    """hot_queries 전부 EXPLAIN → 조회별 결과"""
+    out = []
+    for name, sql, params in hot_queries(user_id, username, today):
+        plan = explain(conn, sql, params)
+        aliases = table_aliases(sql)
+        bad = full_scans(plan, aliases, strict=strict)
+        loose = [r for r in full_scans(plan, aliases, strict=True) if r not in bad]
+        out.append(PlanCheck(name, plan, bad, loose))
+    return out
+
+
+def _pick_user(conn: Connection, username: Optional[str]) -> Tuple[int, str]:
+    if username:
+        row = conn.execute(text("SELECT id, username FROM users WHERE username = :u"), {"u": username}).fetchone()
+    else:
+        row = conn.execute(text("SELECT id, username FROM users ORDER BY id LIMIT 1")).fetchone()
+    if not row:
+        raise SystemExit("EXPLAIN 파라미터로 쓸 사용자가 없습니다 (--user 확인).")
+    return int(row[0]), str(row[1])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="자주 도는 조회의 EXPLAIN 확인 (전체 스캔이면 실패)")
+    ap.add_argument("--user", default=None, help="파라미터로 쓸 username (기본: 첫 사용자)")
+    ap.add_argument("--strict", action="store_true", help="모든 테이블에서 type=ALL 이면 실패")
+    args = ap.parse_args(argv)
+
+    failed: List[str] = []
+    with default_engine.connect() as conn:
+        user_id, username = _pick_user(conn, args.user)
+        for c in run_checks(conn, user_id, username, strict=args.strict):
+            status = "FAIL" if c.bad else ("WARN" if c.loose else "ok")
+            print(f"[{status:>4}] {c.name}")
+            for r in c.plan:
+                print(f"        {r.get('table')}: type={r.get('type')} key={r.get('key')} "
+                      f"rows={r.get('rows')} possible_keys={r.get('possible_keys')}")
+            if c.bad:
+                failed.append(c.name)
+
+    if failed:
+        print(f"[query_plans] 전체 스캔 {len(failed)}건: {', '.join(failed)}")
+        raise SystemExit(1)
+    print("[query_plans] 전체 스캔 없음")
+
+
+if __name__ == "__main__":
+    main()
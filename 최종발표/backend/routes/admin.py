@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+import secrets
+
+from backend.database import get_db
+from backend.utils.executors import run_db
+from backend.utils.label_map import label_food_map
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# 관리자 엔드포인트 토큰 (비어 있으면 /admin 전체 비활성)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="관리자 기능이 비활성화되어 있습니다 (ADMIN_TOKEN 미설정).")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="관리자 토큰이 올바르지 않습니다.")
+
+
+# ─────────────────────────────────────────────
+# 분류기 라벨 → 음식 해석표
+# ─────────────────────────────────────────────
+@router.get("/label-map", dependencies=[Depends(require_admin)])
+def get_label_map():
+    """현재 해석표 (라벨 → food_id / 이름 / 점수, 해석 안 된 라벨은 null)"""
+    return {"stats": label_food_map.stats(), "entries": label_food_map.entries()}
+
+
+@router.post("/label-map/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_label_map(db: Session = Depends(get_db)):
+    """음식 카탈로그(foods)를 고친 뒤 해석표를 다시 만든다 (이름 색인도 새로 읽음)"""
+    try:
+        return await run_db(label_food_map.rebuild, db)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"class_names.json 을 찾을 수 없습니다: {e}")
@@ -1,256 +1,202 @@
-
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Depends, HTTPException, Form, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from pathlib import Path
-from datetime import datetime
-import secrets, shutil, io 
-from PIL import Image, UnidentifiedImageError
+from typing import Any, Dict, List, Optional
+import json
 
-from backend.database import get_db
-from backend.utils.inference import detect_food_labels
-from backend.utils.nutrition_matcher import (
-    find_food_by_name, food_per_serving_dict, scale_nutrients
+from backend.database import SessionLocal, get_db
+from backend.services.food_upload_service import (
+    UPLOAD_BATCH_MAX, process_upload, process_upload_batch, upload_key, validate_upload
+)
+from backend.services.idempotency_service import fingerprint, run_idempotent
+from backend.utils.executors import run_db
+from backend.utils.jobs import (
+    UPLOAD_JOB_MAX_QUEUE, UPLOAD_JOB_POLL, UPLOAD_JOB_STALE, UPLOAD_JOB_TTL, UPLOAD_JOB_WORKERS, JobQueue
 )
+from backend.utils.label_map import label_food_map
+from backend.utils.model_registry import inference_registry
+from backend.utils.nutrition_matcher import food_index
 
 router = APIRouter(prefix="/food")
 
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+
+async def _run_upload_job(params: Dict[str, Any], raw: bytes, progress) -> Dict[str, Any]:
+    """async 업로드 워커: 요청 세션은 응답과 함께 닫히므로 작업마다 세션을 따로 연다 (다른 워커가 넣은 작업일 수도 있음)"""
+    params = dict(params)
+    idem_key = params.pop("idempotency_key", None)
+    db = SessionLocal()
+    try:
+        return await run_idempotent(
+            db, params["username"], idem_key,
+            fingerprint(raw, params["meal_index"], params["servings"]),
+            lambda: process_upload(db, raw=raw, on_stage=progress, **params),
+            as_response=False,
+        )
+    finally:
+        db.close()
+
+
+# 작업 / 결과는 DB upload_jobs 표 → 워커 프로세스가 여러 개여도 어느 워커에서든 조회 / dedup 가능
+upload_jobs = JobQueue(
+    _run_upload_job,
+    SessionLocal,
+    workers=UPLOAD_JOB_WORKERS,
+    ttl=UPLOAD_JOB_TTL,
+    max_queue=UPLOAD_JOB_MAX_QUEUE,
+    poll=UPLOAD_JOB_POLL,
+    stale=UPLOAD_JOB_STALE,
+    name="upload-jobs",
+)
+
+
+@router.get("/stats")
+def inference_stats():
+    """모델 준비 상태 / 마이크로배칭 / 결과 캐시 / YOLO cascade / non-food 필터 / async 업로드 작업 / 음식 이름 색인 / 라벨 해석표 통계"""
+    out = {
+        "models": inference_registry.status,
+        "upload_jobs": upload_jobs.stats(),
+        "food_index": food_index.stats(),
+        "label_map": label_food_map.stats(),
+    }
+    if inference_registry.ready:
+        inference = inference_registry.ensure_loaded(0)
+        out["microbatch"] = inference.microbatch_stats()
+        out["result_cache"] = inference.result_cache_stats()
+        out["yolo_cascade"] = inference.cascade_stats()
+        out["food_gate"] = inference.food_gate_stats()
+    return out
+
 
 @router.post("/upload")
 async def upload_food(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
 
     username: str = Form(..., description="로그인한 사용자명"),
     meal_index: int = Form(..., description="1=아침,2=점심,3=저녁,4=간식"),
-    servings: float = Form(1.0, description="인분 수(기본 1.0, 소수 허용)")
+    servings: float = Form(1.0, description="인분 수(기본 1.0, 소수 허용)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    # ─────────────────────────────────────
-    # 0) 입력 검증
-    # ─────────────────────────────────────
-    if servings <= 0 or servings > 10:
-        raise HTTPException(status_code=422, detail="servings must be in (0, 10].")
-    if meal_index not in (1, 2, 3, 4):
-        raise HTTPException(status_code=422, detail="meal_index must be one of {1,2,3,4}.")
-
-    user_row = db.execute(
-        text("SELECT id, meals_per_day FROM users WHERE username = :u"),
-        {"u": username.strip()}
-    ).fetchone()
-    if not user_row:
-        raise HTTPException(status_code=404, detail=f"사용자 '{username}'를 찾을 수 없습니다.")
-    user_id, meals_per_day = user_row
-
-    # ─────────────────────────────────────
-    # 1) daily_plan 존재 보장
-    # ─────────────────────────────────────
-    cnt_row = db.execute(
-        text("""
-            SELECT COUNT(*) AS cnt
-            FROM daily_plan
-            WHERE user_id = :user_id AND DATE(plan_date) = CURDATE()
-        """),
-        {"user_id": user_id}
-    ).fetchone()
-    if (cnt_row[0] if cnt_row else 0) == 0:
-        total_meals = meals_per_day or 3
-        db.execute(
-            text("""
-                INSERT INTO daily_plan (user_id, plan_date, total_meals)
-                VALUES (:user_id, CURDATE(), :total_meals)
-            """),
-            {"user_id": user_id, "total_meals": total_meals}
-        )
-        db.commit()
-
-    # ─────────────────────────────────────
-    # 2) 파일 저장 (바이트 검증 후 저장)
-    # ─────────────────────────────────────
+    """
+    동기 모드: 디코딩 → 탐지 → 매칭 → 기록까지 끝나고 응답 (원본 파일 저장은 응답 후 백그라운드)
+    Idempotency-Key 헤더를 주면 같은 키의 재요청은 추론 / food_logs 기록 없이 처음 응답을 그대로 돌려준다
+    (응답 헤더 Idempotent-Replayed: true). 같은 키로 다른 사진 / 끼니 / 인분을 보내면 422.
+    """
     raw = await file.read()
-    if not raw or len(raw) < 100:  
-        raise HTTPException(status_code=400, detail="업로드된 파일이 비어있거나 손상되었습니다.")
-
-    # Pillow로 먼저 열어 유효성 확인 + RGB 강제
-    try:
-        pil = Image.open(io.BytesIO(raw))
-        pil.load()  
-        pil = pil.convert("RGB")
-    except UnidentifiedImageError:
-        raise HTTPException(status_code=415, detail="이미지로 판별할 수 없는 파일 형식입니다(JPG/PNG 권장).")
-    except Exception as e:
-        raise HTTPException(status_code=415, detail=f"이미지 처리 중 오류: {e}")
-
-    # 확장자 결정: PIL 포맷 기준
-    pil_fmt = (pil.format or "").upper()
-    ext_by_fmt = { "JPEG": ".jpg", "JPG": ".jpg", "PNG": ".png", "WEBP": ".jpg" }
-    suffix = ext_by_fmt.get(pil_fmt, None)
-    if not suffix:  # 업로드 파일명으로 보조 결정
-        suffix = Path(file.filename or "").suffix.lower() or ".jpg"
-        if suffix not in {".jpg", ".jpeg", ".png"}:
-            suffix = ".jpg"
-
-    safe_name = f"{secrets.token_hex(8)}{suffix}"
-    dst = UPLOAD_DIR / safe_name
-
-    # 디스크에 저장 (검증된 이미지)
-    try:
-        pil.save(dst)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"이미지 저장에 실패했습니다: {e}")
-
-    if not dst.exists() or dst.stat().st_size < 100:
-        raise HTTPException(status_code=500, detail="이미지 저장에 실패했습니다.")
-
-    # ─────────────────────────────────────
-    # 3) 모델 추론
-    # ─────────────────────────────────────
-    try:
-        result = detect_food_labels(
-            str(dst),
-            aggregate=False,
-            min_prob=0.20,
-            yolo_iou=0.80,
-            merge_boxes=False,
-            require_ae=True, 
-        ) or {}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"탐지 모델 실행 중 오류: {e}")
-
-    detections = result.get("detections") or []
-    if not detections:
-        raise HTTPException(status_code=422, detail="탐지된 음식이 없습니다.")
-
-    MAX_DETS = 12
-    detections = sorted(
-        detections, key=lambda d: float(d.get("prob", 0.0)), reverse=True
-    )[:MAX_DETS]
-
-    # ─────────────────────────────────────
-    # 4) DB 매칭 & food_logs 기록 + 영양 계산
-    # ─────────────────────────────────────
-    matched_results = []
-    for det in detections:
-        label = det.get("label")
-        prob  = float(det.get("prob", 0.0))
-        if not label:
-            continue
-
-        # DB의 foods 테이블에서 이름/유사어 매칭
-        food = find_food_by_name(db, label)
-        if not food:
-            continue
-
-        servings_each = float(servings)
-
-        # 로그 저장
-        db.execute(
-            text("""
-                INSERT INTO food_logs
-                    (user_id, food_id, servings, consumed_at, meal_index, source, note, image_url)
-                VALUES
-                    (:user_id, :food_id, :servings, :consumed_at, :meal_index, :source, :note, :image_url)
-            """),
-            {
-                "user_id": user_id,
-                "food_id": food.id,
-                "servings": servings_each,
-                "consumed_at": datetime.now(),
-                "meal_index": meal_index,
-                "source": "ml_auto",
-                "note": f"Detected automatically from image: {file.filename} (prob={prob:.2f})",
-                "image_url": str(dst),
-            }
-        )
-
-        # 1인분 / 총량(인분 반영) 계산
-        per_serv = food_per_serving_dict(food)  # {'kcal','carb_g','protein_g','fat_g', ...}
-        total = scale_nutrients(per_serv, servings_each)
-
-        matched_results.append({
-            "raw_label": label,
-            "confidence": prob,
-            "food_id": food.id,
-            "food_name": food.name,
-            "servings": servings_each,
-            "per_serving": per_serv,
-            "total_nutrients": total,
-        })
-
-    db.commit()
-
-    if not matched_results:
-        raise HTTPException(status_code=404, detail="DB에 매칭된 음식이 없습니다.")
-
-    # ─────────────────────────────────────
-    # 5) 오늘 누적 합
-    # ─────────────────────────────────────
-    totals_row = db.execute(
-        text("""
-            SELECT
-              COALESCE(SUM(f.kcal      * l.servings), 0) AS total_kcal,
-              COALESCE(SUM(f.protein_g * l.servings), 0) AS total_protein_g,
-              COALESCE(SUM(f.fat_g     * l.servings), 0) AS total_fat_g,
-              COALESCE(SUM(f.carb_g    * l.servings), 0) AS total_carb_g,
-              COALESCE(SUM(f.sugar_g   * l.servings), 0) AS total_sugar_g,
-              COALESCE(SUM(f.sodium_mg * l.servings), 0) AS total_sodium_mg,
-              COALESCE(SUM(f.fiber_g   * l.servings), 0) AS total_fiber_g
-            FROM food_logs l
-            JOIN foods f ON f.id = l.food_id
-            WHERE l.user_id = :uid AND DATE(l.consumed_at) = CURDATE()
-        """),
-        {"uid": user_id}
-    ).mappings().first() or {}
-
-    # ─────────────────────────────────────
-    # 6) 프론트 카드용 요약(summary, top_summary)
-    # ─────────────────────────────────────
-    summary_items = []
-    for item in matched_results[:3]:
-        tot = item.get("total_nutrients") or {}
-        summary_items.append({
-            "food_name": item.get("food_name") or item.get("raw_label"),
-            "confidence": round(float(item.get("confidence", 0.0)), 4),
-            "servings": float(item.get("servings", 1.0)),
-            "kcal": float(tot.get("kcal", 0.0)),
-            "carb_g": float(tot.get("carb_g", 0.0)),
-            "protein_g": float(tot.get("protein_g", 0.0)),
-            "fat_g": float(tot.get("fat_g", 0.0)),
-        })
+    validate_upload(raw, meal_index, servings)
+    return await run_idempotent(
+        db, username, idempotency_key, fingerprint(raw, meal_index, servings),
+        lambda: process_upload(
+            db, raw, file.filename, username, meal_index, servings,
+            defer_save=background_tasks.add_task,
+        ),
+    )
+
+
+@router.post("/upload/batch")
+async def upload_food_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
 
-    top_item = matched_results[0]
-    top_summary = {
-        "food_name": top_item.get("food_name") or top_item.get("raw_label"),
-        "confidence": round(float(top_item.get("confidence", 0.0)), 4),
-        "servings": float(top_item.get("servings", 1.0)),
-        "per_serving": {
-            "kcal": float(top_item["per_serving"].get("kcal", 0.0)),
-            "carb_g": float(top_item["per_serving"].get("carb_g", 0.0)),
-            "protein_g": float(top_item["per_serving"].get("protein_g", 0.0)),
-            "fat_g": float(top_item["per_serving"].get("fat_g", 0.0)),
-        },
-        "total": {
-            "kcal": float(top_item["total_nutrients"].get("kcal", 0.0)),
-            "carb_g": float(top_item["total_nutrients"].get("carb_g", 0.0)),
-            "protein_g": float(top_item["total_nutrients"].get("protein_g", 0.0)),
-            "fat_g": float(top_item["total_nutrients"].get("fat_g", 0.0)),
-        }
+    username: str = Form(..., description="로그인한 사용자명"),
+    meal_index: List[int] = Form(..., description="이미지별 끼니(1~4). 값이 하나면 모든 이미지에 적용"),
+    servings: List[float] = Form([1.0], description="이미지별 인분 수. 값이 하나면 모든 이미지에 적용"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    여러 장을 한 번에: daily_plan 확인 한 번, 탐지 batched forward, food_logs 한 트랜잭션.
+    results[i] 는 ok=True 면 동기 업로드와 같은 matched / summary, 아니면 status_code / detail (부분 실패).
+    """
+    # 파일을 읽기 전에 장 수부터 거절 (UPLOAD_BATCH_MAX)
+    if len(files) > UPLOAD_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"한 번에 최대 {UPLOAD_BATCH_MAX}장까지 올릴 수 있습니다.")
+
+    def per_image(values: List[Any], name: str) -> List[Any]:
+        if len(values) == 1:
+            return values * len(files)
+        if len(values) != len(files):
+            raise HTTPException(status_code=422, detail=f"{name} 개수({len(values)})가 이미지 수({len(files)})와 다릅니다.")
+        return values
+
+    meals = per_image(meal_index, "meal_index")
+    servs = per_image(servings, "servings")
+    uploads = [
+        {"raw": await f.read(), "filename": f.filename, "meal_index": m, "servings": sv}
+        for f, m, sv in zip(files, meals, servs)
+    ]
+    return await run_idempotent(
+        db, username, idempotency_key,
+        fingerprint(*[v for u in uploads for v in (u["raw"], u["meal_index"], u["servings"])]),
+        lambda: process_upload_batch(db, username, uploads, defer_save=background_tasks.add_task),
+    )
+
+
+@router.post("/upload/async", status_code=202)
+async def upload_food_async(
+    file: UploadFile = File(...),
+    username: str = Form(..., description="로그인한 사용자명"),
+    meal_index: int = Form(..., description="1=아침,2=점심,3=저녁,4=간식"),
+    servings: float = Form(1.0, description="인분 수(기본 1.0, 소수 허용)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    async 모드: 작업 id 를 바로 돌려주고 파이프라인은 워커 큐에서 실행
+    결과는 GET /food/jobs/{id} (polling) 또는 GET /food/jobs/{id}/events (SSE) 로 받는다.
+    같은 사용자 · 사진 · 끼니 · 인분의 작업이 TTL 안에 있으면 그 작업 id 를 돌려준다 (추론 / 기록 재실행 없음).
+    Idempotency-Key 를 주면 작업 dedup 키로도 쓰고, 워커가 DB 의 저장 응답을 확인해 서버 재시작 뒤에도 재실행하지 않는다.
+    작업은 DB(upload_jobs)에 저장되므로 다른 워커 프로세스가 실행 / 조회해도 된다.
+    """
+    raw = await file.read()
+    validate_upload(raw, meal_index, servings)
+    params = {
+        "filename": file.filename, "username": username,
+        "meal_index": meal_index, "servings": servings, "idempotency_key": idempotency_key,
     }
-
-    # ─────────────────────────────────────
-    # 7) 응답
-    # ─────────────────────────────────────
+    key = f"idem|{username.strip()}|{idempotency_key}" if idempotency_key else upload_key(raw, username, meal_index, servings)
+    job, deduplicated = await upload_jobs.submit(params, raw, key=key)
     return {
-        "message": "탐지·매칭 및 food_logs 저장 완료",
-        "username": username,
-        "user_id": user_id,
-        "image_path": str(dst),
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "deduplicated": deduplicated,
+        "status_url": f"/food/jobs/{job['job_id']}",
+        "events_url": f"/food/jobs/{job['job_id']}/events",
+    }
 
-        "detected_raw": detections,
-        "matched": matched_results,
-        "today_totals": totals_row,
 
-        "summary": {"items": summary_items},
-        "top_summary": top_summary
-    }
+def _job_or_404(job_id: str) -> Dict[str, Any]:
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다 (만료되었거나 잘못된 id).")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """status: queued | running | done | failed. done 이면 result 가 동기 /food/upload 응답과 같다"""
+    return _job_or_404(job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def upload_job_events(job_id: str):
+    """
+    SSE: 단계마다 `event: stage` (queued / user / decode / model / detect / match),
+    마지막에 `event: done` (data = 작업 snapshot, result 포함) 또는 `event: failed` 후 스트림 종료
+    """
+    await run_db(_job_or_404, job_id)
+
+    async def stream():
+        async for ev in upload_jobs.follow(job_id):
+            if ev is None:
+                yield ": keepalive\n\n"
+                continue
+            name = ev["stage"] if ev["stage"] in ("done", "failed") else "stage"
+            data = ev if name == "stage" else (await run_db(upload_jobs.get, job_id) or ev)
+            yield f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
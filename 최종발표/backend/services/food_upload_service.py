@@ -0,0 +1,572 @@
+"""
+음식 사진 업로드 파이프라인 (동기 /food/upload 와 async 작업 워커가 같이 쓴다)
+
+decode → YOLO / 분류 / AE → DB 매칭 + food_logs 기록 → 응답 요약
+DB 는 run_db, 디코딩 / 추론은 run_inference 로 이벤트 루프 밖에서 실행한다.
+각 단계 시작 시 on_stage(stage, info) 를 불러 진행 상황을 알린다 (async 작업의 SSE 이벤트).
+DB 왕복: 사용자 조회 + daily_plan upsert → commit (추론 전) → (food_logs 다중 행 INSERT + rollup upsert → commit) → 오늘 누적 합.
+라벨 → 음식은 시작 시 만든 해석표(label_map)에서 찾는다.
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import secrets
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from PIL import UnidentifiedImageError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.services.nutrient_rollup import add_logs
+from backend.utils.executors import run_db, run_inference
+from backend.utils.ingest import IngestedImage, decode_full, ingest
+from backend.utils.label_map import label_food_map
+from backend.utils.model_config import MODEL_READY_TIMEOUT
+from backend.utils.model_registry import inference_registry
+from backend.utils.nutrition_matcher import scale_nutrients
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+MAX_DETS = 12
+# /food/upload/batch 한 번에 받을 최대 이미지 수
+UPLOAD_BATCH_MAX = int(os.getenv("UPLOAD_BATCH_MAX", "8"))
+
+# 원본 바이트를 그대로 저장할 포맷 → 확장자 (그 외 포맷은 JPEG 로 다시 저장)
+RAW_SUFFIX_BY_FMT = {"JPEG": ".jpg", "MPO": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+OnStage = Callable[[str, Optional[Dict[str, Any]]], None]
+
+
+# ─────────────────────────────────────
+# 입력 검증 / 작업 키
+# ─────────────────────────────────────
+def validate_upload(raw: bytes, meal_index: int, servings: float) -> None:
+    if servings <= 0 or servings > 10:
+        raise HTTPException(status_code=422, detail="servings must be in (0, 10].")
+    if meal_index not in (1, 2, 3, 4):
+        raise HTTPException(status_code=422, detail="meal_index must be one of {1,2,3,4}.")
+    if not raw or len(raw) < 100:
+        raise HTTPException(status_code=400, detail="업로드된 파일이 비어있거나 손상되었습니다.")
+
+
+def upload_key(raw: bytes, username: str, meal_index: int, servings: float) -> str:
+    """같은 사용자가 같은 사진을 같은 끼니/인분으로 다시 올리면 같은 키 (async 작업 dedup)"""
+    h = hashlib.sha256(raw).hexdigest()
+    return f"{username.strip()}|{int(meal_index)}|{float(servings):g}|{h}"
+
+
+# ─────────────────────────────────────
+# 동기 단계들 (이벤트 루프 밖: DB → run_db, 디코딩/추론 → run_inference)
+# ─────────────────────────────────────
+def get_user(db: Session, username: str) -> Tuple[int, int]:
+    """→ (user_id, meals_per_day). 없으면 404 (추론 전에 확인)"""
+    user_row = db.execute(
+        text("SELECT id, meals_per_day FROM users WHERE username = :u"),
+        {"u": username.strip()}
+    ).fetchone()
+    if not user_row:
+        raise HTTPException(status_code=404, detail=f"사용자 '{username}'를 찾을 수 없습니다.")
+    return user_row[0], user_row[1]
+
+
+def ensure_plan(db: Session, user_id: int, meals_per_day: Optional[int], plan_date: date) -> None:
+    """
+    daily_plan 존재 보장: (user_id, plan_date) UNIQUE 에 기대는 한 문장 upsert (migrations 0002)
+    동시 업로드가 같은 날 plan 을 중복 생성하지 않고, 이미 있으면 아무것도 바꾸지 않는다.
+    plan_date 는 food_logs / rollup 과 같은 앱 서버 날짜 (DB CURDATE() 는 시간대가 다를 수 있음).
+    commit 은 호출한 쪽에서
+    """
+    db.execute(
+        text("""
+            INSERT INTO daily_plan (user_id, plan_date, total_meals)
+            VALUES (:user_id, :plan_date, :total_meals)
+            ON DUPLICATE KEY UPDATE total_meals = total_meals
+        """),
+        {"user_id": user_id, "plan_date": plan_date, "total_meals": meals_per_day or 3}
+    )
+
+
+def get_user_and_plan(db: Session, username: str) -> Tuple[int, int, date]:
+    """
+    → (user_id, meals_per_day, plan_date). 사용자 조회 + 오늘 daily_plan 보장 → commit
+    추론 전에 실행한다: 매칭 결과와 상관없이 업로드가 들어온 날의 plan 행이 생긴다 (/stats, 리포트가 기대)
+    """
+    user_id, meals_per_day = get_user(db, username)
+    plan_date = date.today()
+    try:
+        ensure_plan(db, user_id, meals_per_day, plan_date)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return user_id, meals_per_day, plan_date
+
+
+def decode_image(raw: bytes) -> Tuple[IngestedImage, Optional[str]]:
+    """
+    바이트 → 작업용 RGB 이미지 (업로드당 디코딩은 여기 한 번)
+    JPEG 은 축소 디코딩, EXIF 회전 적용, 긴 변 INGEST_MAX_SIDE 제한, 넓은 상차림 사진은 TILE_MAX_SIDE (utils/ingest.py)
+    반환: (IngestedImage, 원본 바이트를 그대로 저장할 확장자 또는 None)
+    """
+    try:
+        img = ingest(raw)
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=415, detail="이미지로 판별할 수 없는 파일 형식입니다(JPG/PNG 권장).")
+    except Exception as e:
+        raise HTTPException(status_code=415, detail=f"이미지 처리 중 오류: {e}")
+    return img, RAW_SUFFIX_BY_FMT.get((img.format or "").upper())
+
+
+def save_upload(raw: bytes, reencode: bool, dst: Path) -> None:
+    """
+    응답과 분리해 실행 (추론 경로에서 인코딩/디스크 쓰기 제거)
+    검증된 원본 바이트를 그대로 저장하고, raw 로 둘 수 없는 포맷만 원본 해상도로 JPEG 인코딩한다.
+    """
+    tmp = dst.with_name(dst.name + ".part")
+    try:
+        if reencode:
+            decode_full(raw).save(tmp, "JPEG", quality=95)
+        else:
+            tmp.write_bytes(raw)
+        os.replace(tmp, dst)
+    except Exception:
+        # 응답 후 백그라운드에서 실행되므로 로그로만 남는다
+        logger.exception("[upload] 이미지 저장 실패 %s", dst)
+        tmp.unlink(missing_ok=True)
+
+
+_DETECT_OPTIONS = dict(aggregate=False, min_prob=0.20, yolo_iou=0.80, merge_boxes=False, require_ae=True)
+
+
+def detect(inference, img: IngestedImage, dst: Path) -> Dict[str, Any]:
+    # bbox 는 원본(EXIF 회전 적용) 해상도 좌표로 돌려받는다
+    return inference.detect_food_labels(
+        img.pil,
+        image_path=str(dst),
+        bbox_scale=img.scale,
+        **_DETECT_OPTIONS,
+    ) or {}
+
+
+def detect_batch(inference, imgs: List[IngestedImage], dsts: List[Path]) -> List[Dict[str, Any]]:
+    """여러 장을 batched YOLO / 분류 forward 로 (inference.detect_food_labels_batch)"""
+    return inference.detect_food_labels_batch(
+        [img.pil for img in imgs],
+        image_paths=[str(d) for d in dsts],
+        bbox_scales=[img.scale for img in imgs],
+        **_DETECT_OPTIONS,
+    )
+
+
+def _check_detections(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """탐지 결과 → prob 순 상위 MAX_DETS detection. 음식 아님 / 탐지 없음은 HTTPException"""
+    if result.get("rejected") == "non_food":
+        raise HTTPException(
+            status_code=422,
+            detail="음식 사진이 아닌 것으로 판단되었습니다. 음식이 잘 보이도록 다시 촬영해 주세요.",
+            headers={"X-Reject-Reason": "non_food"},
+        )
+    detections = result.get("detections") or []
+    if not detections:
+        raise HTTPException(status_code=422, detail="탐지된 음식이 없습니다.")
+    return sorted(
+        detections, key=lambda d: float(d.get("prob", 0.0)), reverse=True
+    )[:MAX_DETS]
+
+
+_INSERT_FOOD_LOG = text("""
+    INSERT INTO food_logs
+        (user_id, food_id, servings, consumed_at, meal_index, source, note, image_url)
+    VALUES
+        (:user_id, :food_id, :servings, :consumed_at, :meal_index, :source, :note, :image_url)
+""")
+
+
+def match_rows(
+    resolved: Dict[str, Any],
+    detections: List[Dict[str, Any]],
+    user_id: int,
+    meal_index: int,
+    servings: float,
+    filename: str,
+    dst: Path,
+    consumed_at: datetime,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    resolved(라벨 → ResolvedFood, label_food_map.resolve_many) 로 매칭 결과 + 영양 계산
+    → (matched_results, food_logs INSERT 파라미터 목록). DB 를 건드리지 않는다.
+    """
+    matched_results, rows = [], []
+    for det in detections:
+        label = det.get("label")
+        prob  = float(det.get("prob", 0.0))
+        if not label:
+            continue
+
+        food = resolved.get(label)
+        if not food:
+            continue
+
+        servings_each = float(servings)
+
+        rows.append({
+            "user_id": user_id,
+            "food_id": food.food_id,
+            "servings": servings_each,
+            "consumed_at": consumed_at,
+            "meal_index": meal_index,
+            "source": "ml_auto",
+            "note": f"Detected automatically from image: {filename} (prob={prob:.2f})",
+            "image_url": str(dst),
+        })
+
+        # 1인분 / 총량(인분 반영) 계산
+        per_serv = dict(food.per_serving)  # {'kcal','carb_g','protein_g','fat_g', ...}
+        total = scale_nutrients(per_serv, servings_each)
+
+        matched_results.append({
+            "raw_label": label,
+            "confidence": prob,
+            "food_id": food.food_id,
+            "food_name": food.food_name,
+            "servings": servings_each,
+            "per_serving": per_serv,
+            "total_nutrients": total,
+        })
+    return matched_results, rows
+
+
+# 오늘 누적 합 (daily_nutrient_rollup PK 조회) — query_plans 가 EXPLAIN 확인
+TODAY_TOTALS_SQL = text("""
+    SELECT
+      COALESCE(SUM(kcal), 0)      AS total_kcal,
+      COALESCE(SUM(protein_g), 0) AS total_protein_g,
+      COALESCE(SUM(fat_g), 0)     AS total_fat_g,
+      COALESCE(SUM(carb_g), 0)    AS total_carb_g,
+      COALESCE(SUM(sugar_g), 0)   AS total_sugar_g,
+      COALESCE(SUM(sodium_mg), 0) AS total_sodium_mg,
+      COALESCE(SUM(fiber_g), 0)   AS total_fiber_g
+    FROM daily_nutrient_rollup
+    WHERE user_id = :uid AND log_date = :d
+""")
+
+
+def today_totals(db: Session, user_id: int, day: Optional[date] = None) -> Dict[str, Any]:
+    """오늘(day) 누적 합 (daily_nutrient_rollup 끼니별 행 합). 날짜는 add_logs 와 같은 앱 서버 기준"""
+    totals_row = db.execute(TODAY_TOTALS_SQL, {"uid": user_id, "d": day or date.today()}).mappings().first() or {}
+    return dict(totals_row)
+
+
+def match_and_log(
+    db: Session,
+    detections: List[Dict[str, Any]],
+    user_id: int,
+    meals_per_day: Optional[int],
+    plan_date: date,
+    meal_index: int,
+    servings: float,
+    filename: str,
+    dst: Path,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """DB 매칭 & food_logs 기록 + 영양 계산 → (matched_results, 오늘 누적 합)"""
+    entry = {
+        "detections": detections, "meal_index": meal_index, "servings": servings, "filename": filename, "dst": dst,
+    }
+    matched, totals = log_batch(db, [entry], user_id, meals_per_day, plan_date)
+    return matched[0], totals
+
+
+def build_summaries(matched_results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """프론트 카드용 요약 → (summary items, top_summary)"""
+    summary_items = []
+    for item in matched_results[:3]:
+        tot = item.get("total_nutrients") or {}
+        summary_items.append({
+            "food_name": item.get("food_name") or item.get("raw_label"),
+            "confidence": round(float(item.get("confidence", 0.0)), 4),
+            "servings": float(item.get("servings", 1.0)),
+            "kcal": float(tot.get("kcal", 0.0)),
+            "carb_g": float(tot.get("carb_g", 0.0)),
+            "protein_g": float(tot.get("protein_g", 0.0)),
+            "fat_g": float(tot.get("fat_g", 0.0)),
+        })
+
+    top_item = matched_results[0]
+    top_summary = {
+        "food_name": top_item.get("food_name") or top_item.get("raw_label"),
+        "confidence": round(float(top_item.get("confidence", 0.0)), 4),
+        "servings": float(top_item.get("servings", 1.0)),
+        "per_serving": {
+            "kcal": float(top_item["per_serving"].get("kcal", 0.0)),
+            "carb_g": float(top_item["per_serving"].get("carb_g", 0.0)),
+            "protein_g": float(top_item["per_serving"].get("protein_g", 0.0)),
+            "fat_g": float(top_item["per_serving"].get("fat_g", 0.0)),
+        },
+        "total": {
+            "kcal": float(top_item["total_nutrients"].get("kcal", 0.0)),
+            "carb_g": float(top_item["total_nutrients"].get("carb_g", 0.0)),
+            "protein_g": float(top_item["total_nutrients"].get("protein_g", 0.0)),
+            "fat_g": float(top_item["total_nutrients"].get("fat_g", 0.0)),
+        }
+    }
+    return summary_items, top_summary
+
+
+def build_response(
+    username: str,
+    user_id: int,
+    dst: Path,
+    detections: List[Dict[str, Any]],
+    matched_results: List[Dict[str, Any]],
+    totals_row: Dict[str, Any],
+) -> Dict[str, Any]:
+    """프론트 카드용 요약(summary, top_summary) 포함 응답"""
+    summary_items, top_summary = build_summaries(matched_results)
+    return {
+        "message": "탐지·매칭 및 food_logs 저장 완료",
+        "username": username,
+        "user_id": user_id,
+        "image_path": str(dst),
+
+        "detected_raw": detections,
+        "matched": matched_results,
+        "today_totals": totals_row,
+
+        "summary": {"items": summary_items},
+        "top_summary": top_summary
+    }
+
+
+# ─────────────────────────────────────
+# 전체 파이프라인
+# ─────────────────────────────────────
+async def process_upload(
+    db: Session,
+    raw: bytes,
+    filename: str,
+    username: str,
+    meal_index: int,
+    servings: float,
+    on_stage: Optional[OnStage] = None,
+    defer_save: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Any]:
+    """
+    실패는 HTTPException 으로 올린다 (동기 라우트는 그대로 응답, async 작업은 job.error 로 기록).
+    defer_save(fn, *args) 를 주면 원본 저장을 그쪽(BackgroundTasks 등)에 맡기고, 없으면 여기서 저장까지 한다.
+    """
+    def stage(name: str, info: Optional[Dict[str, Any]] = None) -> None:
+        if on_stage is not None:
+            on_stage(name, info)
+
+    # 1) 사용자 조회 + 오늘 daily_plan 보장 (추론 전, 자체 commit)
+    stage("user")
+    user_id, meals_per_day, plan_date = await run_db(get_user_and_plan, db, username)
+
+    # 2) 디코딩 (한 번) + 저장 경로 결정. 실제 파일 쓰기는 매칭 성공 뒤
+    stage("decode")
+    img, raw_suffix = await run_inference(decode_image, raw)
+    dst = UPLOAD_DIR / f"{secrets.token_hex(8)}{raw_suffix or '.jpg'}"
+
+    # 3) 모델 추론 (모델은 백그라운드 warm-up, 준비 전이면 잠시 대기)
+    stage("model")
+    try:
+        inference = await run_in_threadpool(inference_registry.ensure_loaded, MODEL_READY_TIMEOUT)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    stage("detect")
+    try:
+        result = await run_inference(detect, inference, img, dst)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"탐지 모델 실행 중 오류: {e}")
+
+    detections = _check_detections(result)
+
+    # 4) DB 매칭 & food_logs 기록 + 영양 계산 / 5) 오늘 누적 합
+    stage("match", {"num_detections": len(detections)})
+    matched_results, totals_row = await run_db(
+        match_and_log, db, detections, user_id, meals_per_day, plan_date, meal_index, servings, filename, dst
+    )
+
+    if not matched_results:
+        raise HTTPException(status_code=404, detail="DB에 매칭된 음식이 없습니다.")
+
+    # food_logs.image_url 로 기록된 경로에 원본 저장
+    if defer_save is not None:
+        defer_save(save_upload, raw, raw_suffix is None, dst)
+    else:
+        await run_db(save_upload, raw, raw_suffix is None, dst)
+
+    return build_response(username, user_id, dst, detections, matched_results, totals_row)
+
+
+# ─────────────────────────────────────
+# 여러 장 한 번에 (/food/upload/batch)
+# ─────────────────────────────────────
+def _error_entry(e: HTTPException) -> Dict[str, Any]:
+    return {"ok": False, "status_code": e.status_code, "detail": e.detail, **(
+        {"reason": e.headers["X-Reject-Reason"]} if e.headers and "X-Reject-Reason" in e.headers else {}
+    )}
+
+
+def log_batch(
+    db: Session,
+    entries: List[Dict[str, Any]],
+    user_id: int,
+    meals_per_day: Optional[int],
+    plan_date: date,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    이미지들의 detection 을 한 트랜잭션으로 food_logs 에 기록 → (이미지별 matched 목록, 오늘 누적 합)
+      - 라벨 해석: 전부 모아 한 번 (해석표 dict 조회, 표 밖 라벨만 foods IN 조회 한 번)
+      - food_logs 다중 행 INSERT(executemany) + daily_nutrient_rollup upsert → commit 한 번
+    plan_date 는 get_user_and_plan 이 보장해 둔 날짜. 추론 중 자정을 넘겼으면 새 날짜의 plan 도 같은 트랜잭션에서 보장한다.
+    매칭된 음식이 하나도 없으면 아무것도 쓰지 않는다. DB 오류면 전체 rollback 후 예외를 그대로 올린다.
+    """
+    try:
+        resolved = label_food_map.resolve_many(
+            db, (d.get("label") for e in entries for d in e["detections"] if d.get("label"))
+        )
+        now = datetime.now()
+        today = now.date()   # daily_plan / food_logs / rollup / 오늘 누적 합이 같은 날짜를 쓴다
+        matched, rows, rollup = [], [], []
+        for e in entries:
+            m, r = match_rows(
+                resolved, e["detections"], user_id, e["meal_index"], e["servings"], e["filename"], e["dst"], now
+            )
+            matched.append(m)
+            rows.extend(r)
+            rollup.extend((user_id, today, e["meal_index"], item["total_nutrients"]) for item in m)
+        if rows:
+            if today != plan_date:
+                ensure_plan(db, user_id, meals_per_day, today)
+            db.execute(_INSERT_FOOD_LOG, rows)
+            add_logs(db, rollup)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    totals = today_totals(db, user_id, today) if rows else {}
+    return matched, totals
+
+
+async def process_upload_batch(
+    db: Session,
+    username: str,
+    uploads: List[Dict[str, Any]],
+    defer_save: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Any]:
+    """
+    uploads: [{"raw", "filename", "meal_index", "servings"}, ...]
+    사용자 조회 + daily_plan 보장은 한 번 (디코딩 / 추론 전), 탐지는 batched forward 한 번, food_logs 는 한 트랜잭션.
+    이미지별 실패(검증 / 디코딩 / 음식 아님 / 탐지 오류 / 탐지 없음 / DB 매칭 없음)는 해당 항목에만 기록하고 나머지는 진행한다.
+    """
+    if not uploads:
+        raise HTTPException(status_code=400, detail="업로드된 파일이 없습니다.")
+    if len(uploads) > UPLOAD_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"한 번에 최대 {UPLOAD_BATCH_MAX}장까지 올릴 수 있습니다.")
+
+    results: List[Dict[str, Any]] = [
+        {"index": i, "filename": u["filename"], "meal_index": u["meal_index"], "servings": u["servings"]}
+        for i, u in enumerate(uploads)
+    ]
+
+    # 1) 사용자 조회 + 오늘 daily_plan 보장 (한 번, 디코딩 / 추론 전)
+    user_id, meals_per_day, plan_date = await run_db(get_user_and_plan, db, username)
+
+    # 2) 입력 검증 + 디코딩 (이미지별)
+    live: List[int] = []
+    decoded: Dict[int, Tuple[IngestedImage, Optional[str], Path]] = {}
+    for i, u in enumerate(uploads):
+        try:
+            validate_upload(u["raw"], u["meal_index"], u["servings"])
+            img, raw_suffix = await run_inference(decode_image, u["raw"])
+        except HTTPException as e:
+            results[i].update(_error_entry(e))
+            continue
+        decoded[i] = (img, raw_suffix, UPLOAD_DIR / f"{secrets.token_hex(8)}{raw_suffix or '.jpg'}")
+        live.append(i)
+
+    # 3) 탐지: 살아 있는 이미지 전부를 batched forward 로
+    #    batch 가 예외로 끝나면 이미지별로 다시 돌려 실패한 이미지만 500 항목으로 남긴다
+    entries: List[Dict[str, Any]] = []
+    if live:
+        try:
+            inference = await run_in_threadpool(inference_registry.ensure_loaded, MODEL_READY_TIMEOUT)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        outs: List[Any]
+        try:
+            outs = await run_inference(
+                detect_batch, inference, [decoded[i][0] for i in live], [decoded[i][2] for i in live]
+            )
+        except Exception:
+            logger.exception("[upload] batch 탐지 실패 → 이미지별로 다시 실행")
+            outs = []
+            for i in live:
+                try:
+                    outs.append(await run_inference(detect, inference, decoded[i][0], decoded[i][2]))
+                except Exception as e:
+                    outs.append(HTTPException(status_code=500, detail=f"탐지 모델 실행 중 오류: {e}"))
+
+        for i, out in zip(live, outs):
+            try:
+                if isinstance(out, HTTPException):
+                    raise out
+                detections = _check_detections(out or {})
+            except HTTPException as e:
+                results[i].update(_error_entry(e))
+                continue
+            u = uploads[i]
+            entries.append({
+                "index": i, "detections": detections, "dst": decoded[i][2],
+                "meal_index": u["meal_index"], "servings": u["servings"], "filename": u["filename"],
+            })
+
+    # 4) DB 매칭 & food_logs 기록 (한 트랜잭션) + 오늘 누적 합
+    totals_row: Dict[str, Any] = {}
+    if entries:
+        try:
+            matched_all, totals_row = await run_db(log_batch, db, entries, user_id, meals_per_day, plan_date)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"food_logs 기록 중 오류: {e}")
+
+        for e, matched in zip(entries, matched_all):
+            i = e["index"]
+            if not matched:
+                results[i].update(_error_entry(HTTPException(status_code=404, detail="DB에 매칭된 음식이 없습니다.")))
+                continue
+            summary_items, top_summary = build_summaries(matched)
+            results[i].update({
+                "ok": True,
+                "image_path": str(e["dst"]),
+                "detected_raw": e["detections"],
+                "matched": matched,
+                "summary": {"items": summary_items},
+                "top_summary": top_summary,
+            })
+            # food_logs.image_url 로 기록된 경로에 원본 저장
+            raw, raw_suffix = uploads[i]["raw"], decoded[i][1]
+            if defer_save is not None:
+                defer_save(save_upload, raw, raw_suffix is None, e["dst"])
+            else:
+                await run_db(save_upload, raw, raw_suffix is None, e["dst"])
+
+    succeeded = sum(1 for r in results if r.get("ok"))
+    return {
+        "message": f"{len(uploads)}장 중 {succeeded}장 기록 완료",
+        "username": username,
+        "user_id": user_id,
+        "succeeded": succeeded,
+        "failed": len(uploads) - succeeded,
+        "results": results,
+        "today_totals": totals_row,
+    }
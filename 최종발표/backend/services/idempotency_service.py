@@ -0,0 +1,185 @@
+"""
+Idempotency-Key 처리 (업로드 재시도 시 추론 / food_logs 재실행 방지)
+
+흐름
+  1) claim    : (username, key) 행을 INSERT 로 선점 (UNIQUE 제약이라 동시 요청 중 하나만 성공) → 바로 commit
+  2) 이미 있으면
+       - 다른 요청 내용(request_hash 불일치)   → 422
+       - 완료된 응답이 있으면                → 저장된 status / body / headers 를 그대로 반환 (replay)
+       - 처리 중                            → 409 (IDEMPOTENCY_PENDING_TIMEOUT 초가 지난 행은 죽은 요청으로 보고 이어받음)
+  3) 처리 결과 저장: 성공과 4xx(음식 아님, 탐지 없음 등 같은 입력이면 같은 결과)는 저장, 5xx 는 행을 지워 재시도 허용
+저장 기간: IDEMPOTENCY_TTL_HOURS (기본 24). 만료 행은 claim 때 정리한다.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+import hashlib
+import json
+import os
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.utils.executors import run_db
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_PENDING_TIMEOUT = float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "300"))
+MAX_KEY_LEN = 128
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: Any
+    headers: Dict[str, str]
+
+    def to_response(self) -> JSONResponse:
+        return JSONResponse(self.body, status_code=self.status_code, headers={**self.headers, REPLAY_HEADER: "true"})
+
+    def unwrap(self) -> Dict[str, Any]:
+        """응답 객체 대신 값으로: 성공이면 body, 실패면 같은 HTTPException (async 작업 워커용)"""
+        if self.status_code < 400:
+            return self.body
+        detail = self.body.get("detail") if isinstance(self.body, dict) else self.body
+        raise HTTPException(status_code=self.status_code, detail=detail, headers=self.headers or None)
+
+
+def fingerprint(*parts: Union[bytes, str, int, float]) -> str:
+    """요청 내용 해시 (request_hash). 같은 키로 다른 사진 / 끼니를 보내면 거절하기 위함"""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else str(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _check_key(key: str) -> str:
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LEN:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key 는 1~{MAX_KEY_LEN}자여야 합니다.")
+    return key
+
+
+def claim(db: Session, username: str, key: str, request_hash: str) -> Optional[StoredResponse]:
+    """
+    처음 보는 키면 선점하고 None. 완료된 키면 저장된 응답.
+    처리 중이거나 다른 요청에 쓰인 키면 HTTPException.
+    """
+    now = datetime.now()
+    db.execute(text("DELETE FROM idempotency_keys WHERE expires_at < :now"), {"now": now})
+    try:
+        db.execute(
+            text("""
+                INSERT INTO idempotency_keys (username, idem_key, request_hash, expires_at)
+                VALUES (:u, :k, :h, :exp)
+            """),
+            {"u": username, "k": key, "h": request_hash, "exp": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)},
+        )
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+
+    row = db.execute(
+        text("""
+            SELECT request_hash, status_code, response, created_at
+            FROM idempotency_keys WHERE username = :u AND idem_key = :k
+        """),
+        {"u": username, "k": key},
+    ).fetchone()
+    if row is None:
+        # 그 사이 만료 / 삭제됨 → 다시 선점
+        return claim(db, username, key, request_hash)
+
+    stored_hash, status_code, response, created_at = row
+    if stored_hash != request_hash:
+        raise HTTPException(status_code=422, detail="같은 Idempotency-Key 가 다른 요청 내용으로 사용되었습니다.")
+    if status_code is not None:
+        payload = json.loads(response or "{}")
+        return StoredResponse(int(status_code), payload.get("body"), payload.get("headers") or {})
+
+    # 처리 중: 오래된 행은 죽은 요청으로 보고 이어받는다
+    taken = db.execute(
+        text("""
+            UPDATE idempotency_keys SET created_at = :now
+            WHERE username = :u AND idem_key = :k AND status_code IS NULL AND created_at < :stale
+        """),
+        {"u": username, "k": key, "now": now, "stale": now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT)},
+    ).rowcount
+    db.commit()
+    if taken:
+        return None
+    raise HTTPException(status_code=409, detail="같은 요청이 아직 처리 중입니다. 잠시 후 다시 시도해 주세요.")
+
+
+def complete(db: Session, username: str, key: str, stored: StoredResponse) -> None:
+    db.execute(
+        text("""
+            UPDATE idempotency_keys
+            SET status_code = :s, response = :r, expires_at = :exp
+            WHERE username = :u AND idem_key = :k
+        """),
+        {
+            "s": stored.status_code,
+            "r": json.dumps({"body": stored.body, "headers": stored.headers}, ensure_ascii=False),
+            "exp": datetime.now() + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            "u": username,
+            "k": key,
+        },
+    )
+    db.commit()
+
+
+def release(db: Session, username: str, key: str) -> None:
+    db.rollback()  # 실패한 요청의 트랜잭션이 남아 있을 수 있다
+    db.execute(
+        text("DELETE FROM idempotency_keys WHERE username = :u AND idem_key = :k AND status_code IS NULL"),
+        {"u": username, "k": key},
+    )
+    db.commit()
+
+
+async def run_idempotent(
+    db: Session,
+    username: str,
+    key: Optional[str],
+    request_hash: str,
+    run: Callable[[], Awaitable[Dict[str, Any]]],
+    as_response: bool = True,
+) -> Any:
+    """
+    key 가 없으면 run() 그대로. 있으면 claim → run() → 결과 저장.
+    replay 면 run() 을 부르지 않고 저장된 응답(JSONResponse, Idempotent-Replayed: true)을 돌려준다.
+    as_response=False 면 replay 도 값으로 (StoredResponse.unwrap)
+    """
+    if not key:
+        return await run()
+    key = _check_key(key)
+    username = username.strip()
+
+    stored = await run_db(claim, db, username, key, request_hash)
+    if stored is not None:
+        return stored.to_response() if as_response else stored.unwrap()
+
+    try:
+        body = await run()
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await run_db(release, db, username, key)
+        else:
+            await run_db(complete, db, username, key, StoredResponse(e.status_code, {"detail": e.detail}, dict(e.headers or {})))
+        raise
+    except Exception:
+        await run_db(release, db, username, key)
+        raise
+
+    body = jsonable_encoder(body)
+    await run_db(complete, db, username, key, StoredResponse(200, body, {}))
+    return body
@@ -0,0 +1,330 @@
+"""
+daily_nutrient_rollup 유지 (사용자 × 날짜 × 끼니 별 영양 합 + 기록 수)
+
+대시보드 / 추천 / 리포트 / 업로드 응답의 "오늘 누적" 이 매번 food_logs × foods 를 다시 스캔·조인하지 않도록
+food_logs 를 쓰는 트랜잭션 안에서 이 표도 같이 갱신한다 (commit 은 호출한 쪽에서).
+
+- INSERT : add_logs()        — 업로드 경로. 이미 계산한 영양 총량으로 delta upsert (추가 조회 없음)
+- UPDATE : adjust_for_logs(ids, -1) → UPDATE food_logs → adjust_for_logs(ids, +1)
+- DELETE : delete_logs(ids)  — 빼고 지운다
+- 값은 기록 시점의 foods 영양값 기준. foods 영양값을 고친 뒤 과거 합을 다시 맞추려면 backfill.
+
+정합성 점검 (helper 를 거치지 않은 food_logs 수정 / 수동 SQL / 실패한 쓰기로 어긋난 합 찾기):
+- 서버: 시작 시 run_periodic_check() 가 ROLLUP_VERIFY_INTERVAL 초마다 최근 ROLLUP_VERIFY_DAYS 일을 verify 하고
+        불일치는 경고 로그 + (ROLLUP_VERIFY_REPAIR=1 이면) 그 (사용자, 날짜)만 다시 백필. INTERVAL=0 이면 끔.
+        워커마다 돌지만 읽기 전용 검증 + 날짜 단위 백필이라 겹쳐도 결과는 같다.
+- cron / 배포 후: verify --days N 은 불일치가 있으면 exit 1 (--repair 를 주면 고치고 exit 0)
+
+복구 / 백필:
+    python -m backend.services.nutrient_rollup backfill [--start 2025-01-01] [--end 2025-01-31] [--user alice]
+    python -m backend.services.nutrient_rollup verify   [--start ...] [--end ...] [--user ...] [--repair]
+    python -m backend.services.nutrient_rollup verify --days 2          # 어제~오늘 (cron 점검용)
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import argparse
+import asyncio
+import logging
+import os
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 주기 점검: 간격(초, 0 이면 끔) / 최근 며칠 / 불일치 자동 백필 여부
+ROLLUP_VERIFY_INTERVAL = float(os.getenv("ROLLUP_VERIFY_INTERVAL", "3600"))
+ROLLUP_VERIFY_DAYS = int(os.getenv("ROLLUP_VERIFY_DAYS", "2"))
+ROLLUP_VERIFY_REPAIR = os.getenv("ROLLUP_VERIFY_REPAIR", "1").strip() == "1"
+
+NUTRIENTS = ("kcal", "protein_g", "fat_g", "carb_g", "sugar_g", "sodium_mg", "fiber_g")
+
+# verify 에서 같다고 보는 오차 (DECIMAL(12,3) 반올림)
+_TOLERANCE = 0.01
+
+Executor = Union[Session, Connection]
+RollupKey = Tuple[int, date, int]   # (user_id, log_date, meal_index)
+
+_COLS = ", ".join(NUTRIENTS)
+_ON_DUP = ",\n        ".join(f"{c} = {c} + VALUES({c})" for c in NUTRIENTS)
+
+_UPSERT = text(f"""
+    INSERT INTO daily_nutrient_rollup (user_id, log_date, meal_index, {_COLS}, log_count)
+    VALUES (:user_id, :log_date, :meal_index, {", ".join(":" + c for c in NUTRIENTS)}, :log_count)
+    ON DUPLICATE KEY UPDATE
+        {_ON_DUP},
+        log_count = log_count + VALUES(log_count)
+""")
+
+# food_logs × foods 집계 (backfill / adjust / verify 공용). {where} 자리에 조건
+_AGGREGATE = f"""
+    SELECT
+      fl.user_id              AS user_id,
+      DATE(fl.consumed_at)    AS log_date,
+      fl.meal_index           AS meal_index,
+      {", ".join(f"COALESCE(SUM(f.{c} * fl.servings), 0) AS s_{c}" for c in NUTRIENTS)},
+      COUNT(*)                AS n
+    FROM food_logs fl
+    JOIN foods f ON f.id = fl.food_id
+    WHERE {{where}}
+    GROUP BY fl.user_id, DATE(fl.consumed_at), fl.meal_index
+"""
+
+
+# ─────────────────────────────────────
+# 쓰기 (food_logs 와 같은 트랜잭션)
+# ─────────────────────────────────────
+def add_logs(db: Executor, logs: Iterable[Tuple[int, date, int, Dict[str, float]]]) -> None:
+    """
+    logs: (user_id, log_date, meal_index, 영양 총량{kcal, protein_g, ...}) — food_logs 한 행당 하나
+    같은 (user, 날짜, 끼니) 끼리 먼저 합쳐서 executemany upsert 한 번
+    """
+    grouped: Dict[RollupKey, Dict[str, float]] = {}
+    for user_id, log_date, meal_index, nutrients in logs:
+        acc = grouped.setdefault((user_id, log_date, meal_index), {**{c: 0.0 for c in NUTRIENTS}, "log_count": 0})
+        for c in NUTRIENTS:
+            acc[c] += float(nutrients.get(c) or 0.0)
+        acc["log_count"] += 1
+    if not grouped:
+        return
+    db.execute(_UPSERT, [
+        {"user_id": u, "log_date": d, "meal_index": m, **acc} for (u, d, m), acc in grouped.items()
+    ])
+
+
+def adjust_for_logs(db: Executor, log_ids: Sequence[int], sign: int) -> None:
+    """
+    food_logs 의 해당 행들 만큼 더하거나(sign=+1) 뺀다(sign=-1).
+    수정은 UPDATE 전에 -1, 후에 +1. 합이 0 건이 된 행은 지운다.
+    """
+    if not log_ids:
+        return
+    sel = ", ".join(f":sign * s_{c}" for c in NUTRIENTS)
+    db.execute(
+        text(f"""
+            INSERT INTO daily_nutrient_rollup (user_id, log_date, meal_index, {_COLS}, log_count)
+            SELECT user_id, log_date, meal_index, {sel}, :sign * n
+            FROM ({_AGGREGATE.format(where="fl.id IN :ids")}) AS d
+            ON DUPLICATE KEY UPDATE
+                {_ON_DUP},
+                log_count = log_count + VALUES(log_count)
+        """).bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(log_ids), "sign": 1 if sign >= 0 else -1},
+    )
+    if sign < 0:
+        db.execute(
+            text("""
+                DELETE FROM daily_nutrient_rollup
+                WHERE log_count <= 0 AND user_id IN (SELECT user_id FROM food_logs WHERE id IN :ids)
+            """).bindparams(bindparam("ids", expanding=True)),
+            {"ids": list(log_ids)},
+        )
+
+
+def delete_logs(db: Executor, log_ids: Sequence[int]) -> int:
+    """food_logs 행 삭제 + rollup 에서 빼기 → 지운 행 수"""
+    if not log_ids:
+        return 0
+    adjust_for_logs(db, log_ids, -1)
+    return db.execute(
+        text("DELETE FROM food_logs WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(log_ids)},
+    ).rowcount
+
+
+# ─────────────────────────────────────
+# 백필 / 검증
+# ─────────────────────────────────────
+def _range_filter(
+    start: Optional[date], end: Optional[date], user_id: Optional[int], log_prefix: str
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    (조건, 파라미터). log_prefix="fl." 이면 food_logs.consumed_at 반열림 구간, "" 면 rollup.log_date
+    """
+    conds, params = ["1=1"], {}
+    if user_id is not None:
+        conds.append(f"{log_prefix}user_id = :uid")
+        params["uid"] = user_id
+    col = "fl.consumed_at" if log_prefix else "log_date"
+    if start is not None:
+        conds.append(f"{col} >= :start")
+        params["start"] = datetime.combine(start, datetime.min.time()) if log_prefix else start
+    if end is not None:
+        conds.append(f"{col} < :end_excl" if log_prefix else f"{col} <= :end")
+        if log_prefix:
+            params["end_excl"] = datetime.combine(end + timedelta(days=1), datetime.min.time())
+        else:
+            params["end"] = end
+    return " AND ".join(conds), params
+
+
+def aggregate_sql(
+    start: Optional[date] = None, end: Optional[date] = None, user_id: Optional[int] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """food_logs × foods 원본 집계 (consumed_at 반열림 구간, ix_food_logs_user_consumed) → (SQL, 파라미터)"""
+    where, params = _range_filter(start, end, user_id, "fl.")
+    return _AGGREGATE.format(where=where), params
+
+
+def backfill(
+    db: Executor, start: Optional[date] = None, end: Optional[date] = None, user_id: Optional[int] = None
+) -> int:
+    """
+    구간의 rollup 을 지우고 food_logs × foods 에서 다시 만든다 (commit 은 호출한 쪽에서) → 만든 행 수
+    구간을 안 주면 전체 기간
+    """
+    where_r, params_r = _range_filter(start, end, user_id, "")
+    db.execute(text(f"DELETE FROM daily_nutrient_rollup WHERE {where_r}"), params_r)
+    agg, params_l = aggregate_sql(start, end, user_id)
+    return db.execute(
+        text(f"""
+            INSERT INTO daily_nutrient_rollup (user_id, log_date, meal_index, {_COLS}, log_count)
+            SELECT user_id, log_date, meal_index, {", ".join(f"s_{c}" for c in NUTRIENTS)}, n
+            FROM ({agg}) AS d
+        """),
+        params_l,
+    ).rowcount
+
+
+def verify(
+    db: Executor, start: Optional[date] = None, end: Optional[date] = None, user_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """rollup 과 food_logs 원본 집계가 다른 (user, 날짜, 끼니) 목록"""
+    agg, params_l = aggregate_sql(start, end, user_id)
+    raw = {
+        (r["user_id"], r["log_date"], r["meal_index"]): r
+        for r in db.execute(text(agg), params_l).mappings()
+    }
+    where_r, params_r = _range_filter(start, end, user_id, "")
+    rolled = {
+        (r["user_id"], r["log_date"], r["meal_index"]): r
+        for r in db.execute(
+            text(f"SELECT user_id, log_date, meal_index, {_COLS}, log_count FROM daily_nutrient_rollup WHERE {where_r}"),
+            params_r,
+        ).mappings()
+    }
+
+    diffs = []
+    for key in sorted(set(raw) | set(rolled), key=lambda k: (k[0], str(k[1]), k[2])):
+        a, b = raw.get(key), rolled.get(key)
+        expected = {**{c: float(a[f"s_{c}"]) for c in NUTRIENTS}, "log_count": int(a["n"])} if a else None
+        actual = {**{c: float(b[c]) for c in NUTRIENTS}, "log_count": int(b["log_count"])} if b else None
+        if expected is not None and actual is not None and all(
+            abs(expected[c] - actual[c]) <= _TOLERANCE for c in expected
+        ):
+            continue
+        diffs.append({
+            "user_id": key[0], "log_date": str(key[1]), "meal_index": key[2],
+            "expected": expected, "actual": actual,
+        })
+    return diffs
+
+
+def repair(db: Executor, diffs: List[Dict[str, Any]]) -> int:
+    """verify 결과의 (사용자, 날짜) 만 다시 백필 (commit 은 호출한 쪽에서) → 백필한 (사용자, 날짜) 수"""
+    days = sorted({(d["user_id"], date.fromisoformat(d["log_date"])) for d in diffs}, key=str)
+    for u, d in days:
+        backfill(db, d, d, u)
+    return len(days)
+
+
+# ─────────────────────────────────────
+# 주기 점검 (서버)
+# ─────────────────────────────────────
+def check_recent(db: Session, days: int = ROLLUP_VERIFY_DAYS, fix: bool = ROLLUP_VERIFY_REPAIR) -> Dict[str, Any]:
+    """최근 days 일(오늘 포함) verify → 불일치는 경고 로그, fix 면 백필 + commit"""
+    end = date.today()
+    start = end - timedelta(days=max(1, days) - 1)
+    diffs = verify(db, start, end)
+    repaired = 0
+    if diffs:
+        logger.warning(
+            "[rollup] %s~%s 불일치 %d건 (예: %s)", start, end, len(diffs),
+            ", ".join(f"user={d['user_id']} {d['log_date']} meal={d['meal_index']}" for d in diffs[:5]),
+        )
+        if fix:
+            repaired = repair(db, diffs)
+            db.commit()
+            logger.warning("[rollup] (사용자, 날짜) %d개 다시 백필", repaired)
+    return {"start": str(start), "end": str(end), "mismatches": len(diffs), "repaired": repaired}
+
+
+async def run_periodic_check(
+    session_factory: Callable[[], Session],
+    interval: float = ROLLUP_VERIFY_INTERVAL,
+    days: int = ROLLUP_VERIFY_DAYS,
+    fix: bool = ROLLUP_VERIFY_REPAIR,
+) -> None:
+    """interval 초마다 check_recent (이벤트 루프 밖 run_db). 점검 실패는 로그만 남기고 다음 주기에 다시"""
+    from backend.utils.executors import run_db
+
+    if interval <= 0:
+        return
+
+    def once() -> Dict[str, Any]:
+        db = session_factory()
+        try:
+            return check_recent(db, days, fix)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_db(once)
+        except Exception:
+            logger.exception("[rollup] 정합성 점검 실패")
+
+
+def _user_id(db: Session, username: Optional[str]) -> Optional[int]:
+    if not username:
+        return None
+    row = db.execute(text("SELECT id FROM users WHERE username = :u"), {"u": username}).fetchone()
+    if not row:
+        raise SystemExit(f"사용자 '{username}'를 찾을 수 없습니다.")
+    return int(row[0])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="daily_nutrient_rollup 백필 / 검증")
+    ap.add_argument("command", choices=["backfill", "verify"])
+    ap.add_argument("--start", type=date.fromisoformat, default=None, help="YYYY-MM-DD (포함)")
+    ap.add_argument("--end", type=date.fromisoformat, default=None, help="YYYY-MM-DD (포함)")
+    ap.add_argument("--user", default=None, help="username (없으면 전체 사용자)")
+    ap.add_argument("--days", type=int, default=None, help="최근 N 일 (오늘 포함, --start/--end 대신)")
+    ap.add_argument("--repair", action="store_true", help="verify 후 어긋난 (사용자, 날짜) 를 다시 백필")
+    args = ap.parse_args(argv)
+    if args.days is not None:
+        args.end = date.today()
+        args.start = args.end - timedelta(days=max(1, args.days) - 1)
+
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        uid = _user_id(db, args.user)
+        if args.command == "backfill":
+            n = backfill(db, args.start, args.end, uid)
+            db.commit()
+            print(f"[rollup] {n}개 행 다시 생성")
+            return
+
+        diffs = verify(db, args.start, args.end, uid)
+        for d in diffs[:50]:
+            print(f"  user={d['user_id']} {d['log_date']} meal={d['meal_index']}: "
+                  f"expected={d['expected']} actual={d['actual']}")
+        print(f"[rollup] 불일치 {len(diffs)}건" if diffs else "[rollup] 일치")
+        if diffs and args.repair:
+            n = repair(db, diffs)
+            db.commit()
+            print(f"[rollup] (사용자, 날짜) {n}개 다시 백필")
+        elif diffs:
+            raise SystemExit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,27 @@
 
-from datetime import date, datetime
-from typing import Dict, Tuple, List, Optional
+from datetime import date
+from typing import Dict, List, Optional
 from backend.sql import fetch_one, fetch_all
 
-def _day_range_kst(d: Optional[date] = None) -> Tuple[datetime, datetime]:
-    d = d or date.today()
-    return (datetime(d.year, d.month, d.day, 0, 0, 0),
-            datetime(d.year, d.month, d.day, 23, 59, 59))
+# 하루 합은 daily_nutrient_rollup (food_logs 기록 시 같이 갱신, services/nutrient_rollup.py) 에서 읽는다
+# PK (user_id, log_date, meal_index) 조회 — python -m backend.query_plans 가 EXPLAIN 으로 확인
+
+TOTAL_INTAKE_SQL = """
+    SELECT
+      COALESCE(SUM(r.kcal),0)               AS kcal,
+      COALESCE(SUM(r.protein_g),0)          AS protein,
+      COALESCE(SUM(r.fat_g),0)              AS fat,
+      COALESCE(SUM(r.carb_g),0)             AS carb,
+      COALESCE(SUM(r.sodium_mg)/1000.0,0)   AS sodium
+    FROM daily_nutrient_rollup r
+    JOIN users u ON u.id=r.user_id
+    WHERE u.username=:uname
+      AND r.log_date=:d
+"""
 
 def total_intake_today(username: str, target_date: Optional[date] = None) -> Dict[str, float]:
-    d0, d1 = _day_range_kst(target_date)
     row = fetch_one(
-        """
-        SELECT
-          COALESCE(SUM(f.kcal*fl.servings),0)               AS kcal,
-          COALESCE(SUM(f.protein_g*fl.servings),0)          AS protein,
-          COALESCE(SUM(f.fat_g*fl.servings),0)              AS fat,
-          COALESCE(SUM(f.carb_g*fl.servings),0)             AS carb,
-          COALESCE(SUM(f.sodium_mg*fl.servings)/1000.0,0)   AS sodium
-        FROM food_logs fl
-        JOIN foods f ON f.id=fl.food_id
-        JOIN users u ON u.id=fl.user_id
-        WHERE u.username=:uname
-          AND fl.consumed_at BETWEEN :s AND :e
-        """, {"uname": username, "s": d0, "e": d1}
+        TOTAL_INTAKE_SQL, {"uname": username, "d": target_date or date.today()}
     ) or {}
     return {
         "kcal": float(row.get("kcal", 0)),
@@ -33,38 +31,40 @@ def total_intake_today(username: str, target_date: Optional[date] = None) -> Dic
         "sodium": float(row.get("sodium", 0))
     }
 
+MEALS_DONE_SQL = """
+    SELECT COUNT(*) AS meals_done
+    FROM daily_nutrient_rollup r
+    JOIN users u ON u.id=r.user_id
+    WHERE u.username=:uname
+      AND r.log_date=:d
+      AND r.log_count > 0
+"""
+
 def meals_done_today(username: str, target_date: Optional[date] = None) -> int:
-    d0, d1 = _day_range_kst(target_date)
     row = fetch_one(
-        """
-        SELECT COUNT(DISTINCT fl.meal_index) AS meals_done
-        FROM food_logs fl
-        JOIN users u ON u.id=fl.user_id
-        WHERE u.username=:uname
-          AND fl.consumed_at BETWEEN :s AND :e
-        """, {"uname": username, "s": d0, "e": d1}
+        MEALS_DONE_SQL, {"uname": username, "d": target_date or date.today()}
     ) or {"meals_done": 0}
     return int(row["meals_done"] or 0)
 
+MEALS_BREAKDOWN_SQL = """
+    SELECT
+      r.meal_index,
+      r.kcal,
+      r.protein_g           AS protein,
+      r.fat_g               AS fat,
+      r.carb_g              AS carb,
+      r.sodium_mg/1000.0    AS sodium
+    FROM daily_nutrient_rollup r
+    JOIN users u ON u.id=r.user_id
+    WHERE u.username=:uname
+      AND r.log_date=:d
+      AND r.log_count > 0
+    ORDER BY r.meal_index
+"""
+
 def meals_breakdown_today(username: str, target_date: Optional[date] = None) -> List[Dict]:
-    d0, d1 = _day_range_kst(target_date)
     rows = fetch_all(
-        """
-        SELECT
-          fl.meal_index,
-          SUM(f.kcal*fl.servings)               AS kcal,
-          SUM(f.protein_g*fl.servings)          AS protein,
-          SUM(f.fat_g*fl.servings)              AS fat,
-          SUM(f.carb_g*fl.servings)             AS carb,
-          SUM(f.sodium_mg*fl.servings)/1000.0   AS sodium
-        FROM food_logs fl
-        JOIN foods f ON f.id=fl.food_id
-        JOIN users u ON u.id=fl.user_id
-        WHERE u.username=:uname
-          AND fl.consumed_at BETWEEN :s AND :e
-        GROUP BY fl.meal_index
-        ORDER BY fl.meal_index
-        """, {"uname": username, "s": d0, "e": d1}
+        MEALS_BREAKDOWN_SQL, {"uname": username, "d": target_date or date.today()}
     )
     return [
         {"meal_index": int(r["meal_index"]),
@@ -33,26 +33,31 @@ def _daily_targets_by_user(user_row: Any) -> Dict[str, float]:
     else:
         return {"kcal": 2000.0, "protein": 55.0, "fat": 50.0, "carb": 130.0, "sodium": 2.3}
 
+# 일자별 섭취 합 (daily_nutrient_rollup, PK (user_id, log_date, meal_index) 범위 조회) — query_plans 가 EXPLAIN 확인
+WEEKLY_INTAKE_SQL = text("""
+    SELECT
+      log_date AS d,
+      COALESCE(SUM(kcal), 0)                AS kcal,
+      COALESCE(SUM(protein_g), 0)           AS protein,
+      COALESCE(SUM(fat_g), 0)               AS fat,
+      COALESCE(SUM(carb_g), 0)              AS carb,
+      COALESCE(SUM(sodium_mg)/1000.0, 0)    AS sodium
+    FROM daily_nutrient_rollup
+    WHERE user_id = :uid
+      AND log_date >= :start AND log_date < :end_excl
+    GROUP BY log_date
+    ORDER BY d ASC
+""")
+
 def fetch_weekly_intake_per_day(db: Session, user_id: int, start_d: date, end_d: date) -> List[Dict[str, Any]]:
     """
     결과: [{"date":"YYYY-MM-DD", "kcal":..., "protein":..., "fat":..., "carb":..., "sodium":...}, ...]
     sodium: g 단위(foods.sodium_mg × servings / 1000)
+    daily_nutrient_rollup(끼니별 하루 합)에서 읽는다 — food_logs × foods 재집계 없음
     """
-    rows = db.execute(text("""
-        SELECT
-          DATE(fl.consumed_at) AS d,
-          COALESCE(SUM(f.kcal      * fl.servings), 0)            AS kcal,
-          COALESCE(SUM(f.protein_g * fl.servings), 0)            AS protein,
-          COALESCE(SUM(f.fat_g     * fl.servings), 0)            AS fat,
-          COALESCE(SUM(f.carb_g    * fl.servings), 0)            AS carb,
-          COALESCE(SUM(f.sodium_mg * fl.servings)/1000.0, 0)     AS sodium
-        FROM food_logs fl
-        JOIN foods f ON f.id = fl.food_id
-        WHERE fl.user_id = :uid
-          AND DATE(fl.consumed_at) BETWEEN :start AND :end
-        GROUP BY DATE(fl.consumed_at)
-        ORDER BY d ASC
-    """), {"uid": user_id, "start": start_d, "end": end_d}).mappings().all()
+    rows = db.execute(
+        WEEKLY_INTAKE_SQL, {"uid": user_id, "start": start_d, "end_excl": end_d + timedelta(days=1)}
+    ).mappings().all()
 
     # 빈 요일도 0으로 채우기 
     day_map = {r["d"].isoformat(): dict(r) for r in rows}
@@ -0,0 +1,71 @@
+"""
+_classify_batch (텐서 flip, max_batch 단위 chunk) 가 crop 한 장씩 TTA 한 결과와 같은지 확인
+
+- 가중치 없이 돌도록 분류기 backend 를 작은 결정적 모델로 바꿔 끼운다
+- 기준값은 예전 crop 별 경로와 같은 계산: PIL → _base_tf → forward, PIL 좌우 반전 → forward, 두 softmax 평균
+- crop 수는 홀수 / max_batch // 2 (chunk 크기) 보다 많은 경우를 포함
+"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+inference = pytest.importorskip("backend.utils.inference")
+
+from PIL import Image
+from torch import nn
+
+MAX_BATCH = 4   # chunk 당 crop 2장
+
+
+class _TinyClassifier(nn.Module):
+    """(logits [N, C], pooled [N, D]) 를 돌려주는 작은 분류기 (좌우 비대칭 conv)"""
+
+    def __init__(self, num_classes: int, dim: int = 8):
+        super().__init__()
+        self.num_features = dim
+        self.conv = nn.Conv2d(3, dim, kernel_size=5, stride=4)
+        self.head = nn.Linear(dim, num_classes)
+
+    def forward(self, x: torch.Tensor):
+        pooled = torch.relu(self.conv(x)).mean(dim=(2, 3))
+        return self.head(pooled), pooled
+
+
+@pytest.fixture
+def tiny_backend(monkeypatch):
+    torch.manual_seed(0)
+    model = _TinyClassifier(inference.NUM_CLASSES).eval()
+    monkeypatch.setattr(inference, "_get_cls_backend", lambda: model)
+    monkeypatch.setattr(inference, "INFER_MICROBATCH", False)
+    return model
+
+
+def _crops(n: int):
+    rnd = np.random.default_rng(n)
+    return [
+        Image.fromarray(rnd.integers(0, 256, (int(rnd.integers(40, 120)), int(rnd.integers(40, 120)), 3), np.uint8))
+        for _ in range(n)
+    ]
+
+
+@torch.no_grad()
+def _per_crop_tta(model: nn.Module, pil: Image.Image) -> np.ndarray:
+    def probs(p: Image.Image) -> np.ndarray:
+        logits, _ = model(inference._base_tf(p).unsqueeze(0))
+        return torch.softmax(logits, 1).squeeze(0).numpy()
+
+    return (probs(pil) + probs(pil.transpose(Image.FLIP_LEFT_RIGHT))) / 2.0
+
+
+@pytest.mark.parametrize("n", [1, MAX_BATCH // 2 + 1, 5, 2 * MAX_BATCH])
+def test_classify_batch_matches_per_crop_tta(tiny_backend, n):
+    pils = _crops(n)
+    probs, feats = inference._classify_batch(pils, max_batch=MAX_BATCH, return_features=True)
+    ref = np.stack([_per_crop_tta(tiny_backend, p) for p in pils])
+
+    assert probs.shape == ref.shape == (n, inference.NUM_CLASSES)
+    np.testing.assert_allclose(probs, ref, rtol=1e-5, atol=1e-6)
+    assert (probs.argmax(axis=1) == ref.argmax(axis=1)).all()
+    assert tuple(feats.shape) == (n, tiny_backend.num_features)
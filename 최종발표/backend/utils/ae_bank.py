@@ -0,0 +1,230 @@
+"""
+클래스별 FeatureAE 묶음(AE bank)
+
+- 시작 시 weights 디렉토리의 ae_<class>.pth / ae_<class>_threshold.txt 를 한 번에 읽어
+  레이어별 가중치를 [K, in, out] 텐서로 쌓아 둔다 (K = AE 가 있는 클래스 수).
+- score() 는 (feature, 예측 class) 쌍 여러 개를 받아 클래스별로 묶어 [G, m, D] 로 쌓고
+  층마다 baddbmm 한 번으로 모든 그룹의 재구성 오차를 계산한다.
+- quantize=True 이면 쌓지 않고 클래스별 AE 의 Linear 를 int8 동적 양자화해 그대로 쓴다 (CPU 전용).
+- 로딩이 끝난 뒤에는 읽기 전용이라 여러 스레드에서 동시에 호출해도 안전하다.
+"""
+from __future__ import annotations
+from pathlib import Path
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+AECheck = Tuple[Optional[bool], Optional[float], Optional[float]]  # (ok, err, thr)
+
+
+class FeatureAE(nn.Module):
+    """EfficientNet feature 벡터를 입력으로 받는 단순 AE"""
+
+    def __init__(self, input_dim: int, hidden_dim: int = 512, bottleneck_dim: int = 128):
+        super().__init__()
+        self.encoder = nn.Sequential(
+            nn.Linear(input_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Linear(hidden_dim, bottleneck_dim),
+        )
+        self.decoder = nn.Sequential(
+            nn.Linear(bottleneck_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Linear(hidden_dim, input_dim),
+        )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        z = self.encoder(x)
+        return self.decoder(z)
+
+
+def load_feature_ae(w_path: Path, default_feat_dim: int, device: str = "cpu") -> FeatureAE:
+    """ae_<class>.pth 체크포인트 → FeatureAE (eval)"""
+    ckpt = torch.load(w_path, map_location="cpu")
+    input_dim = ckpt.get("feat_dim", default_feat_dim)
+    hidden_dim = ckpt.get("hidden_dim", 512)
+    bottleneck_dim = ckpt.get("bottleneck_dim", 128)
+
+    ae = FeatureAE(input_dim, hidden_dim, bottleneck_dim)
+    ae.load_state_dict(ckpt["model"])
+    return ae.eval().to(device)
+
+
+def quantize_feature_ae(ae: FeatureAE) -> nn.Module:
+    """FeatureAE 의 Linear 4개를 int8 동적 양자화 (가중치 int8, activation 은 런타임 양자화)"""
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(ae.cpu().eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def _pad(t: torch.Tensor, shape: Sequence[int]) -> torch.Tensor:
+    """0으로 채워 shape 까지 확장 (hidden/bottleneck 크기가 다른 AE 를 한 텐서에 쌓기 위함)"""
+    out = t.new_zeros(shape)
+    out[tuple(slice(0, n) for n in t.shape)] = t
+    return out
+
+
+class AEBank:
+    """
+    클래스별 FeatureAE 가중치를 쌓아 둔 bank.
+
+    hidden/bottleneck 크기가 클래스마다 다르면 최대 크기로 0-padding 한다.
+    padding 된 유닛은 가중치·bias 가 0 이라 (ReLU 포함) 출력에 영향이 없다.
+    quantize=True 면 slot 별 동적 양자화 AE(self.qaes)로 계산하고 W*/b* 는 만들지 않는다.
+    """
+
+    def __init__(
+        self,
+        class_names: List[str],
+        aes: List[FeatureAE],
+        thresholds: List[float],
+        device: str = "cpu",
+        quantize: bool = False,
+    ):
+        self.quantized = bool(quantize)
+        self.device = "cpu" if self.quantized else device
+        self.class_to_slot: Dict[str, int] = {c: i for i, c in enumerate(class_names)}
+        self.feat_dim = aes[0].encoder[0].in_features if aes else 0
+
+        H = max((ae.encoder[0].out_features for ae in aes), default=0)
+        B = max((ae.encoder[2].out_features for ae in aes), default=0)
+        D = self.feat_dim
+        self.thresholds = torch.tensor(thresholds, dtype=torch.float32)
+
+        self.qaes: Optional[List[nn.Module]] = None
+        if self.quantized:
+            self.qaes = [quantize_feature_ae(ae) for ae in aes]
+            return
+        device = self.device
+
+        def stack(get, shape):
+            return torch.stack([_pad(get(ae).detach().cpu(), shape) for ae in aes], 0).to(device) \
+                if aes else torch.zeros((0, *shape), device=device)
+
+        # nn.Linear 의 weight 는 [out, in] → addmm 용으로 [in, out] 전치해 저장
+        self.W1 = stack(lambda ae: ae.encoder[0].weight.t(), (D, H))
+        self.b1 = stack(lambda ae: ae.encoder[0].bias, (H,))
+        self.W2 = stack(lambda ae: ae.encoder[2].weight.t(), (H, B))
+        self.b2 = stack(lambda ae: ae.encoder[2].bias, (B,))
+        self.W3 = stack(lambda ae: ae.decoder[0].weight.t(), (B, H))
+        self.b3 = stack(lambda ae: ae.decoder[0].bias, (H,))
+        self.W4 = stack(lambda ae: ae.decoder[2].weight.t(), (H, D))
+        self.b4 = stack(lambda ae: ae.decoder[2].bias, (D,))
+
+    @classmethod
+    def load(
+        cls,
+        weights_dir: Path,
+        class_names: List[str],
+        default_feat_dim: int,
+        device: str = "cpu",
+        quantize: bool = False,
+    ) -> "AEBank":
+        """weights_dir 에서 class_names 중 AE 가 있는 클래스를 모두 로드"""
+        names: List[str] = []
+        aes: List[FeatureAE] = []
+        thrs: List[float] = []
+        for cname in class_names:
+            w_path = weights_dir / f"ae_{cname}.pth"
+            t_path = weights_dir / f"ae_{cname}_threshold.txt"
+            if not (w_path.exists() and t_path.exists()):
+                continue
+            ae = load_feature_ae(w_path, default_feat_dim)
+            # 분류기 feature 차원과 다르면 score() 에서 쓸 수 없으므로 제외
+            feat_dim = ae.encoder[0].in_features
+            if feat_dim != default_feat_dim:
+                logger.warning(
+                    "[AEBank] feat_dim 불일치로 제외: %s (기대 %d, 실제 %d)", cname, default_feat_dim, feat_dim
+                )
+                continue
+            with open(t_path, "r", encoding="utf-8") as f:
+                thrs.append(float(f.read().strip()))
+            names.append(cname)
+            aes.append(ae)
+        return cls(names, aes, thrs, device=device, quantize=quantize)
+
+    def __len__(self) -> int:
+        return len(self.class_to_slot)
+
+    def has(self, class_name: str) -> bool:
+        return class_name in self.class_to_slot
+
+    def threshold(self, class_name: str) -> Optional[float]:
+        slot = self.class_to_slot.get(class_name)
+        return None if slot is None else float(self.thresholds[slot])
+
+    @torch.no_grad()
+    def errors(self, feats: torch.Tensor, slot: int) -> torch.Tensor:
+        """같은 클래스(slot) feature 묶음 [n, D] → 재구성 오차 [n]"""
+        x = feats.to(self.device, torch.float32)
+        if self.qaes is not None:
+            recon = self.qaes[slot](x)
+            return torch.mean((recon - x) ** 2, dim=1)
+        h = torch.relu(torch.addmm(self.b1[slot], x, self.W1[slot]))
+        z = torch.addmm(self.b2[slot], h, self.W2[slot])
+        h = torch.relu(torch.addmm(self.b3[slot], z, self.W3[slot]))
+        recon = torch.addmm(self.b4[slot], h, self.W4[slot])
+        return torch.mean((recon - x) ** 2, dim=1)
+
+    @torch.no_grad()
+    def score(self, feats: torch.Tensor, class_names: Sequence[str]) -> List[AECheck]:
+        """
+        feats: [N, D], class_names: 길이 N (각 feature 의 예측 클래스)
+        반환: 항목별 (ok, err, thr). 해당 클래스 AE 가 없으면 (None, None, None)
+        """
+        out: List[AECheck] = [(None, None, None)] * len(class_names)
+        if len(class_names) == 0 or len(self) == 0:
+            return out
+
+        feats = feats.reshape(len(class_names), -1)
+        groups: Dict[int, List[int]] = {}
+        for i, cname in enumerate(class_names):
+            slot = self.class_to_slot.get(cname)
+            if slot is not None:
+                groups.setdefault(slot, []).append(i)
+        if not groups:
+            return out
+
+        if self.qaes is not None:
+            # 동적 양자화 Linear 는 쌓을 수 없으므로 slot 별로
+            errs_by_slot = {slot: self.errors(feats[idxs], slot).cpu().tolist() for slot, idxs in groups.items()}
+        else:
+            errs_by_slot = self._errors_batched(feats, groups)
+
+        for slot, idxs in groups.items():
+            thr = float(self.thresholds[slot])
+            for i, err in zip(idxs, errs_by_slot[slot]):
+                out[i] = (err < thr, float(err), thr)
+        return out
+
+    def _errors_batched(self, feats: torch.Tensor, groups: Dict[int, List[int]]) -> Dict[int, List[float]]:
+        """
+        slot 별 feature 묶음을 [G, m, D] 로 0-padding 해 쌓고 (G = 등장한 클래스 수, m = 가장 큰 묶음)
+        쌓아 둔 [K, in, out] 가중치에서 그 slot 들만 골라 층마다 baddbmm 한 번 → slot 별 재구성 오차
+        """
+        slots = sorted(groups)
+        G, m = len(slots), max(len(groups[s]) for s in slots)
+        g_idx = [g for g, s in enumerate(slots) for _ in groups[s]]
+        pos = [j for s in slots for j in range(len(groups[s]))]
+        src = [i for s in slots for i in groups[s]]
+
+        x = torch.zeros((G, m, self.feat_dim), device=self.device, dtype=torch.float32)
+        x[g_idx, pos] = feats[src].to(self.device, torch.float32)
+
+        if slots == list(range(len(self))):
+            pick = lambda t: t                              # 모든 클래스가 등장 → 복사 없이 그대로
+        else:
+            sid = torch.tensor(slots, device=self.device)
+            pick = lambda t: t.index_select(0, sid)
+
+        h = torch.relu(torch.baddbmm(pick(self.b1).unsqueeze(1), x, pick(self.W1)))
+        z = torch.baddbmm(pick(self.b2).unsqueeze(1), h, pick(self.W2))
+        h = torch.relu(torch.baddbmm(pick(self.b3).unsqueeze(1), z, pick(self.W3)))
+        recon = torch.baddbmm(pick(self.b4).unsqueeze(1), h, pick(self.W4))
+        err = torch.mean((recon - x) ** 2, dim=2).cpu()     # [G, m] (padding 자리는 버림)
+        return {s: err[g, :len(groups[s])].tolist() for g, s in enumerate(slots)}
+
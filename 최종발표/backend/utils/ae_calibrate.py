@@ -0,0 +1,190 @@
+"""
+분류기 backbone(shared) feature 기반 클래스별 FeatureAE 재학습 + threshold 보정
+
+AE_FEATURE_SOURCE="shared" 모드에서 쓰는 AE 가중치를 만든다.
+분류기(tf_efficientnet_b4_ns)의 pooled feature 를 입력으로 학습하므로
+추론 시 별도 efficientnet_b4 없이 분류 forward 한 번으로 AE 검증까지 끝난다.
+
+사용:
+    python -m backend.utils.ae_calibrate --root /data/food20 [--epochs 10] [--classes ramen pizza]
+
+데이터 구조 (ImageFolder, 02_EfficientNet.ipynb 와 동일)
+  root/train/<class>/*.jpg   → AE 학습
+  root/val/<class>/*.jpg     → threshold 보정 / 오수락률(FAR) 측정 (없으면 train 사용)
+
+결과 (weights/ae_shared/)
+  ae_<class>.pth, ae_<class>_threshold.txt, ae_calibration.json
+"""
+from __future__ import annotations
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from backend.utils import inference as inf
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def _list_images(folder: Path) -> List[Path]:
+    if not folder.is_dir():
+        return []
+    return sorted(p for p in folder.iterdir() if p.suffix.lower() in IMG_EXTS)
+
+
+@torch.no_grad()
+def extract_shared_features(paths: List[Path], batch_size: int = 16) -> torch.Tensor:
+    """분류기 backbone pooled feature ([N, D], cpu). 추론과 같은 _base_tf 전처리를 사용"""
+    feats: List[torch.Tensor] = []
+    for i in range(0, len(paths), batch_size):
+        xs = [inf._base_tf(Image.open(p).convert("RGB")) for p in paths[i:i + batch_size]]
+        x = torch.stack(xs, 0).to(inf.DEVICE)
+        _, pooled = inf._classifier_rows(x)
+        feats.append(pooled.cpu())
+    if not feats:
+        return torch.zeros((0, inf._get_cls_backend().num_features))
+    return torch.cat(feats, 0)
+
+
+def train_feature_ae(
+    feats: torch.Tensor,
+    hidden_dim: int = 1792,
+    bottleneck_dim: int = 256,
+    epochs: int = 10,
+    lr: float = 1e-3,
+    batch_size: int = 32,
+) -> inf.FeatureAE:
+    """feature 텐서로 FeatureAE 학습 (노트북 train_oneclass_ae 와 같은 설정)"""
+    ae = inf.FeatureAE(feats.shape[1], hidden_dim, bottleneck_dim).to(inf.DEVICE)
+    crit = nn.MSELoss()
+    opt = optim.Adam(ae.parameters(), lr=lr)
+
+    dl = torch.utils.data.DataLoader(
+        torch.utils.data.TensorDataset(feats), batch_size=batch_size, shuffle=True
+    )
+    for ep in range(epochs):
+        ae.train()
+        run = 0.0
+        for (x,) in dl:
+            x = x.to(inf.DEVICE)
+            loss = crit(ae(x), x)
+            opt.zero_grad(); loss.backward(); opt.step()
+            run += loss.item() * x.size(0)
+        print(f"[AE][shared] Epoch {ep+1}/{epochs} | Loss {run/max(1, len(dl.dataset)):.6f}")
+    return ae.eval()
+
+
+@torch.no_grad()
+def recon_errors(ae: inf.FeatureAE, feats: torch.Tensor) -> np.ndarray:
+    if feats.shape[0] == 0:
+        return np.zeros((0,), dtype=np.float32)
+    x = feats.to(inf.DEVICE)
+    return torch.mean((ae(x) - x) ** 2, dim=1).cpu().numpy()
+
+
+def calibrate_threshold(errors: np.ndarray, k_std: float = 2.0, percentile: Optional[float] = None) -> float:
+    """기본: mean + k*std (노트북과 동일). percentile 지정 시 해당 분위수"""
+    if percentile is not None:
+        return float(np.percentile(errors, percentile))
+    return float(np.mean(errors) + k_std * np.std(errors))
+
+
+def calibrate_all(
+    root: Path,
+    classes: Optional[List[str]] = None,
+    out_dir: Path = inf.AE_SHARED_WEIGHTS_DIR,
+    epochs: int = 10,
+    lr: float = 1e-3,
+    hidden_dim: int = 1792,
+    bottleneck_dim: int = 256,
+    k_std: float = 2.0,
+    percentile: Optional[float] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    클래스별 AE 학습 → threshold 보정 → 저장.
+    반환/저장되는 리포트: {class: {threshold, frr, far, n_train, n_val}}
+      frr = 자기 클래스 val 중 거부된 비율, far = 다른 클래스 val 중 통과된 비율
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    target = classes or [c for c in inf.CLASS_NAMES if (root / "train" / c).is_dir()]
+    print(f"[AE][shared] Target classes: {target}")
+
+    val_root = root / "val" if (root / "val").is_dir() else root / "train"
+    val_feats: Dict[str, torch.Tensor] = {
+        c: extract_shared_features(_list_images(val_root / c))
+        for c in inf.CLASS_NAMES if (val_root / c).is_dir()
+    }
+
+    report: Dict[str, Dict[str, float]] = {}
+    for cname in target:
+        train_feats = extract_shared_features(_list_images(root / "train" / cname))
+        if train_feats.shape[0] == 0:
+            print(f"[AE][shared][{cname}] 학습 이미지 없음 → skip")
+            continue
+
+        ae = train_feature_ae(train_feats, hidden_dim, bottleneck_dim, epochs=epochs, lr=lr)
+
+        own = val_feats.get(cname)
+        if own is None or own.shape[0] == 0:
+            own = train_feats
+        thr = calibrate_threshold(recon_errors(ae, own), k_std=k_std, percentile=percentile)
+
+        others = [f for c, f in val_feats.items() if c != cname and f.shape[0] > 0]
+        other_err = recon_errors(ae, torch.cat(others, 0)) if others else np.zeros((0,))
+        own_err = recon_errors(ae, own)
+
+        torch.save({
+            "model": ae.state_dict(),
+            "feat_dim": int(train_feats.shape[1]),
+            "hidden_dim": hidden_dim,
+            "bottleneck_dim": bottleneck_dim,
+            "feature_source": "shared",
+        }, out_dir / f"ae_{cname}.pth")
+        with open(out_dir / f"ae_{cname}_threshold.txt", "w", encoding="utf-8") as f:
+            f.write(str(thr))
+
+        report[cname] = {
+            "threshold": thr,
+            "frr": float((own_err >= thr).mean()) if own_err.size else 0.0,
+            "far": float((other_err < thr).mean()) if other_err.size else 0.0,
+            "n_train": int(train_feats.shape[0]),
+            "n_val": int(own.shape[0]),
+        }
+        print(f"[AE][shared][{cname}] Saved. threshold={thr:.6f} "
+              f"frr={report[cname]['frr']:.3f} far={report[cname]['far']:.3f}")
+
+    with open(out_dir / "ae_calibration.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="shared-feature FeatureAE 재학습/threshold 보정")
+    ap.add_argument("--root", required=True, type=Path, help="ImageFolder 루트 (train/, val/)")
+    ap.add_argument("--classes", nargs="*", default=None)
+    ap.add_argument("--out-dir", type=Path, default=inf.AE_SHARED_WEIGHTS_DIR)
+    ap.add_argument("--epochs", type=int, default=10)
+    ap.add_argument("--lr", type=float, default=1e-3)
+    ap.add_argument("--hidden-dim", type=int, default=1792)
+    ap.add_argument("--bottleneck-dim", type=int, default=256)
+    ap.add_argument("--k-std", type=float, default=2.0, help="threshold = mean + k*std")
+    ap.add_argument("--percentile", type=float, default=None, help="지정 시 분위수 threshold 사용")
+    args = ap.parse_args(argv)
+
+    calibrate_all(
+        args.root, classes=args.classes, out_dir=args.out_dir,
+        epochs=args.epochs, lr=args.lr,
+        hidden_dim=args.hidden_dim, bottleneck_dim=args.bottleneck_dim,
+        k_std=args.k_std, percentile=args.percentile,
+    )
+
+
+if __name__ == "__main__":
+    main()
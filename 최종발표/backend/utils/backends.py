@@ -0,0 +1,131 @@
+"""
+추론 백엔드 (eager torch / TorchScript / ONNX Runtime)
+
+분류기와 AE feature extractor 는 같은 인터페이스로 감싼다.
+    backend(x: torch.Tensor[N,3,H,W]) -> Tuple[torch.Tensor, ...]
+      - 분류기        : (logits [N, C], pooled feature [N, D])
+      - AE extractor  : (feature [N, D],)
+    backend.num_features -> D
+
+YOLO 는 ultralytics 가 .pt / .torchscript / .onnx 를 모두 직접 읽으므로 경로만 고른다.
+
+INFER_BACKEND=eager|torchscript|onnx (기본 eager). export 결과물이 없으면 eager 로 동작한다.
+export: python -m backend.utils.export_models
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Optional, Tuple
+import json
+import logging
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "onnx")
+SUFFIX = {"torchscript": ".ts", "onnx": ".onnx"}
+
+
+class ClsWithFeatures(nn.Module):
+    """timm 분류기 → (logits, pooled feature) 를 한 번의 forward 로 반환"""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        pooled = self.model.forward_head(self.model.forward_features(x), pre_logits=True)
+        return self.model.get_classifier()(pooled), pooled
+
+
+class FeaturesOnly(nn.Module):
+    """classifier=Identity 인 feature extractor → (feature,)"""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor]:
+        return (self.model(x),)
+
+
+def artifact_path(weight_path: Path, backend: str) -> Path:
+    """weights/efficientnet/cls_food_best.pth → cls_food_best.ts / .onnx"""
+    return weight_path.with_suffix(SUFFIX[backend])
+
+
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, module: nn.Module, num_features: int):
+        self.module = module.eval()
+        self.num_features = int(num_features)
+
+    @torch.no_grad()
+    def __call__(self, x: torch.Tensor) -> Tuple[torch.Tensor, ...]:
+        return tuple(self.module(x))
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+
+    def __init__(self, path: Path, device: str = "cpu"):
+        extra = {"meta.json": ""}
+        self.module = torch.jit.load(str(path), map_location=device, _extra_files=extra).eval()
+        self.num_features = int(json.loads(extra["meta.json"] or "{}").get("num_features", 0))
+        self.device = device
+
+    @torch.no_grad()
+    def __call__(self, x: torch.Tensor) -> Tuple[torch.Tensor, ...]:
+        return tuple(self.module(x.to(self.device)))
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path: Path, device: str = "cpu", intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort  # 선택 의존성: onnx 백엔드를 쓸 때만 필요
+
+        opts = ort.SessionOptions()
+        if intra_op_threads:
+            opts.intra_op_num_threads = int(intra_op_threads)
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.num_features = int(self.session.get_outputs()[-1].shape[-1])
+        self.device = device
+
+    def __call__(self, x: torch.Tensor) -> Tuple[torch.Tensor, ...]:
+        outs = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})
+        return tuple(torch.from_numpy(o).to(self.device) for o in outs)
+
+
+def load_backend(
+    backend: str,
+    weight_path: Path,
+    build_eager,
+    device: str = "cpu",
+):
+    """
+    backend 에 맞는 export 파일(weight_path 옆의 .ts / .onnx)을 로드.
+    파일이 없으면 build_eager() → EagerBackend 로 대체한다.
+    """
+    if backend in SUFFIX:
+        path = artifact_path(weight_path, backend)
+        if path.exists():
+            if backend == "torchscript":
+                return TorchScriptBackend(path, device=device)
+            return OnnxBackend(path, device=device)
+        logger.warning("[backend] %s 없음 → eager 로 대체 (export_models 로 생성)", path)
+    return build_eager()
+
+
+def yolo_weights_for(backend: str, pt_path: Path) -> Path:
+    """ultralytics export 결과(best.torchscript / best.onnx)가 있으면 그 경로, 없으면 .pt"""
+    if backend == "torchscript":
+        cand = pt_path.with_suffix(".torchscript")
+    elif backend == "onnx":
+        cand = pt_path.with_suffix(".onnx")
+    else:
+        return pt_path
+    return cand if cand.exists() else pt_path
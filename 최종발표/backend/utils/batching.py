@@ -0,0 +1,110 @@
+"""
+요청 간 동적 마이크로배칭 (torch 를 import 하지 않는 범용 스케줄러)
+
+여러 요청 스레드가 submit() 한 입력을 전용 워커 스레드가 모아
+max_batch 만큼 차거나 max_wait_ms 가 지나면 run_batch(items) 한 번으로 처리하고,
+각 요청에는 Future 로 자기 결과만 돌려준다.
+
+- size_fn : 항목 하나가 차지하는 배치 크기 (예: 텐서 행 수). 기본 1
+- key_fn  : 같은 key 끼리만 한 배치로 묶는다 (예: YOLO imgsz/conf/iou). 기본 전부 같은 key
+"""
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import queue
+import threading
+import time
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "microbatch",
+        size_fn: Optional[Callable[[Any], int]] = None,
+        key_fn: Optional[Callable[[Any], Hashable]] = None,
+    ):
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.size_fn = size_fn or (lambda item: 1)
+        self.key_fn = key_fn or (lambda item: None)
+
+        self._q: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._carry: Optional[Tuple[Any, Future]] = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._rows = 0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    # ---------- 공개 API ----------
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        self._q.put((item, fut))
+        return fut
+
+    def __call__(self, item: Any) -> Any:
+        """submit 후 결과를 기다려 반환 (호출 스레드 블록)"""
+        return self.submit(item).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "rows": self._rows,
+                "avg_rows_per_batch": round(self._rows / self._batches, 2) if self._batches else 0.0,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+    # ---------- 워커 ----------
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        first = self._carry or self._q.get()
+        self._carry = None
+        pending = [first]
+        size = self.size_fn(first[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch:
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                break
+            try:
+                nxt = self._q.get(timeout=remain)
+            except queue.Empty:
+                break
+            n = self.size_fn(nxt[0])
+            if size + n > self.max_batch:
+                self._carry = nxt  # 다음 배치의 첫 항목으로
+                break
+            pending.append(nxt)
+            size += n
+        return pending
+
+    def _loop(self) -> None:
+        while True:
+            pending = self._collect()
+            groups: Dict[Hashable, List[Tuple[Any, Future]]] = {}
+            for item, fut in pending:
+                groups.setdefault(self.key_fn(item), []).append((item, fut))
+
+            for group in groups.values():
+                items = [it for it, _ in group]
+                try:
+                    results = self.run_batch(items)
+                except BaseException as e:
+                    for _, fut in group:
+                        fut.set_exception(e)
+                    continue
+                for (_, fut), res in zip(group, results):
+                    fut.set_result(res)
+                with self._stats_lock:
+                    self._batches += 1
+                    self._items += len(items)
+                    self._rows += sum(self.size_fn(it) for it in items)
@@ -0,0 +1,129 @@
+"""
+박스 후처리 (numpy 벡터화)
+
+boxes 형식: (N, 6) = [x1, y1, x2, y2, conf, cls]  (YOLO 결과를 그대로 쌓은 것)
+
+- pairwise_iou        : IoU 행렬 [N, M] 을 한 번에 계산
+- nms                 : IoU 행렬을 한 번만 만들고 greedy 억제 (기존 _merge_boxes_xyxy 와 같은 결과)
+- soft_nms            : 겹치는 박스를 지우지 않고 conf 를 gaussian / linear 로 감쇠
+- weighted_box_fusion : 겹치는 박스들을 conf 가중 평균 좌표 하나로 합침
+- dedup_groups        : IoU 가 높은 박스끼리 대표 박스를 정해 분류 결과를 공유 (crop dedup)
+
+nms / WBF / dedup 은 같은 greedy clustering 을 쓴다:
+conf 내림차순으로 아직 배정 안 된 박스를 leader 로 삼고, leader 와 IoU > thr 인 박스를 그 그룹에 넣는다.
+(WBF 는 원논문처럼 합쳐진 박스와 다시 비교하지 않고 leader 기준 IoU 를 쓴다 — 행렬 1회 계산)
+"""
+from __future__ import annotations
+from typing import List, Tuple
+
+import numpy as np
+
+
+def _area(b: np.ndarray) -> np.ndarray:
+    return np.maximum(0.0, b[:, 2] - b[:, 0]) * np.maximum(0.0, b[:, 3] - b[:, 1])
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a: (N, >=4), b: (M, >=4) xyxy → IoU (N, M)"""
+    a = np.asarray(a, dtype=float)[:, :4]
+    b = np.asarray(b, dtype=float)[:, :4]
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(rb - lt, 0.0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    return inter / (_area(a)[:, None] + _area(b)[None, :] - inter + 1e-9)
+
+
+def greedy_clusters(boxes: np.ndarray, scores: np.ndarray, iou_thr: float) -> Tuple[np.ndarray, List[int]]:
+    """
+    → (leader_of [N]: 각 박스가 속한 그룹 leader 의 인덱스, leaders: score 내림차순 leader 목록)
+    """
+    n = len(boxes)
+    leader_of = np.full(n, -1, dtype=int)
+    leaders: List[int] = []
+    if n == 0:
+        return leader_of, leaders
+    iou = pairwise_iou(boxes, boxes)
+    for i in np.argsort(-np.asarray(scores, dtype=float), kind="stable"):
+        if leader_of[i] >= 0:
+            continue
+        members = (leader_of < 0) & (iou[i] >= iou_thr)
+        members[i] = True
+        leader_of[members] = i
+        leaders.append(int(i))
+    return leader_of, leaders
+
+
+def nms(boxes: np.ndarray, iou_thr: float = 0.80, keep_top: int = 20) -> np.ndarray:
+    """conf 높은 박스 우선, IoU >= iou_thr 인 나머지를 억제. 최대 keep_top 개 (conf 내림차순)"""
+    if boxes.size == 0:
+        return boxes
+    _, leaders = greedy_clusters(boxes, boxes[:, 4], iou_thr)
+    return boxes[leaders[:keep_top]]
+
+
+def soft_nms(
+    boxes: np.ndarray,
+    sigma: float = 0.5,
+    iou_thr: float = 0.30,
+    score_thr: float = 0.05,
+    method: str = "gaussian",
+    keep_top: int = 50,
+) -> np.ndarray:
+    """
+    Soft-NMS: 선택된 박스와 겹치는 박스의 conf 를 감쇠
+      gaussian: conf *= exp(-iou^2 / sigma)
+      linear  : iou > iou_thr 이면 conf *= (1 - iou)
+    감쇠된 conf 가 score_thr 미만이면 버린다. 반환 boxes 의 conf 열은 감쇠된 값.
+    """
+    if boxes.size == 0:
+        return boxes
+    iou = pairwise_iou(boxes, boxes)
+    scores = boxes[:, 4].astype(float).copy()
+    alive = np.ones(len(boxes), dtype=bool)
+    keep: List[int] = []
+    while alive.any() and len(keep) < keep_top:
+        i = int(np.argmax(np.where(alive, scores, -np.inf)))
+        if scores[i] < score_thr:
+            break
+        keep.append(i)
+        alive[i] = False
+        ov = iou[i]
+        if method == "linear":
+            decay = np.where(ov > iou_thr, 1.0 - ov, 1.0)
+        else:
+            decay = np.exp(-(ov ** 2) / sigma)
+        scores = np.where(alive, scores * decay, scores)
+    out = boxes[keep].astype(float).copy()
+    out[:, 4] = scores[keep]
+    return out
+
+
+def weighted_box_fusion(boxes: np.ndarray, iou_thr: float = 0.55, keep_top: int = 50) -> np.ndarray:
+    """
+    겹치는 박스 그룹 → conf 가중 평균 좌표, conf 는 그룹 평균, cls 는 leader 의 cls
+    """
+    if boxes.size == 0:
+        return boxes
+    leader_of, leaders = greedy_clusters(boxes, boxes[:, 4], iou_thr)
+    out = []
+    for lead in leaders[:keep_top]:
+        g = boxes[leader_of == lead]
+        w = g[:, 4:5]
+        xyxy = (g[:, :4] * w).sum(0) / max(float(w.sum()), 1e-9)
+        out.append([*xyxy, float(g[:, 4].mean()), float(boxes[lead, 5])])
+    return np.asarray(out, dtype=float)
+
+
+def merge(boxes: np.ndarray, mode: str = "nms", iou_thr: float = 0.85, keep_top: int = 50) -> np.ndarray:
+    """mode: nms | soft_nms | wbf"""
+    if mode == "soft_nms":
+        return soft_nms(boxes, iou_thr=iou_thr, keep_top=keep_top)
+    if mode == "wbf":
+        return weighted_box_fusion(boxes, iou_thr=iou_thr, keep_top=keep_top)
+    return nms(boxes, iou_thr=iou_thr, keep_top=keep_top)
+
+
+def dedup_groups(boxes: np.ndarray, scores: np.ndarray, iou_thr: float) -> np.ndarray:
+    """crop dedup: 박스별 대표(leader) 인덱스 [N]. 대표 crop 만 분류하고 결과를 그룹에 공유한다."""
+    return greedy_clusters(boxes, scores, iou_thr)[0]
@@ -0,0 +1,149 @@
+"""
+crop 전처리 묶음 (분류기 / AE 입력 [n, 3, 380, 380])
+
+CropBatch 는 한 이미지의 박스 목록을 받아 필요한 crop 텐서를 만들어 주고, 만든 텐서는 캐시해
+분류기와 AE(separate extractor) 가 같은 텐서를 재사용한다. flip TTA 는 텐서 flip(-1) 으로 처리한다.
+
+mode
+  "pil" : 박스마다 pil.crop → _base_tf (Resize + ToTensor + Normalize)  — 기존 방식
+  "roi" : 이미지를 한 번만 uint8 → float 텐서로 바꾸고, 모든 박스를 torchvision roi_align 한 번으로
+          S x S 리샘플해 [N, 3, S, S] 로 모은 뒤 한 번에 정규화. CPU/GPU 모두 동작 (GPU 불필요).
+          sampling_ratio=-1 이면 bin 마다 ceil(박스 크기 / S) 개 점을 평균하므로 축소 시 antialias 와 비슷하다.
+정규화는 채널별 선형 변환이라 리샘플 뒤 작은 텐서에 한 번만 적용한다.
+ConcatCrops 는 여러 이미지의 CropBatch 를 하나처럼 묶는다 (detect_food_labels_batch).
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+import torch
+from torchvision.ops import roi_align
+
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+Box = Tuple[int, int, int, int]
+
+
+def image_to_tensor(pil: Image.Image, device: str = "cpu") -> torch.Tensor:
+    """RGB PIL → [1, 3, H, W] float 텐서 (0~255, 정규화 전)"""
+    x = torch.from_numpy(np.array(pil, dtype=np.uint8)).to(device)
+    return x.permute(2, 0, 1).unsqueeze(0).float()
+
+
+def normalize_(x: torch.Tensor) -> torch.Tensor:
+    """0~255 [N, 3, H, W] → (x/255 - mean) / std (in-place)"""
+    std = torch.tensor(STD, device=x.device).view(1, 3, 1, 1)
+    mean = torch.tensor(MEAN, device=x.device).view(1, 3, 1, 1)
+    return x.mul_(1.0 / (255.0 * std)).sub_(mean / std)
+
+
+class CropBatch:
+    def __init__(
+        self,
+        pil: Optional[Image.Image],
+        boxes: Sequence[Box],
+        size: int,
+        pil_tf: Callable[[Image.Image], torch.Tensor],
+        mode: str = "pil",
+        device: str = "cpu",
+        pils: Optional[List[Image.Image]] = None,
+    ):
+        self.pil = pil
+        self.boxes = [tuple(int(v) for v in b) for b in boxes]
+        self.size = int(size)
+        self.pil_tf = pil_tf
+        self.mode = mode if pil is not None else "pil"
+        self.device = device
+        self._pils = pils                      # 이미 잘린 crop 목록 (from_pils)
+        self._cache: Dict[int, torch.Tensor] = {}
+        self._roi: Optional[torch.Tensor] = None
+
+    @classmethod
+    def from_pils(
+        cls, pils: List[Image.Image], size: int, pil_tf: Callable[[Image.Image], torch.Tensor], device: str = "cpu",
+    ) -> "CropBatch":
+        """이미 잘린 PIL crop 목록 (기존 _classify_batch(pils) 호출 호환)"""
+        return cls(None, [(0, 0, p.width, p.height) for p in pils], size, pil_tf, "pil", device, pils=pils)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def crop_pil(self, i: int) -> Image.Image:
+        if self._pils is not None:
+            return self._pils[i]
+        return self.pil.crop(self.boxes[i])
+
+    def _roi_all(self) -> torch.Tensor:
+        if self._roi is None:
+            img = image_to_tensor(self.pil, self.device)
+            H, W = img.shape[-2:]
+            b = torch.tensor(self.boxes, dtype=torch.float32, device=self.device).view(-1, 4)
+            # 이미지 안으로 자르고 최소 1px (pil 경로의 crop 범위와 같게)
+            x1 = b[:, 0].clamp(0, W - 1)
+            y1 = b[:, 1].clamp(0, H - 1)
+            x2 = torch.maximum(x1 + 1, b[:, 2].clamp(max=W))
+            y2 = torch.maximum(y1 + 1, b[:, 3].clamp(max=H))
+            rois = torch.stack([torch.zeros_like(x1), x1, y1, x2, y2], 1)   # (batch_idx, x1, y1, x2, y2)
+            out = roi_align(
+                img, rois, output_size=(self.size, self.size),
+                spatial_scale=1.0, sampling_ratio=-1, aligned=True,
+            )
+            self._roi = normalize_(out)
+        return self._roi
+
+    def tensors(self, idx: Sequence[int], flip: bool = False) -> torch.Tensor:
+        """선택한 crop 들의 [n, 3, S, S] (flip=True 면 좌우 반전)"""
+        idx = [int(i) for i in idx]
+        if self.mode == "roi":
+            x = self._roi_all()[idx]
+        else:
+            for i in idx:
+                if i not in self._cache:
+                    self._cache[i] = self.pil_tf(self.crop_pil(i))
+            x = torch.stack([self._cache[i] for i in idx], 0).to(self.device)
+        return x.flip(-1) if flip else x
+
+
+class ConcatCrops(CropBatch):
+    """여러 이미지의 CropBatch 를 이어 붙인 것처럼 보이게 한다 (batch 업로드에서 crop 을 한 번에 분류)"""
+
+    def __init__(self, parts: Sequence[CropBatch]):
+        self.parts = list(parts)
+        first = self.parts[0] if self.parts else None
+        # 원본 이미지가 없으므로 pil 모드로 초기화하고, crop / 텐서는 part 에 위임한다
+        super().__init__(
+            None,
+            [b for p in self.parts for b in p.boxes],
+            first.size if first is not None else 0,
+            first.pil_tf if first is not None else None,
+            device=first.device if first is not None else "cpu",
+        )
+        self.offsets = np.cumsum([0] + [len(p) for p in self.parts])
+
+    def _locate(self, i: int) -> Tuple[CropBatch, int]:
+        k = int(np.searchsorted(self.offsets, i, side="right")) - 1
+        return self.parts[k], i - int(self.offsets[k])
+
+    def crop_pil(self, i: int) -> Image.Image:
+        part, j = self._locate(i)
+        return part.crop_pil(j)
+
+    def tensors(self, idx: Sequence[int], flip: bool = False) -> torch.Tensor:
+        # 같은 part 의 연속 구간끼리 묶어 part.tensors 로 가져온 뒤 원래 순서로 이어 붙인다
+        chunks: List[torch.Tensor] = []
+        run: List[int] = []
+        run_part: Optional[CropBatch] = None
+        for i in idx:
+            part, j = self._locate(int(i))
+            if part is not run_part and run:
+                chunks.append(run_part.tensors(run))
+                run = []
+            run_part = part
+            run.append(j)
+        if run:
+            chunks.append(run_part.tensors(run))
+        x = torch.cat(chunks, 0) if chunks else torch.zeros((0, 3, self.size, self.size), device=self.device)
+        return x.flip(-1) if flip else x
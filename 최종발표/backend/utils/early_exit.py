@@ -0,0 +1,84 @@
+"""
+confidence 기반 early exit 정책 (EARLY_EXIT=1)
+
+- TTA 생략 : 원본 crop 1-pass 의 top-1 확률이 클래스별 tta_conf 이상이면 flip pass 를 건너뛴다
+- AE 생략  : 예측 클래스의 기록된 FAR(오수락률)이 ae_skip_far 이하이고
+             확률이 ae_skip_conf 이상이면 AE 검증을 건너뛰고 통과로 본다
+
+FAR 출처 (뒤가 우선)
+  1) <AE weights dir>/ae_calibration.json   (ae_calibrate.py 가 기록: {"<class>": {"far": ...}})
+  2) EARLY_EXIT_CONFIG 의 classes.<class>.far
+
+EARLY_EXIT_CONFIG (JSON, 없으면 기본값만 사용)
+  {
+    "default": {"tta_conf": 0.95, "ae_skip_far": 0.01, "ae_skip_conf": 0.95},
+    "classes": {"ramen": {"tta_conf": 0.9}, "pizza": {"ae_skip_far": 0.0, "far": 0.003}}
+  }
+기록된 FAR 가 없는 클래스는 AE 를 생략하지 않는다.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"tta_conf": 0.95, "ae_skip_far": 0.01, "ae_skip_conf": 0.95}
+
+
+def _read_json(path: Optional[Path]) -> Dict[str, Any]:
+    if path is None or not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except (OSError, ValueError) as e:
+        logger.warning("[early_exit] %s 를 읽지 못해 무시: %s", path, e)
+        return {}
+
+
+class EarlyExitPolicy:
+    def __init__(
+        self,
+        default: Optional[Dict[str, float]] = None,
+        classes: Optional[Dict[str, Dict[str, float]]] = None,
+        far: Optional[Dict[str, float]] = None,
+    ):
+        self.default = {**DEFAULTS, **(default or {})}
+        self.classes = classes or {}
+        self.far_by_class: Dict[str, float] = dict(far or {})
+        for cname, over in self.classes.items():
+            if "far" in over:
+                self.far_by_class[cname] = float(over["far"])
+
+    @classmethod
+    def load(cls, config_path: Optional[Path], calibration_path: Optional[Path]) -> "EarlyExitPolicy":
+        cfg = _read_json(config_path)
+        calib = _read_json(calibration_path)
+        far = {c: float(v["far"]) for c, v in calib.items() if isinstance(v, dict) and v.get("far") is not None}
+        return cls(cfg.get("default"), cfg.get("classes"), far)
+
+    def _get(self, class_name: str, key: str) -> float:
+        return float(self.classes.get(class_name, {}).get(key, self.default[key]))
+
+    def tta_conf(self, class_name: str) -> float:
+        return self._get(class_name, "tta_conf")
+
+    def tta_conf_vector(self, class_names: List[str]) -> np.ndarray:
+        """분류기 출력 순서의 클래스별 tta_conf [C]"""
+        return np.array([self.tta_conf(c) for c in class_names], dtype=np.float32)
+
+    def far(self, class_name: str) -> Optional[float]:
+        return self.far_by_class.get(class_name)
+
+    def skip_ae(self, class_name: str, prob: float) -> bool:
+        far = self.far(class_name)
+        if far is None:
+            return False
+        return far <= self._get(class_name, "ae_skip_far") and prob >= self._get(class_name, "ae_skip_conf")
+
+    def describe(self) -> Dict[str, Any]:
+        return {"default": self.default, "classes": self.classes, "far": self.far_by_class}
@@ -0,0 +1,43 @@
+"""
+블로킹 작업 실행 풀 (async 라우트에서 이벤트 루프를 막지 않기 위함)
+
+- run_inference : 모델 추론 / 이미지 디코딩 같은 CPU 작업 → 전용 bounded 스레드 풀
+                  (torch 연산은 GIL 을 풀기 때문에 스레드로 충분하고, 모델은 워커 프로세스당 한 번만 로드)
+- run_db        : 동기 SQLAlchemy / 파일 I/O → anyio 스레드 풀 (동시 실행 수 제한)
+
+풀 크기: INFER_POOL_SIZE (기본 2), DB_POOL_SIZE (기본 16)
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import functools
+import os
+
+import anyio
+import anyio.to_thread
+
+INFER_POOL_SIZE = int(os.getenv("INFER_POOL_SIZE", "2"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+
+_infer_pool = ThreadPoolExecutor(max_workers=max(1, INFER_POOL_SIZE), thread_name_prefix="infer")
+_db_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_db_limiter() -> anyio.CapacityLimiter:
+    # CapacityLimiter 는 이벤트 루프 안에서 만들어야 한다
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(max(1, DB_POOL_SIZE))
+    return _db_limiter
+
+
+async def run_inference(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_infer_pool, functools.partial(fn, *args, **kwargs))
+
+
+async def run_db(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return await anyio.to_thread.run_sync(
+        functools.partial(fn, *args, **kwargs), limiter=_get_db_limiter()
+    )
@@ -0,0 +1,167 @@
+"""
+분류기 / AE feature extractor / YOLO 를 TorchScript · ONNX 로 export 하고 eager 와 결과를 비교
+
+사용:
+    python -m backend.utils.export_models --format onnx torchscript
+    python -m backend.utils.export_models --format onnx --targets classifier --check /data/samples
+
+결과 (weights/ 아래, 원본 가중치 옆)
+  efficientnet/cls_food_best.ts|.onnx   (출력: logits, pooled feature)
+  efficientnet/ae_backbone.ts|.onnx     (출력: feature)
+  yolo/best.torchscript|best.onnx       (ultralytics export)
+
+--check 폴더를 주면 eager 와 export 결과의 top-1 라벨 일치율 / 확률 최대 오차 / AE 입력 feature 최대 오차를 출력하고
+허용 오차(--atol)를 넘으면 종료 코드 1 로 끝난다.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+import torch
+
+from backend.utils import inference as inf
+from backend.utils.backends import (
+    ClsWithFeatures, FeaturesOnly, OnnxBackend, TorchScriptBackend, artifact_path,
+)
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def _export_module(module: torch.nn.Module, num_features: int, out: Path, fmt: str, output_names: List[str]) -> Path:
+    dummy = torch.randn(1, 3, inf.IMG_SIZE, inf.IMG_SIZE, device=inf.DEVICE)
+    module = module.eval()
+    if fmt == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace(module, dummy)
+        torch.jit.save(traced, str(out), _extra_files={"meta.json": json.dumps({"num_features": num_features})})
+    else:
+        torch.onnx.export(
+            module, (dummy,), str(out),
+            input_names=["input"],
+            output_names=output_names,
+            dynamic_axes={name: {0: "batch"} for name in ["input", *output_names]},
+            opset_version=18,
+        )
+    print(f"[export] {out}")
+    return out
+
+
+def export_classifier(fmt: str) -> Path:
+    model = inf._get_classifier()
+    return _export_module(
+        ClsWithFeatures(model), model.num_features,
+        artifact_path(inf.CLS_WEIGHTS, fmt), fmt, ["logits", "features"],
+    )
+
+
+def export_ae_extractor(fmt: str) -> Path:
+    effnet, feat_dim = inf._build_ae_feature_extractor()
+    return _export_module(
+        FeaturesOnly(effnet), feat_dim,
+        artifact_path(inf.AE_BACKBONE_WEIGHTS, fmt), fmt, ["features"],
+    )
+
+
+def export_yolo(fmt: str) -> Optional[Path]:
+    if not inf.YOLO_WEIGHTS.exists():
+        print("[export] YOLO 가중치 없음 → skip")
+        return None
+    from ultralytics import YOLO
+    out = YOLO(str(inf.YOLO_WEIGHTS)).export(
+        format=fmt, imgsz=inf.YOLO_IMGSZ, dynamic=(fmt == "onnx"),
+    )
+    print(f"[export] {out}")
+    return Path(out)
+
+
+def _load(fmt: str, path: Path):
+    return TorchScriptBackend(path, device=inf.DEVICE) if fmt == "torchscript" else OnnxBackend(path, device=inf.DEVICE)
+
+
+@torch.no_grad()
+def parity_check(folder: Path, fmt: str, targets: List[str]) -> Dict[str, Dict[str, float]]:
+    """eager 대비 top-1 일치율 / 확률·feature 최대 절대 오차"""
+    paths = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMG_EXTS)
+    if not paths:
+        raise SystemExit(f"이미지가 없습니다: {folder}")
+    x = torch.stack([inf._base_tf(Image.open(p).convert("RGB")) for p in paths], 0).to(inf.DEVICE)
+
+    report: Dict[str, Dict[str, float]] = {}
+    if "classifier" in targets:
+        ref_logits, ref_feat = ClsWithFeatures(inf._get_classifier()).eval()(x)
+        logits, feat = _load(fmt, artifact_path(inf.CLS_WEIGHTS, fmt))(x)
+        p_ref, p = torch.softmax(ref_logits, 1), torch.softmax(logits, 1)
+        report["classifier"] = {
+            "n": len(paths),
+            "top1_agree": float((p_ref.argmax(1) == p.argmax(1)).float().mean()),
+            "max_prob_diff": float((p_ref - p).abs().max()),
+            "max_feat_diff": float((ref_feat - feat).abs().max()),
+        }
+    if "ae" in targets:
+        effnet, _ = inf._build_ae_feature_extractor()
+        ref = effnet.eval()(x)
+        (feat,) = _load(fmt, artifact_path(inf.AE_BACKBONE_WEIGHTS, fmt))(x)
+        report["ae"] = {"n": len(paths), "max_feat_diff": float((ref - feat).abs().max())}
+    if "yolo" in targets and inf.YOLO_WEIGHTS.exists():
+        from ultralytics import YOLO
+        from backend.utils.backends import yolo_weights_for
+        pils = [Image.open(p).convert("RGB") for p in paths]
+        kw = dict(imgsz=inf.YOLO_IMGSZ, conf=0.25, iou=0.80, max_det=50, agnostic_nms=True, verbose=False)
+        ref = YOLO(str(inf.YOLO_WEIGHTS)).predict(source=pils, **kw)
+        out = YOLO(str(yolo_weights_for(fmt, inf.YOLO_WEIGHTS)), task="detect").predict(source=pils, **kw)
+        same = [len(a.boxes) == len(b.boxes) for a, b in zip(ref, out)]
+        report["yolo"] = {"n": len(paths), "box_count_agree": float(np.mean(same))}
+
+    for name, r in report.items():
+        print(f"[parity][{fmt}][{name}] " + " ".join(f"{k}={v:.6g}" for k, v in r.items()))
+    return report
+
+
+def _parity_ok(report: Dict[str, Dict[str, float]], atol: float) -> bool:
+    cls = report.get("classifier")
+    if cls and (cls["top1_agree"] < 1.0 or cls["max_prob_diff"] > atol):
+        return False
+    ae = report.get("ae")
+    if ae and ae["max_feat_diff"] > atol:
+        return False
+    yolo = report.get("yolo")
+    if yolo and yolo["box_count_agree"] < 1.0:
+        return False
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="TorchScript / ONNX export + parity check")
+    ap.add_argument("--format", nargs="+", choices=["torchscript", "onnx"], default=["onnx"])
+    ap.add_argument("--targets", nargs="+", choices=["classifier", "ae", "yolo"],
+                    default=["classifier", "ae", "yolo"])
+    ap.add_argument("--check", type=Path, default=None, help="parity check 용 이미지 폴더")
+    ap.add_argument("--atol", type=float, default=1e-3, help="확률 / AE 입력 feature 최대 허용 오차")
+    ap.add_argument("--skip-export", action="store_true", help="export 없이 parity check 만")
+    args = ap.parse_args(argv)
+
+    ok = True
+    for fmt in args.format:
+        if not args.skip_export:
+            if "classifier" in args.targets:
+                export_classifier(fmt)
+            if "ae" in args.targets:
+                export_ae_extractor(fmt)
+            if "yolo" in args.targets:
+                export_yolo(fmt)
+        if args.check is not None:
+            ok &= _parity_ok(parity_check(args.check, fmt, args.targets), args.atol)
+
+    if not ok:
+        print("[parity] eager 와 결과가 다릅니다")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
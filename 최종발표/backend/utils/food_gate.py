@@ -0,0 +1,232 @@
+"""
+non-food 사전 필터 (FOOD_GATE=1)
+
+스크린샷 / 영수증 / 흔들린 사진처럼 음식이 아닌 업로드를 YOLO + B4 + AE 전에 걸러낸다.
+  - embedding : timm mobilenetv3_small_100 (ImageNet, pooled feature 1024-d, 224px) — CPU 수 ms
+  - probe     : linear (logistic) 1개, threshold 는 val 셋에서 food recall 목표치로 보정
+  - score < threshold → 거절 (업로드는 422, reason=non_food)
+
+보정 (학습) :
+    python -m backend.utils.food_gate --root /data/gate
+      /data/gate/{train,val}/{food,nonfood}/*.jpg   (val 이 없으면 train 을 8:2 로 나눔)
+    결과: weights/food_gate/probe.pt  (probe 가중치 + threshold + 보정 지표)
+
+backbone 가중치는 weights/food_gate/backbone.pth 가 있으면 그것을, 없으면 timm pretrained 를 받는다.
+"""
+from __future__ import annotations
+import argparse
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import torch
+import torch.nn as nn
+from torchvision import transforms
+
+GATE_ARCH = "mobilenetv3_small_100"
+GATE_IMG_SIZE = 224
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def _gate_tf(img_size: int = GATE_IMG_SIZE):
+    return transforms.Compose([
+        transforms.Resize((img_size, img_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)),
+    ])
+
+
+def build_backbone(arch: str = GATE_ARCH, local_weights: Optional[Path] = None, device: str = "cpu") -> nn.Module:
+    import timm
+
+    if local_weights is not None and local_weights.exists():
+        model = timm.create_model(arch, pretrained=False, num_classes=0)
+        model.load_state_dict(torch.load(local_weights, map_location="cpu"), strict=False)
+    else:
+        model = timm.create_model(arch, pretrained=True, num_classes=0)
+    return model.eval().to(device)
+
+
+class FoodGate:
+    """embedding + linear probe. check() 는 여러 스레드에서 동시에 호출해도 된다 (카운터만 lock)."""
+
+    def __init__(
+        self,
+        backbone: nn.Module,
+        weight: torch.Tensor,
+        bias: torch.Tensor,
+        threshold: float,
+        img_size: int = GATE_IMG_SIZE,
+        device: str = "cpu",
+    ):
+        self.backbone = backbone.eval()
+        self.weight = weight.to(device).float().reshape(-1)
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+        self.tf = _gate_tf(img_size)
+        self.device = device
+
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+
+    @classmethod
+    def load(cls, probe_path: Path, backbone_weights: Optional[Path] = None, device: str = "cpu") -> "FoodGate":
+        ckpt = torch.load(probe_path, map_location="cpu")
+        backbone = build_backbone(ckpt.get("arch", GATE_ARCH), backbone_weights, device)
+        return cls(
+            backbone, ckpt["weight"], ckpt["bias"], ckpt["threshold"],
+            img_size=int(ckpt.get("img_size", GATE_IMG_SIZE)), device=device,
+        )
+
+    @torch.no_grad()
+    def scores(self, pils: List[Image.Image]) -> np.ndarray:
+        """food 확률 [N]"""
+        x = torch.stack([self.tf(p) for p in pils], 0).to(self.device)
+        logits = self.backbone(x) @ self.weight + self.bias
+        return torch.sigmoid(logits).cpu().numpy()
+
+    def check(self, pil: Image.Image) -> Dict[str, Any]:
+        """→ {"accepted": bool, "score": float, "threshold": float, "ms": float}"""
+        t0 = time.perf_counter()
+        score = float(self.scores([pil])[0])
+        ms = (time.perf_counter() - t0) * 1000.0
+        ok = score >= self.threshold
+        with self._lock:
+            self.total_ms += ms
+            if ok:
+                self.accepted += 1
+            else:
+                self.rejected += 1
+        return {"accepted": ok, "score": round(score, 4), "threshold": self.threshold, "ms": round(ms, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.accepted + self.rejected
+            return {
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "reject_rate": self.rejected / n if n else 0.0,
+                "avg_ms": self.total_ms / n if n else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+# =========================
+#  보정 CLI
+# =========================
+def _list(folder: Path) -> List[Path]:
+    if not folder.is_dir():
+        return []
+    return sorted(p for p in folder.rglob("*") if p.is_file() and p.suffix.lower() in IMG_EXTS)
+
+
+def _split(root: Path) -> Tuple[List[Tuple[Path, int]], List[Tuple[Path, int]]]:
+    def labeled(base: Path) -> List[Tuple[Path, int]]:
+        return [(p, 1) for p in _list(base / "food")] + [(p, 0) for p in _list(base / "nonfood")]
+
+    train, val = labeled(root / "train"), labeled(root / "val")
+    if not train:
+        train = labeled(root)
+    if not val:
+        rng = np.random.default_rng(0)
+        perm = rng.permutation(len(train))
+        cut = max(1, int(len(train) * 0.8))
+        val = [train[i] for i in perm[cut:]]
+        train = [train[i] for i in perm[:cut]]
+    return train, val
+
+
+@torch.no_grad()
+def _embed(backbone: nn.Module, paths: List[Path], img_size: int, batch_size: int = 32) -> torch.Tensor:
+    tf = _gate_tf(img_size)
+    out = []
+    for i in range(0, len(paths), batch_size):
+        x = torch.stack([tf(Image.open(p).convert("RGB")) for p in paths[i:i + batch_size]], 0)
+        out.append(backbone(x))
+    return torch.cat(out, 0)
+
+
+def train_probe(
+    feats: torch.Tensor, labels: torch.Tensor, epochs: int = 300, lr: float = 1e-2, weight_decay: float = 1e-3,
+) -> nn.Linear:
+    """logistic regression (full-batch Adam, 클래스 불균형은 pos_weight 로 보정)"""
+    probe = nn.Linear(feats.shape[1], 1)
+    pos = float(labels.sum())
+    pos_weight = torch.tensor([(len(labels) - pos) / max(pos, 1.0)])
+    loss_fn = nn.BCEWithLogitsLoss(pos_weight=pos_weight)
+    opt = torch.optim.Adam(probe.parameters(), lr=lr, weight_decay=weight_decay)
+    for _ in range(epochs):
+        with torch.enable_grad():
+            opt.zero_grad()
+            loss = loss_fn(probe(feats).squeeze(1), labels.float())
+            loss.backward()
+            opt.step()
+    return probe
+
+
+def calibrate_threshold(scores: np.ndarray, labels: np.ndarray, food_recall: float = 0.99) -> float:
+    """food 를 food_recall 이상 통과시키는 가장 높은 threshold (음식 오거절 최소화 우선)"""
+    food = np.sort(scores[labels == 1])
+    if len(food) == 0:
+        return 0.5
+    k = int(np.floor((1.0 - food_recall) * len(food)))
+    return float(food[min(k, len(food) - 1)])
+
+
+def calibrate(root: Path, out_path: Path, food_recall: float = 0.99, backbone_weights: Optional[Path] = None) -> Dict[str, Any]:
+    train, val = _split(root)
+    if not train or not val:
+        raise SystemExit(f"학습 이미지가 부족합니다: {root}/{{train,val}}/{{food,nonfood}}")
+    backbone = build_backbone(GATE_ARCH, backbone_weights)
+
+    f_tr = _embed(backbone, [p for p, _ in train], GATE_IMG_SIZE)
+    y_tr = torch.tensor([y for _, y in train])
+    probe = train_probe(f_tr, y_tr)
+
+    f_va = _embed(backbone, [p for p, _ in val], GATE_IMG_SIZE)
+    y_va = np.array([y for _, y in val])
+    with torch.no_grad():
+        s_va = torch.sigmoid(probe(f_va).squeeze(1)).numpy()
+    thr = calibrate_threshold(s_va, y_va, food_recall)
+
+    accept = s_va >= thr
+    metrics = {
+        "n_train": len(train),
+        "n_val": len(val),
+        "food_recall": float(accept[y_va == 1].mean()) if (y_va == 1).any() else None,
+        "nonfood_reject": float((~accept)[y_va == 0].mean()) if (y_va == 0).any() else None,
+    }
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save({
+        "arch": GATE_ARCH,
+        "img_size": GATE_IMG_SIZE,
+        "weight": probe.weight.detach().reshape(-1).clone(),
+        "bias": float(probe.bias.detach()),
+        "threshold": thr,
+        "target_food_recall": food_recall,
+        "metrics": metrics,
+    }, out_path)
+    print(f"[food_gate] threshold={thr:.4f} " + " ".join(f"{k}={v}" for k, v in metrics.items()))
+    print(f"[food_gate] saved {out_path}")
+    return {"threshold": thr, **metrics}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from backend.utils.model_config import FOOD_GATE_BACKBONE, FOOD_GATE_PROBE
+
+    ap = argparse.ArgumentParser(description="non-food 사전 필터 probe 학습 + threshold 보정")
+    ap.add_argument("--root", required=True, type=Path, help="{train,val}/{food,nonfood}/ 이미지 루트")
+    ap.add_argument("--out", type=Path, default=FOOD_GATE_PROBE)
+    ap.add_argument("--food-recall", type=float, default=0.99, help="val 에서 유지할 food 통과율")
+    args = ap.parse_args(argv)
+    calibrate(args.root, args.out, args.food_recall, FOOD_GATE_BACKBONE)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 from __future__ import annotations
+import atexit
+import logging
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
-import json
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from PIL import Image
@@ -12,35 +15,45 @@ from torchvision import transforms
 import timm
 from ultralytics import YOLO
 
-# =========================
-#  경로 / 기본 설정
-# =========================
-BASE_DIR     = Path(__file__).resolve().parents[1]
-WEIGHTS_DIR  = BASE_DIR / "weights"
-
-YOLO_WEIGHTS = WEIGHTS_DIR / "yolo" / "best.pt"
-CLS_WEIGHTS  = WEIGHTS_DIR / "efficientnet" / "cls_food_best.pth"
-CLASS_JSON   = WEIGHTS_DIR / "efficientnet" / "class_names.json"
+from backend.utils.ae_bank import AEBank, AECheck, FeatureAE
+from backend.utils.model_config import (
+    BASE_DIR, WEIGHTS_DIR, YOLO_WEIGHTS, CLS_WEIGHTS, CLASS_JSON,
+    AE_WEIGHTS_DIR, AE_SHARED_WEIGHTS_DIR, AE_BACKBONE_WEIGHTS,
+    AE_FEATURE_SOURCE, IMG_SIZE, CLS_MAX_BATCH, INFER_BACKEND, INFER_QUANT, CLS_INT8_WEIGHTS,
+    INFER_MICROBATCH, MICROBATCH_CLS_MAX, MICROBATCH_YOLO_MAX, MICROBATCH_MAX_WAIT_MS,
+    RESULT_CACHE_SIZE, RESULT_CACHE_HAMMING, RESULT_CACHE_PATH, CROP_DEDUP_IOU,
+    YOLO_CASCADE, YOLO_CASCADE_IMGSZ, YOLO_CASCADE_AMBIG_CONF, EARLY_EXIT, EARLY_EXIT_CONFIG, CROP_MODE,
+    FOOD_GATE, FOOD_GATE_PROBE, FOOD_GATE_BACKBONE,
+    TILE_MODE, TILE_SIZE, TILE_OVERLAP, TILE_MERGE, TILE_MERGE_IOU,
+    load_class_names, ae_weights_dir, model_version,
+)
+from backend.utils.backends import (
+    ClsWithFeatures, EagerBackend, FeaturesOnly, TorchScriptBackend, load_backend, yolo_weights_for,
+)
+from backend.utils.batching import MicroBatcher
+from backend.utils.crops import ConcatCrops, CropBatch
+from backend.utils.early_exit import EarlyExitPolicy
+from backend.utils.food_gate import FoodGate
+from backend.utils.boxes import dedup_groups, merge as merge_boxes_by, nms
+from backend.utils.ingest import ingest
+from backend.utils.model_registry import LazyValue
+from backend.utils.result_cache import ResultCache, phash
+from backend.utils.tiling import drop_edge_boxes, make_tiles, should_tile
 
-AE_WEIGHTS_DIR = WEIGHTS_DIR
+logger = logging.getLogger(__name__)
 
+# =========================
+#  기본 설정 (경로/환경변수는 model_config.py)
+# =========================
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-IMG_SIZE = 380
 
 # =========================
 #  클래스 이름 로드
 # =========================
-with open(CLASS_JSON, "r", encoding="utf-8") as f:
-    CLASS_NAMES: List[str] = json.load(f)
+CLASS_NAMES: List[str] = load_class_names()
 NUM_CLASSES = len(CLASS_NAMES)
 
-# =========================
-#  YOLO / 분류기 로드
-# =========================
-_yolo = YOLO(str(YOLO_WEIGHTS)) if YOLO_WEIGHTS.exists() else None
-
 CLS_ARCH = "tf_efficientnet_b4_ns"
-_classifier = timm.create_model(CLS_ARCH, pretrained=False, num_classes=NUM_CLASSES)
 
 
 def _load_state_dict_safely(model: nn.Module, weight_path: Path):
@@ -77,8 +90,238 @@ def _load_state_dict_safely(model: nn.Module, weight_path: Path):
         model.load_state_dict(new_sd, strict=False)
 
 
-_load_state_dict_safely(_classifier, CLS_WEIGHTS)
-_classifier.eval().to(DEVICE)
+# =========================
+#  YOLO / 분류기 (지연 로딩, model_registry 의 warm-up 에서 미리 호출)
+#  INFER_BACKEND 에 따라 eager / TorchScript / ONNX Runtime (backends.py)
+# =========================
+def _build_yolo():
+    if not YOLO_WEIGHTS.exists():
+        return None
+    return YOLO(str(yolo_weights_for(INFER_BACKEND, YOLO_WEIGHTS)), task="detect")
+
+
+def _build_classifier() -> nn.Module:
+    model = timm.create_model(CLS_ARCH, pretrained=False, num_classes=NUM_CLASSES)
+    _load_state_dict_safely(model, CLS_WEIGHTS)
+    return model.eval().to(DEVICE)
+
+
+_yolo_lazy = LazyValue(_build_yolo)
+_classifier_lazy = LazyValue(_build_classifier)
+
+
+def _get_yolo():
+    return _yolo_lazy.get()
+
+
+def _get_classifier() -> nn.Module:
+    """eager timm 모델 (eager 백엔드 / export 용)"""
+    return _classifier_lazy.get()
+
+
+def _use_int8() -> bool:
+    """INFER_QUANT=int8 이고 CPU 일 때만 양자화 경로 사용 (quantized 커널은 CPU 전용)"""
+    if INFER_QUANT != "int8":
+        return False
+    if DEVICE != "cpu":
+        logger.warning("[quant] INFER_QUANT=int8 은 CPU 전용 → fp32 로 동작")
+        return False
+    return True
+
+
+def _build_cls_backend():
+    if _use_int8():
+        if CLS_INT8_WEIGHTS.exists():
+            return TorchScriptBackend(CLS_INT8_WEIGHTS, device="cpu")
+        logger.warning("[quant] %s 없음 → fp32 분류기 사용 (backend.utils.quantize 로 생성)", CLS_INT8_WEIGHTS)
+    return load_backend(
+        INFER_BACKEND,
+        CLS_WEIGHTS,
+        lambda: EagerBackend(ClsWithFeatures(_get_classifier()), _get_classifier().num_features),
+        device=DEVICE,
+    )
+
+
+_cls_backend_lazy = LazyValue(_build_cls_backend)
+
+
+def _get_cls_backend():
+    return _cls_backend_lazy.get()
+
+# =========================
+#  forward 헬퍼 (INFER_MICROBATCH=1 이면 요청 간 마이크로배칭 경유)
+# =========================
+YOLO_IMGSZ = 960
+
+
+@torch.no_grad()
+def _classifier_rows(x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """분류기 forward → (logits [N, C], pooled feature [N, D])"""
+    logits, pooled = _get_cls_backend()(x)
+    return logits, pooled
+
+
+def _cls_run_batch(xs: List[torch.Tensor]) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+    """여러 요청의 텐서를 이어 붙여 한 번에 forward 후 요청별로 다시 자른다"""
+    sizes = [x.shape[0] for x in xs]
+    logits, pooled = _classifier_rows(torch.cat(xs, 0))
+    return list(zip(logits.split(sizes), pooled.split(sizes)))
+
+
+def _yolo_run_batch(items: List[Tuple[Image.Image, int, float, float]]) -> List[Any]:
+    """(pil, imgsz, conf, iou) 목록 → ultralytics Results 목록 (같은 파라미터끼리만 호출됨)"""
+    _, imgsz, conf, iou = items[0]
+    return list(_get_yolo().predict(
+        source=[it[0] for it in items],
+        imgsz=imgsz,
+        conf=conf,
+        iou=iou,
+        max_det=50,
+        agnostic_nms=True,
+        verbose=False,
+    ))
+
+
+_cls_batcher_lazy = LazyValue(lambda: MicroBatcher(
+    _cls_run_batch,
+    max_batch=MICROBATCH_CLS_MAX,
+    max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+    name="cls-microbatch",
+    size_fn=lambda x: int(x.shape[0]),
+))
+_yolo_batcher_lazy = LazyValue(lambda: MicroBatcher(
+    _yolo_run_batch,
+    max_batch=MICROBATCH_YOLO_MAX,
+    max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+    name="yolo-microbatch",
+    key_fn=lambda it: (it[1], it[2], it[3]),
+))
+
+
+def _classifier_forward(x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    if INFER_MICROBATCH:
+        return _cls_batcher_lazy.get()(x)
+    return _classifier_rows(x)
+
+
+def _run_yolo(pil: Image.Image, imgsz: int, conf: float, iou: float):
+    if INFER_MICROBATCH:
+        return _yolo_batcher_lazy.get()((pil, imgsz, conf, iou))
+    return _yolo_run_batch([(pil, imgsz, conf, iou)])[0]
+
+
+# =========================
+#  YOLO 해상도 cascade (YOLO_CASCADE=1): 640 → 필요할 때만 960
+# =========================
+_cascade_lock = threading.Lock()
+_cascade_counts: Dict[str, int] = {"low": 0, "high": 0, "no_boxes": 0, "ambiguous": 0}
+
+
+def _run_yolo_tiered(
+    pil: Image.Image, conf: float, iou: float, cascade: bool,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    → (ultralytics Result, stats)
+    stats = {"yolo_tier": 답을 낸 imgsz, "yolo_passes": 실행한 imgsz 목록, "escalated": None|"no_boxes"|"ambiguous", "yolo_ms"}
+    """
+    t0 = time.perf_counter()
+    if not cascade:
+        r = _run_yolo(pil, YOLO_IMGSZ, conf, iou)
+        return r, {"yolo_tier": YOLO_IMGSZ, "yolo_passes": [YOLO_IMGSZ], "escalated": None,
+                   "yolo_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+    r = _run_yolo(pil, YOLO_CASCADE_IMGSZ, conf, iou)
+    boxes = getattr(r, "boxes", None)
+    confs = boxes.conf.cpu().numpy() if boxes is not None and len(boxes) > 0 else np.zeros((0,))
+
+    reason: Optional[str] = None
+    if not (confs >= conf).any():
+        reason = "no_boxes"
+    elif ((confs >= conf) & (confs < YOLO_CASCADE_AMBIG_CONF)).any():
+        reason = "ambiguous"
+
+    passes = [YOLO_CASCADE_IMGSZ]
+    if reason is not None:
+        r = _run_yolo(pil, YOLO_IMGSZ, conf, iou)
+        passes.append(YOLO_IMGSZ)
+
+    with _cascade_lock:
+        _cascade_counts["high" if reason else "low"] += 1
+        if reason:
+            _cascade_counts[reason] += 1
+    return r, {"yolo_tier": passes[-1], "yolo_passes": passes, "escalated": reason,
+               "yolo_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def cascade_stats() -> Dict[str, Any]:
+    with _cascade_lock:
+        counts = dict(_cascade_counts)
+    answered = counts["low"] + counts["high"]
+    return {
+        "enabled": YOLO_CASCADE,
+        "tiers": [YOLO_CASCADE_IMGSZ, YOLO_IMGSZ],
+        **counts,
+        "low_tier_rate": counts["low"] / answered if answered else 0.0,
+    }
+
+
+# =========================
+#  타일(slice) 탐지: 겹치는 타일 + 전체 이미지를 YOLO 한 번에 → 원본 좌표로 병합
+# =========================
+def _yolo_boxes(r: Any) -> np.ndarray:
+    """ultralytics Result → (N, 6) [x1, y1, x2, y2, conf, cls] (Result 좌표 그대로)"""
+    b = getattr(r, "boxes", None)
+    if b is None or len(b) == 0:
+        return np.zeros((0, 6), dtype=float)
+    return np.concatenate([
+        b.xyxy.cpu().numpy(), b.conf.cpu().numpy()[:, None], b.cls.cpu().numpy()[:, None],
+    ], axis=1).astype(float)
+
+
+def _run_yolo_many(items: List[Tuple[Image.Image, int, float, float]]) -> List[Any]:
+    """같은 (imgsz, conf, iou) 입력 여러 장을 한 번에 (microbatch 켜져 있으면 batcher 에 한꺼번에 넣는다)"""
+    if INFER_MICROBATCH:
+        batcher = _yolo_batcher_lazy.get()
+        return [f.result() for f in [batcher.submit(it) for it in items]]
+    return _yolo_run_batch(items)
+
+
+def _run_yolo_tiled(pil: Image.Image, conf: float, iou: float) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    → (작업 좌표 boxes (N, 6), stats)
+    타일마다 내부 경계에 걸린 박스는 버리고 (다른 타일 / 전체 이미지 pass 가 온전한 박스를 갖는다)
+    전체 이미지 pass 박스와 함께 TILE_MERGE (기본 wbf) 로 합친다.
+    """
+    t0 = time.perf_counter()
+    W, H = pil.size
+    tiles = make_tiles(W, H, TILE_SIZE, TILE_OVERLAP)
+    items = [(pil.crop(t), TILE_SIZE, conf, iou) for t in tiles] + [(pil, TILE_SIZE, conf, iou)]
+    results = _run_yolo_many(items)
+
+    parts = [_yolo_boxes(results[-1])]
+    for t, r in zip(tiles, results[:-1]):
+        b = drop_edge_boxes(_yolo_boxes(r), t, W, H)
+        b[:, [0, 2]] += t[0]
+        b[:, [1, 3]] += t[1]
+        parts.append(b)
+    boxes = np.concatenate(parts, axis=0)
+    n_raw = len(boxes)
+    if n_raw:
+        boxes = merge_boxes_by(boxes, mode=TILE_MERGE, iou_thr=TILE_MERGE_IOU, keep_top=50)
+    return boxes, {
+        "yolo_tier": "tiled", "yolo_passes": [TILE_SIZE], "escalated": None,
+        "tiles": len(tiles), "tile_boxes_raw": n_raw,
+        "yolo_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def microbatch_stats() -> Dict[str, Any]:
+    return {
+        "enabled": INFER_MICROBATCH,
+        "classifier": _cls_batcher_lazy.get().stats() if _cls_batcher_lazy.loaded else None,
+        "yolo": _yolo_batcher_lazy.get().stats() if _yolo_batcher_lazy.loaded else None,
+    }
+
 
 # =========================
 #  공통 전처리
@@ -95,102 +338,197 @@ _base_tf = transforms.Compose(
 )
 
 
+CropsInput = Union[List[Image.Image], CropBatch]
+
+
+def _as_crops(crops: CropsInput) -> CropBatch:
+    if isinstance(crops, CropBatch):
+        return crops
+    return CropBatch.from_pils(list(crops), IMG_SIZE, _base_tf, device=DEVICE)
+
+
 @torch.no_grad()
-def _predict_probs(pil: Image.Image) -> np.ndarray:
-    """단일 이미지 확률 벡터(np.array: [C])"""
-    x = _base_tf(pil).unsqueeze(0).to(DEVICE)
-    logits = _classifier(x)
-    probs = torch.softmax(logits, 1).squeeze(0).detach().cpu().numpy()
-    return probs
+def _classify_batch(
+    pils: CropsInput,
+    max_batch: Optional[int] = None,
+    return_features: bool = False,
+) -> Tuple[np.ndarray, Optional[torch.Tensor]]:
+    """
+    여러 crop 의 TTA(horizontal flip) 평균 확률을 배치로 계산
+    - pils: PIL crop 목록 또는 CropBatch (crops.py, 텐서 캐시 / roi_align)
+    - crop 과 flip(텐서 flip) 을 [orig0, flip0, orig1, flip1, ...] 순서로 한 텐서에 쌓아 forward
+    - max_batch(기본 CLS_MAX_BATCH) 단위로 잘라 실행해 메모리 사용량을 제한
+    - return_features=True 면 원본 crop 의 pooled backbone feature([N, D])도 함께 반환
+      (AE_FEATURE_SOURCE="shared" 에서 AE 입력으로 사용)
+    반환: (probs [N, C], feats [N, D] 또는 None)
+    """
+    crops = _as_crops(pils)
+    if len(crops) == 0:
+        feats = torch.zeros((0, _get_cls_backend().num_features), device=DEVICE) if return_features else None
+        return np.zeros((0, NUM_CLASSES), dtype=np.float32), feats
+
+    max_batch = max(2, int(max_batch or CLS_MAX_BATCH))
+    per_chunk = max_batch // 2  # crop 하나당 (원본, flip) 2장
+
+    out: List[np.ndarray] = []
+    feats: List[torch.Tensor] = []
+    for i in range(0, len(crops), per_chunk):
+        o = crops.tensors(range(i, min(i + per_chunk, len(crops))))
+        x = torch.stack([o, o.flip(-1)], 1).reshape(-1, *o.shape[1:])
+        logits, pooled = _classifier_forward(x)
+        probs = torch.softmax(logits, 1).detach().cpu().numpy()
+        out.append((probs[0::2] + probs[1::2]) / 2.0)
+        if return_features:
+            feats.append(pooled[0::2])
+    return np.concatenate(out, axis=0), (torch.cat(feats, 0) if return_features else None)
 
 
 @torch.no_grad()
-def _predict_probs_tta(pil: Image.Image) -> np.ndarray:
-    """TTA(horizontal flip) 평균 확률"""
-    p1 = _predict_probs(pil)
-    p2 = _predict_probs(pil.transpose(Image.FLIP_LEFT_RIGHT))
-    return (p1 + p2) / 2.0
+def _forward_rows(
+    crops: CropBatch, max_batch: int, flip: bool, idx: Optional[Sequence[int]] = None,
+) -> Tuple[np.ndarray, torch.Tensor]:
+    """crop(또는 flip) 한 장씩 → (probs [n, C], pooled [n, D]), max_batch 단위로 forward"""
+    idx = list(range(len(crops))) if idx is None else list(idx)
+    probs: List[np.ndarray] = []
+    feats: List[torch.Tensor] = []
+    for i in range(0, len(idx), max_batch):
+        x = crops.tensors(idx[i:i + max_batch], flip=flip)
+        logits, pooled = _classifier_forward(x)
+        probs.append(torch.softmax(logits, 1).detach().cpu().numpy())
+        feats.append(pooled)
+    return np.concatenate(probs, axis=0), torch.cat(feats, 0)
 
 
-# =========================
-#  AE(오토인코더) 관련
-# =========================
-class FeatureAE(nn.Module):
-    """EfficientNet feature 벡터를 입력으로 받는 단순 AE"""
-
-    def __init__(self, input_dim: int, hidden_dim: int = 512, bottleneck_dim: int = 128):
-        super().__init__()
-        self.encoder = nn.Sequential(
-            nn.Linear(input_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, bottleneck_dim),
-        )
-        self.decoder = nn.Sequential(
-            nn.Linear(bottleneck_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Linear(hidden_dim, input_dim),
-        )
+@torch.no_grad()
+def _classify_batch_adaptive(
+    pils: CropsInput,
+    tta_conf: np.ndarray,
+    max_batch: Optional[int] = None,
+    return_features: bool = False,
+) -> Tuple[np.ndarray, Optional[torch.Tensor], np.ndarray]:
+    """
+    early exit 버전 _classify_batch
+    1) 원본 crop 만 forward
+    2) top-1 확률 < tta_conf[예측 클래스] 인 crop 만 flip forward 후 평균
+    flip 을 한 crop 의 확률은 _classify_batch 결과와 같다.
+    반환: (probs [N, C], feats [N, D] 또는 None, tta_used [N] bool)
+    """
+    crops = _as_crops(pils)
+    if len(crops) == 0:
+        probs, feats = _classify_batch(crops, max_batch=max_batch, return_features=return_features)
+        return probs, feats, np.zeros((0,), dtype=bool)
 
-    def forward(self, x: torch.Tensor) -> torch.Tensor:
-        z = self.encoder(x)
-        return self.decoder(z)
+    max_batch = max(1, int(max_batch or CLS_MAX_BATCH))
+    probs, pooled = _forward_rows(crops, max_batch, flip=False)
+    top = probs.argmax(axis=1)
+    tta_used = probs[np.arange(len(crops)), top] < tta_conf[top]
+
+    idx = np.flatnonzero(tta_used)
+    if len(idx):
+        probs_f, _ = _forward_rows(crops, max_batch, flip=True, idx=idx)
+        probs[idx] = (probs[idx] + probs_f) / 2.0
+    return probs, (pooled if return_features else None), tta_used
+
+
+_early_exit_lazy = LazyValue(
+    lambda: EarlyExitPolicy.load(EARLY_EXIT_CONFIG, _ae_weights_dir() / "ae_calibration.json")
+)
 
 
-_ae_effnet: Optional[nn.Module] = None
-_ae_feat_dim: Optional[int] = None
-_ae_models: Dict[str, FeatureAE] = {}
+def _get_early_exit_policy() -> EarlyExitPolicy:
+    return _early_exit_lazy.get()
 
 
-def _get_ae_feature_extractor() -> Tuple[nn.Module, int]:
+@torch.no_grad()
+def _predict_probs_tta_batch(
+    pils: List[Image.Image],
+    max_batch: Optional[int] = None,
+) -> np.ndarray:
     """
-    AE용 feature extractor (efficientnet_b4, classifier=Identity) lazy 로딩
+    여러 crop 의 TTA 평균 확률 (np.array: [N, C])
+    결과는 crop 한 장씩 PIL 좌우 반전으로 TTA 한 것과 같다 (tests/test_classify_parity.py).
     """
-    global _ae_effnet, _ae_feat_dim
-    if _ae_effnet is None:
-        effnet = timm.create_model("efficientnet_b4", pretrained=True)
-        feat_dim = effnet.classifier.in_features
-        effnet.classifier = nn.Identity()
-        effnet.to(DEVICE).eval()
-        _ae_effnet, _ae_feat_dim = effnet, feat_dim
-    return _ae_effnet, _ae_feat_dim  # type: ignore
+    probs, _ = _classify_batch(pils, max_batch=max_batch)
+    return probs
 
 
-def _get_ae_model_for_class(class_name: str) -> Tuple[Optional[FeatureAE], Optional[float]]:
+# =========================
+#  AE(오토인코더) 관련
+# =========================
+def _build_ae_feature_extractor() -> Tuple[nn.Module, int]:
     """
-    특정 클래스용 AE 모델과 threshold 로딩
-    weights/ae_<class>.pth, ae_<class>_threshold.txt 를 찾는다.
+    AE용 feature extractor (efficientnet_b4, classifier=Identity)
+    weights/efficientnet/ae_backbone.pth 가 있으면 그것을 쓰고,
+    없을 때만 timm pretrained 가중치를 받는다 (warm-up 스레드에서만 실행되도록).
     """
-    global _ae_models, _ae_feat_dim
+    local = AE_BACKBONE_WEIGHTS.exists()
+    effnet = timm.create_model("efficientnet_b4", pretrained=not local)
+    if local:
+        _load_state_dict_safely(effnet, AE_BACKBONE_WEIGHTS)
+    feat_dim = effnet.classifier.in_features
+    effnet.classifier = nn.Identity()
+    effnet.to(DEVICE).eval()
+    return effnet, feat_dim
+
 
-    w_path = AE_WEIGHTS_DIR / f"ae_{class_name}.pth"
-    t_path = AE_WEIGHTS_DIR / f"ae_{class_name}_threshold.txt"
-    if not (w_path.exists() and t_path.exists()):
-        return None, None
+def _build_ae_backend():
+    def eager():
+        effnet, feat_dim = _build_ae_feature_extractor()
+        return EagerBackend(FeaturesOnly(effnet), feat_dim)
+    return load_backend(INFER_BACKEND, AE_BACKBONE_WEIGHTS, eager, device=DEVICE)
 
-    if class_name not in _ae_models:
-        effnet, feat_dim = _get_ae_feature_extractor()
-        ckpt = torch.load(w_path, map_location=DEVICE)
 
-        input_dim = ckpt.get("feat_dim", feat_dim)
-        hidden_dim = ckpt.get("hidden_dim", 512)
-        bottleneck_dim = ckpt.get("bottleneck_dim", 128)
+_ae_extractor_lazy = LazyValue(_build_ae_backend)
 
-        ae = FeatureAE(input_dim, hidden_dim, bottleneck_dim).to(DEVICE)
-        ae.load_state_dict(ckpt["model"])
-        ae.eval()
-        _ae_models[class_name] = ae
 
-    with open(t_path, "r", encoding="utf-8") as f:
-        thr = float(f.read().strip())
+def _get_ae_feature_extractor() -> Tuple[Any, int]:
+    """(backend, feat_dim). backend(x) → (feature [N, D],)"""
+    backend = _ae_extractor_lazy.get()
+    return backend, backend.num_features
 
-    return _ae_models[class_name], thr
+
+def _ae_weights_dir() -> Path:
+    return ae_weights_dir()
+
+
+# 클래스별 AE + threshold 는 한 번에 로드해 bank 로 묶어 둔다
+_ae_bank_lazy = LazyValue(
+    lambda: AEBank.load(
+        _ae_weights_dir(), CLASS_NAMES, _get_cls_backend().num_features,
+        device=DEVICE, quantize=_use_int8(),
+    )
+)
+
+
+def _get_ae_bank() -> AEBank:
+    return _ae_bank_lazy.get()
+
+
+@torch.no_grad()
+def _ae_features_batch(
+    pils: CropsInput, max_batch: Optional[int] = None, idx: Optional[Sequence[int]] = None,
+) -> torch.Tensor:
+    """
+    별도 efficientnet_b4 로 여러 crop 의 feature 추출 ([N, D])
+    CropBatch 를 주면 분류 때 만든 crop 텐서를 그대로 재사용한다 (idx: 일부 crop 만)
+    """
+    effnet, feat_dim = _get_ae_feature_extractor()
+    crops = _as_crops(pils)
+    idx = list(range(len(crops))) if idx is None else list(idx)
+    if not idx:
+        return torch.zeros((0, feat_dim), device=DEVICE)
+    max_batch = max(1, int(max_batch or CLS_MAX_BATCH))
+    feats = []
+    for i in range(0, len(idx), max_batch):
+        feats.append(effnet(crops.tensors(idx[i:i + max_batch]))[0])
+    return torch.cat(feats, 0)
 
 
 @torch.no_grad()
 def _ae_check_crop(
     pil: Image.Image,
     class_name: str,
-) -> Tuple[Optional[bool], Optional[float], Optional[float]]:
+) -> AECheck:
     """
     단일 crop에 대해:
     - EfficientNet-B4 feature 추출
@@ -198,17 +536,60 @@ def _ae_check_crop(
     - threshold와 비교해 정상 여부 반환
     AE 가중치가 없으면 (None, None, None)
     """
-    effnet, _ = _get_ae_feature_extractor()
-    ae, thr = _get_ae_model_for_class(class_name)
-    if ae is None or thr is None:
+    if not _get_ae_bank().has(class_name):
         return None, None, None
+    return _ae_check_feat(_ae_features_batch([pil]), class_name)
+
+
+@torch.no_grad()
+def _ae_check_feat(
+    feat: torch.Tensor,
+    class_name: str,
+) -> AECheck:
+    """
+    이미 추출된 feature([D] 또는 [1, D])에 대해 class용 AE 재구성 오류를 threshold와 비교
+    AE 가중치가 없으면 (None, None, None)
+    """
+    return _get_ae_bank().score(feat.reshape(1, -1), [class_name])[0]
+
+
+# =========================
+#  non-food 사전 필터 (FOOD_GATE=1)
+# =========================
+def _build_food_gate() -> Optional[FoodGate]:
+    if not FOOD_GATE_PROBE.exists():
+        logger.warning("[food_gate] %s 없음 → 필터 없이 동작 (backend.utils.food_gate 로 보정)", FOOD_GATE_PROBE)
+        return None
+    return FoodGate.load(FOOD_GATE_PROBE, FOOD_GATE_BACKBONE, device=DEVICE)
 
-    x = _base_tf(pil).unsqueeze(0).to(DEVICE)
-    feat = effnet(x)  # [1, D]
-    recon = ae(feat)
-    err = torch.mean((recon - feat) ** 2).item()
-    ok = err < thr
-    return ok, err, thr
+
+_food_gate_lazy = LazyValue(_build_food_gate)
+
+
+def _get_food_gate() -> Optional[FoodGate]:
+    return _food_gate_lazy.get()
+
+
+def food_gate_stats() -> Optional[Dict[str, Any]]:
+    gate = _food_gate_lazy.get() if _food_gate_lazy.loaded else None
+    return gate.stats() if gate is not None else None
+
+
+def warmup_stages() -> List[Tuple[str, Any]]:
+    """
+    model_registry 가 순서대로 실행할 (stage 이름, 로더) 목록
+    separate 모드에서 AE 가 하나라도 있을 때만 별도 extractor 를 미리 로드한다.
+    """
+    stages: List[Tuple[str, Any]] = [
+        ("yolo", _get_yolo),
+        ("classifier", _get_cls_backend),
+        ("ae_bank", _get_ae_bank),
+    ]
+    if AE_FEATURE_SOURCE != "shared":
+        stages.append(("ae_extractor", lambda: len(_get_ae_bank()) and _get_ae_feature_extractor()))
+    if FOOD_GATE:
+        stages.append(("food_gate", _get_food_gate))
+    return stages
 
 
 # =========================
@@ -222,41 +603,56 @@ def _merge_boxes_xyxy(
     """
     boxes: (N,6) = [x1,y1,x2,y2, conf, cls]
     간단 NMS: IoU 기준으로 높은 conf 위주로 남김
-    (여러 객체 살리기 위해 iou_thr 기본 0.80로 상향)
-    """
-    if boxes.size == 0:
-        return boxes
-
-    order = boxes[:, 4].argsort()[::-1]
-    boxes = boxes[order]
-    keep = []
-    while len(boxes) > 0:
-        cur = boxes[0:1]
-        keep.append(cur)
-        if len(boxes) == 1:
-            break
-        rest = boxes[1:]
-
-        x1 = np.maximum(cur[:, 0], rest[:, 0])
-        y1 = np.maximum(cur[:, 1], rest[:, 1])
-        x2 = np.minimum(cur[:, 2], rest[:, 2])
-        y2 = np.minimum(cur[:, 3], rest[:, 3])
-        inter = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
-        area_cur = (cur[:, 2] - cur[:, 0]) * (cur[:, 3] - cur[:, 1])
-        area_rest = (rest[:, 2] - rest[:, 0]) * (rest[:, 3] - rest[:, 1])
-        iou = inter / (area_cur + area_rest - inter + 1e-9)
-        boxes = rest[iou < iou_thr]
-        if len(keep) >= keep_top:
-            break
-    return np.concatenate(keep, axis=0)
+    (여러 객체 살리기 위해 iou_thr 기본 0.80로 상향) — 구현은 boxes.nms (IoU 행렬 1회 계산)
+    """
+    return nms(boxes, iou_thr=iou_thr, keep_top=keep_top)
 
 
 # =========================
 #  최종 detect_food_labels
 # =========================
+def _build_result_cache() -> Optional[ResultCache]:
+    if RESULT_CACHE_SIZE <= 0:
+        return None
+    cache = ResultCache(
+        model_version(),
+        max_entries=RESULT_CACHE_SIZE,
+        max_hamming=RESULT_CACHE_HAMMING,
+        persist_path=Path(RESULT_CACHE_PATH) if RESULT_CACHE_PATH else None,
+    )
+    if cache.persist_path is not None:
+        atexit.register(cache.save)
+    return cache
+
+
+_result_cache_lazy = LazyValue(_build_result_cache)
+
+
+def result_cache_stats() -> Optional[Dict[str, Any]]:
+    cache = _result_cache_lazy.get()
+    return cache.stats() if cache is not None else None
+
+
+ImageInput = Union[str, Path, Image.Image, np.ndarray]
+
+
+def _load_input(image: ImageInput) -> Tuple[Image.Image, Tuple[float, float]]:
+    """
+    경로 / PIL / ndarray(HxWx3 RGB 또는 HxW, uint8) → (RGB PIL, 작업→원본 bbox 배율)
+    경로는 ingest(축소 디코딩 + EXIF 회전)를 거치고, 이미 디코딩된 이미지는 그대로 쓴다.
+    """
+    if isinstance(image, Image.Image):
+        return (image if image.mode == "RGB" else image.convert("RGB")), (1.0, 1.0)
+    if isinstance(image, np.ndarray):
+        arr = image if image.dtype == np.uint8 else np.clip(image, 0, 255).astype(np.uint8)
+        return Image.fromarray(arr).convert("RGB"), (1.0, 1.0)
+    ing = ingest(Path(image))
+    return ing.pil, ing.scale
+
+
 @torch.no_grad()
 def detect_food_labels(
-    img_path: str,
+    img_path: ImageInput,
     min_prob: float = 0.20,
     dedup: bool = False,
     yolo_conf: float = 0.25,
@@ -266,87 +662,482 @@ def detect_food_labels(
     merge_boxes: bool = False,
     aggregate: bool = False,
     require_ae: bool = False,  # AE 통과한 것만 인정할지 여부
+    cls_batch_size: Optional[int] = None,
+    image_path: Optional[str] = None,
+    bbox_scale: Optional[Tuple[float, float]] = None,
+    merge_mode: str = "nms",
+    crop_dedup_iou: Optional[float] = None,
+    yolo_cascade: Optional[bool] = None,
+    early_exit: Optional[bool] = None,
+    crop_mode: Optional[str] = None,
+    food_gate: Optional[bool] = None,
+    tiling: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
+    img_path         → 이미지 경로 또는 이미 디코딩된 PIL / ndarray(RGB). 디코딩된 이미지를 주면 디스크를 읽지 않는다.
+                       경로면 ingest.py 로 INGEST_MAX_SIDE 까지 축소 디코딩한다.
+    image_path       → 결과의 image_path 로 쓸 값 (기본: img_path 가 경로면 그 경로)
+    bbox_scale       → 입력(작업) 좌표 → 원본 좌표 배율 (sx, sy). 반환 bbox 와 min_box 는 원본 좌표 기준.
+                       축소된 PIL 을 넘길 때 IngestedImage.scale 을 같이 준다. 경로 입력이면 자동.
+
     aggregate=False  → 박스별 결과를 '그대로' 반환(같은 음식 2개면 2개로 보임)
     aggregate=True   → 라벨로 집계(기존 방식)
 
     require_ae=True  → AE 재구성 오류를 통과한 crop만 유효한 detection으로 인정
                        (해당 class용 AE 가 없으면 ae_ok=None 이고, 이 경우도 제외)
+
+    cls_batch_size   → 분류기 forward 한 번의 최대 텐서 수(crop+flip). None 이면 CLS_MAX_BATCH
+
+    merge_mode       → merge_boxes=True 일 때 박스 병합 방식: nms | soft_nms | wbf (boxes.py)
+    crop_dedup_iou   → IoU 가 이 값 이상인 crop 들은 대표 crop 하나만 분류·AE 검증하고 결과를 공유
+                       (detection 은 박스별로 그대로 남음). None 이면 CROP_DEDUP_IOU, 0 이면 끔
+    yolo_cascade     → YOLO 를 YOLO_CASCADE_IMGSZ(640)로 먼저 돌리고 박스가 없거나 애매하면 960 재실행.
+                       None 이면 YOLO_CASCADE. 어느 해상도가 답했는지는 result["stats"] 에 남는다.
+    early_exit       → 1-pass 확률이 충분히 높으면 flip TTA 생략, FAR 가 낮은 클래스는 AE 생략 (early_exit.py).
+                       None 이면 EARLY_EXIT. 켜면 detection 마다 "shortcuts" (["no_tta", "ae_skipped"]) 를 남긴다.
+    crop_mode        → "pil" | "roi" (crops.py). roi 는 이미지를 한 번만 텐서로 바꾸고 roi_align 으로 일괄 crop.
+                       None 이면 CROP_MODE. 분류와 AE(separate) 가 같은 crop 텐서를 쓴다.
+    food_gate        → YOLO 전에 non-food 필터(food_gate.py) 실행. 거절되면 detections 없이
+                       result["rejected"] = "non_food" 로 바로 반환. None 이면 FOOD_GATE
+    tiling           → "auto" | "on" | "off" (tiling.py). auto 는 원본이 크거나(TILE_MIN_MP) 가로로 긴
+                       (TILE_MIN_ASPECT) 사진만 겹치는 타일 + 전체 이미지를 한 번에 YOLO 에 넣고 병합한다.
+                       None 이면 TILE_MODE. 타일 모드에선 yolo_cascade 를 쓰지 않는다.
+
+    같은(또는 거의 같은) 이미지 + 같은 파라미터면 결과 캐시(result_cache.py)에서 바로 반환한다.
     """
-    pil = Image.open(img_path).convert("RGB")
-    W, H = pil.size
+    pil, auto_scale = _load_input(img_path)
+    bbox_scale = tuple(bbox_scale or auto_scale)
+    orig_size = (int(round(pil.size[0] * bbox_scale[0])), int(round(pil.size[1] * bbox_scale[1])))
+    if image_path is None and isinstance(img_path, (str, Path)):
+        image_path = str(img_path)
+    params = _resolve_params(
+        orig_size,
+        min_prob=min_prob, dedup=dedup, yolo_conf=yolo_conf, yolo_iou=yolo_iou,
+        min_box=min_box, topk_limit=topk_limit, merge_boxes=merge_boxes,
+        aggregate=aggregate, require_ae=require_ae, merge_mode=merge_mode,
+        crop_dedup_iou=crop_dedup_iou, yolo_cascade=yolo_cascade, early_exit=early_exit,
+        crop_mode=crop_mode, food_gate=food_gate, tiling=tiling,
+    )
 
-    # 1) YOLO 감지
-    crops: List[Tuple[Image.Image, float, Tuple[int, int, int, int]]] = []
-    detections: List[Dict[str, Any]] = []
+    cache = _result_cache_lazy.get()
+    if cache is None:
+        return _detect_on_image(pil, image_path, cls_batch_size=cls_batch_size, bbox_scale=bbox_scale, **params)
+
+    h = phash(pil)
+    hit = cache.get(pil, params, h=h, size=orig_size)
+    if hit is not None:
+        hit["image_path"] = image_path
+        hit.setdefault("stats", {})["cache_hit"] = True
+        return hit
+    result = _detect_on_image(pil, image_path, cls_batch_size=cls_batch_size, bbox_scale=bbox_scale, **params)
+    cache.put(pil, params, result, h=h, size=orig_size)
+    return result
+
+
+def _resolve_params(
+    orig_size: Tuple[int, int],
+    min_prob: float = 0.20,
+    dedup: bool = False,
+    yolo_conf: float = 0.25,
+    yolo_iou: float = 0.80,
+    min_box: int = 16,
+    topk_limit: int = 5,
+    merge_boxes: bool = False,
+    aggregate: bool = False,
+    require_ae: bool = False,
+    merge_mode: str = "nms",
+    crop_dedup_iou: Optional[float] = None,
+    yolo_cascade: Optional[bool] = None,
+    early_exit: Optional[bool] = None,
+    crop_mode: Optional[str] = None,
+    food_gate: Optional[bool] = None,
+    tiling: Optional[str] = None,
+) -> Dict[str, Any]:
+    """None 인 옵션을 설정값으로 채운 실행 파라미터 (결과 캐시 키로도 쓰인다)"""
+    return dict(
+        min_prob=min_prob, dedup=dedup, yolo_conf=yolo_conf, yolo_iou=yolo_iou,
+        min_box=min_box, topk_limit=topk_limit, merge_boxes=merge_boxes,
+        aggregate=aggregate, require_ae=require_ae, merge_mode=merge_mode,
+        crop_dedup_iou=CROP_DEDUP_IOU if crop_dedup_iou is None else float(crop_dedup_iou),
+        yolo_cascade=YOLO_CASCADE if yolo_cascade is None else bool(yolo_cascade),
+        early_exit=EARLY_EXIT if early_exit is None else bool(early_exit),
+        crop_mode=(crop_mode or CROP_MODE),
+        food_gate=FOOD_GATE if food_gate is None else bool(food_gate),
+        tiled=should_tile(*orig_size, mode=(tiling or TILE_MODE)),
+    )
+
+
+@torch.no_grad()
+def detect_food_labels_batch(
+    images: Sequence[ImageInput],
+    image_paths: Optional[Sequence[Optional[str]]] = None,
+    bbox_scales: Optional[Sequence[Optional[Tuple[float, float]]]] = None,
+    cls_batch_size: Optional[int] = None,
+    **options: Any,
+) -> List[Dict[str, Any]]:
+    """
+    여러 이미지를 한 번에 탐지 (batch 업로드). options 는 detect_food_labels 와 같다.
+    결과는 이미지 순서대로 detect_food_labels 와 같은 dict 목록.
+
+    - 결과 캐시 hit 은 바로 반환
+    - YOLO: 타일 / cascade 대상이 아닌 이미지는 (conf, iou) 가 같으니 predict 한 번에 묶는다
+    - 분류 / AE: (require_ae, early_exit) 가 같은 이미지들의 대표 crop 을 ConcatCrops 로 이어 붙여 batched forward 한 번으로 채점
+    """
+    n = len(images)
+    results: List[Optional[Dict[str, Any]]] = [None] * n
+    cache = _result_cache_lazy.get()
+
+    todo: List[Dict[str, Any]] = []
+    for i, image in enumerate(images):
+        pil, auto_scale = _load_input(image)
+        scale = tuple((bbox_scales[i] if bbox_scales is not None else None) or auto_scale)
+        orig_size = (int(round(pil.size[0] * scale[0])), int(round(pil.size[1] * scale[1])))
+        path = image_paths[i] if image_paths is not None else None
+        if path is None and isinstance(image, (str, Path)):
+            path = str(image)
+        params = _resolve_params(orig_size, **options)
+        job = {"i": i, "pil": pil, "path": path, "scale": scale, "orig_size": orig_size,
+               "params": params, "h": None, "stats": _new_stats()}
+        if cache is not None:
+            job["h"] = phash(pil)
+            hit = cache.get(pil, params, h=job["h"], size=orig_size)
+            if hit is not None:
+                hit["image_path"] = path
+                hit.setdefault("stats", {})["cache_hit"] = True
+                results[i] = hit
+                continue
+        # 0) non-food 사전 필터
+        if not _food_gate_passes(pil, params["food_gate"], job["stats"]):
+            results[i] = _rejected_result(path, job["stats"])
+            continue
+        todo.append(job)
 
-    if _yolo is not None:
-        rs = _yolo.predict(
-            source=pil,
-            imgsz=960,
-            conf=yolo_conf,
-            iou=yolo_iou,
-            max_det=50,
-            agnostic_nms=True,
-            verbose=False,
+    # 1) YOLO: 일반 경로 이미지는 (conf, iou) 별로 predict 한 번
+    if _get_yolo() is not None:
+        groups: Dict[Tuple[float, float], List[Dict[str, Any]]] = {}
+        for job in todo:
+            p = job["params"]
+            if not p["tiled"] and not p["yolo_cascade"]:
+                groups.setdefault((p["yolo_conf"], p["yolo_iou"]), []).append(job)
+        for (conf, iou), jobs in groups.items():
+            t0 = time.perf_counter()
+            rs = _run_yolo_many([(job["pil"], YOLO_IMGSZ, conf, iou) for job in jobs])
+            ms = round((time.perf_counter() - t0) * 1000, 1)
+            for job, r in zip(jobs, rs):
+                job["raw"] = _yolo_boxes(r)
+                job["stats"].update({"yolo_tier": YOLO_IMGSZ, "yolo_passes": [YOLO_IMGSZ], "escalated": None,
+                                     "yolo_ms": ms, "yolo_batch": len(jobs)})
+
+    # 2) 이미지별 crop / dedup → 3) 전체 대표 crop 을 한 번에 분류 + AE
+    for job in todo:
+        p = job["params"]
+        job["crops"] = _yolo_crops(
+            job["pil"], p["yolo_conf"], p["yolo_iou"], p["min_box"], p["merge_boxes"], p["merge_mode"],
+            p["yolo_cascade"], p["tiled"], job["scale"], job["stats"], raw=job.get("raw"),
+        )
+        job["ucrops"], job["inv"] = _unique_crops(job["pil"], job["crops"], p["crop_dedup_iou"], p["crop_mode"])
+
+    # 채점 옵션(require_ae, early_exit)이 같은 이미지끼리 묶어 그룹마다 batched forward 한 번
+    by_flags: Dict[Tuple[bool, bool], List[Dict[str, Any]]] = {}
+    for job in todo:
+        p = job["params"]
+        by_flags.setdefault((p["require_ae"], p["early_exit"]), []).append(job)
+
+    for (require_ae, early_exit), jobs in by_flags.items():
+        concat = ConcatCrops([job["ucrops"] for job in jobs])
+        scores = _score_crops(concat, require_ae, early_exit, cls_batch_size)
+        for k, job in enumerate(jobs):
+            p = job["params"]
+            part = scores.slice(int(concat.offsets[k]), int(concat.offsets[k + 1]))
+            job["stats"]["cls_batch_images"] = len(jobs)
+            result = _assemble_result(
+                job["pil"], job["path"], job["crops"], job["inv"], part,
+                min_prob=p["min_prob"], dedup=p["dedup"], topk_limit=p["topk_limit"],
+                aggregate=p["aggregate"], require_ae=p["require_ae"], early_exit=p["early_exit"],
+                bbox_scale=job["scale"], stats=job["stats"],
+            )
+            if cache is not None:
+                cache.put(job["pil"], p, result, h=job["h"], size=job["orig_size"])
+            results[job["i"]] = result
+    return results  # type: ignore[return-value]
+
+
+# =========================
+#  탐지 단계 (detect_food_labels / detect_food_labels_batch 공용)
+# =========================
+Box = Tuple[int, int, int, int]
+
+
+class _CropScores(NamedTuple):
+    """대표 crop 별 분류 + AE 결과 (batch 에선 여러 이미지 것을 한 번에 채점한 뒤 slice 로 나눈다)"""
+    probs: np.ndarray              # [N, C]
+    pred: np.ndarray               # [N]
+    labels: List[str]
+    checks: List[AECheck]
+    shortcuts: List[List[str]]
+    tta_used: np.ndarray           # [N] bool
+
+    def slice(self, a: int, b: int) -> "_CropScores":
+        return _CropScores(
+            self.probs[a:b], self.pred[a:b], self.labels[a:b],
+            self.checks[a:b], self.shortcuts[a:b], self.tta_used[a:b],
         )
-        r = rs[0]
+
+
+def _new_stats() -> Dict[str, Any]:
+    # 요청별 처리 통계 (result["stats"])
+    return {"yolo_tier": None, "yolo_passes": [], "escalated": None}
+
+
+def _food_gate_passes(pil: Image.Image, food_gate: bool, stats: Dict[str, Any]) -> bool:
+    """non-food 사전 필터: 거절이면 YOLO / 분류기 / AE 를 돌리지 않는다"""
+    gate = _get_food_gate() if food_gate else None
+    if gate is None:
+        return True
+    stats["food_gate"] = gate.check(pil)
+    return bool(stats["food_gate"]["accepted"])
+
+
+def _rejected_result(img_path: Optional[str], stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "image_path": img_path,
+        "labels": [],
+        "counts": {},
+        "num_detections": 0,
+        "items": [],
+        "detections": [],
+        "rejected": "non_food",
+        "stats": stats,
+    }
+
+
+def _yolo_crops(
+    pil: Image.Image,
+    yolo_conf: float,
+    yolo_iou: float,
+    min_box: int,
+    merge_boxes: bool,
+    merge_mode: str,
+    yolo_cascade: bool,
+    tiled: bool,
+    bbox_scale: Tuple[float, float],
+    stats: Dict[str, Any],
+    raw: Optional[np.ndarray] = None,
+) -> List[Tuple[float, Box]]:
+    """
+    YOLO 감지 → (yolo conf, 작업 좌표 box) 목록. 박스가 없으면 이미지 전체 하나.
+    raw: 이미 돌린 YOLO 박스 (N, 6) — batch 에서 predict 를 묶어 실행한 경우
+    """
+    W, H = pil.size
+    sx, sy = bbox_scale
+    crops: List[Tuple[float, Box]] = []
+
+    if _get_yolo() is not None:
+        if raw is None:
+            if tiled:
+                raw, yolo_stats = _run_yolo_tiled(pil, yolo_conf, yolo_iou)
+            else:
+                r, yolo_stats = _run_yolo_tiered(pil, yolo_conf, yolo_iou, yolo_cascade)
+                raw = _yolo_boxes(r)
+            stats.update(yolo_stats)
         boxes = []
-        if getattr(r, "boxes", None) is not None and len(r.boxes) > 0:
-            xyxy = r.boxes.xyxy.cpu().numpy()
-            conf = r.boxes.conf.cpu().numpy()
-            cls  = r.boxes.cls.cpu().numpy()
-            for (x1, y1, x2, y2), c, cl in zip(xyxy, conf, cls):
-                x1 = int(max(0, min(x1, W - 1)))
-                y1 = int(max(0, min(y1, H - 1)))
-                x2 = int(max(0, min(x2, W)))
-                y2 = int(max(0, min(y2, H)))
-                if (x2 - x1) < min_box or (y2 - y1) < min_box:
-                    continue
-                boxes.append([x1, y1, x2, y2, float(c), float(cl)])
+        for x1, y1, x2, y2, c, cl in raw:
+            x1 = int(max(0, min(x1, W - 1)))
+            y1 = int(max(0, min(y1, H - 1)))
+            x2 = int(max(0, min(x2, W)))
+            y2 = int(max(0, min(y2, H)))
+            if (x2 - x1) * sx < min_box or (y2 - y1) * sy < min_box:
+                continue
+            boxes.append([x1, y1, x2, y2, float(c), float(cl)])
 
         if boxes:
             boxes = np.array(boxes, dtype=float)
             if merge_boxes:
-                boxes = _merge_boxes_xyxy(boxes, iou_thr=0.85, keep_top=50)
+                boxes = merge_boxes_by(boxes, mode=merge_mode, iou_thr=0.85, keep_top=50)
             for x1, y1, x2, y2, c, _ in boxes:
-                crops.append(
-                    (
-                        pil.crop((int(x1), int(y1), int(x2), int(y2))),
-                        float(c),
-                        (int(x1), int(y1), int(x2), int(y2)),
-                    )
-                )
+                crops.append((float(c), (int(x1), int(y1), int(x2), int(y2))))
 
     if not crops:
-        crops = [(pil, 1.0, (0, 0, W, H))]
+        crops = [(1.0, (0, 0, W, H))]
+    return crops
+
 
+def _unique_crops(
+    pil: Image.Image, crops: List[Tuple[float, Box]], crop_dedup_iou: float, crop_mode: str,
+) -> Tuple[CropBatch, np.ndarray]:
+    """
+    crop dedup: 많이 겹치는 crop 은 대표(leader) 하나만 분류하고 결과를 공유
+    → (대표 crop CropBatch, inv [len(crops)]: 각 crop 의 대표 인덱스)
+    """
+    rep = np.arange(len(crops))
+    if crop_dedup_iou > 0 and len(crops) > 1:
+        rep = dedup_groups(
+            np.array([cr[1] for cr in crops], dtype=float),
+            np.array([cr[0] for cr in crops], dtype=float),
+            crop_dedup_iou,
+        )
+    uniq, inv = np.unique(rep, return_inverse=True)
+    # 대표 crop 텐서는 한 번만 만들어 분류와 AE 가 공유 (crop_mode="roi" 면 일괄 리샘플)
+    ucrops = CropBatch(pil, [crops[i][1] for i in uniq], IMG_SIZE, _base_tf, mode=crop_mode, device=DEVICE)
+    return ucrops, inv.reshape(-1)
+
+
+def _score_crops(
+    ucrops: CropBatch, require_ae: bool, early_exit: bool, cls_batch_size: Optional[int],
+) -> _CropScores:
+    """대표 crop 분류 (+flip TTA) 와 AE 검증"""
+    # 대표 crop(+flip)을 한 번에 분류
+    #    AE_FEATURE_SOURCE="shared" 면 같은 forward 에서 AE 입력 feature 도 얻는다
+    #    early_exit 면 1-pass 확률이 클래스별 tta_conf 이상인 crop 은 flip 생략
+    shared_ae = require_ae and AE_FEATURE_SOURCE == "shared"
+    policy = _get_early_exit_policy() if early_exit else None
+    if policy is not None:
+        probs_u, feats_u, tta_used_u = _classify_batch_adaptive(
+            ucrops, policy.tta_conf_vector(CLASS_NAMES), max_batch=cls_batch_size, return_features=shared_ae
+        )
+    else:
+        probs_u, feats_u = _classify_batch(ucrops, max_batch=cls_batch_size, return_features=shared_ae)
+        tta_used_u = np.ones((len(ucrops),), dtype=bool)
+
+    pred_u = probs_u.argmax(axis=1) if len(ucrops) else np.zeros((0,), dtype=int)
+    lbl_u = [CLASS_NAMES[int(k)] for k in pred_u]
+    shortcuts_u: List[List[str]] = [[] if used else ["no_tta"] for used in tta_used_u]
+
+    # AE 검증: (feature, 예측 class) 쌍을 모아 bank 에서 한 번에 채점
+    #    early_exit 면 FAR 가 낮은 클래스의 고신뢰 crop 은 검증 없이 통과 (ok=True, err/thr=None)
+    checks_u: List[AECheck] = [(None, None, None)] * len(ucrops)
+    if require_ae:
+        bank = _get_ae_bank()
+        todo = list(range(len(ucrops)))
+        if policy is not None:
+            todo = []
+            for i, lbl in enumerate(lbl_u):
+                if bank.has(lbl) and policy.skip_ae(lbl, float(probs_u[i, pred_u[i]])):
+                    checks_u[i] = (True, None, None)
+                    shortcuts_u[i].append("ae_skipped")
+                else:
+                    todo.append(i)
+        if shared_ae:
+            if todo:
+                for i, chk in zip(todo, bank.score(feats_u[todo], [lbl_u[i] for i in todo])):
+                    checks_u[i] = chk
+        else:
+            # 별도 extractor 는 AE 가 있는 클래스의 crop 만 통과시킨다
+            sel = [i for i in todo if bank.has(lbl_u[i])]
+            if sel:
+                feats_sel = _ae_features_batch(ucrops, max_batch=cls_batch_size, idx=sel)
+                for i, chk in zip(sel, bank.score(feats_sel, [lbl_u[i] for i in sel])):
+                    checks_u[i] = chk
+
+    return _CropScores(probs_u, pred_u, lbl_u, checks_u, shortcuts_u, tta_used_u)
+
+
+def _detect_on_image(
+    pil: Image.Image,
+    img_path: Optional[str],
+    min_prob: float,
+    dedup: bool,
+    yolo_conf: float,
+    yolo_iou: float,
+    min_box: int,
+    topk_limit: int,
+    merge_boxes: bool,
+    aggregate: bool,
+    require_ae: bool,
+    merge_mode: str,
+    crop_dedup_iou: float,
+    yolo_cascade: bool,
+    early_exit: bool,
+    crop_mode: str,
+    food_gate: bool,
+    tiled: bool,
+    cls_batch_size: Optional[int],
+    bbox_scale: Tuple[float, float] = (1.0, 1.0),
+) -> Dict[str, Any]:
+    stats = _new_stats()
+
+    # 0) non-food 사전 필터
+    if not _food_gate_passes(pil, food_gate, stats):
+        return _rejected_result(img_path, stats)
+
+    # 1) YOLO 감지
+    crops = _yolo_crops(
+        pil, yolo_conf, yolo_iou, min_box, merge_boxes, merge_mode, yolo_cascade, tiled, bbox_scale, stats,
+    )
+
+    # 2) crop dedup → 3) 대표 crop 분류 → 4) AE 검증
+    ucrops, inv = _unique_crops(pil, crops, crop_dedup_iou, crop_mode)
+    scores = _score_crops(ucrops, require_ae, early_exit, cls_batch_size)
+
+    return _assemble_result(
+        pil, img_path, crops, inv, scores,
+        min_prob=min_prob, dedup=dedup, topk_limit=topk_limit, aggregate=aggregate,
+        require_ae=require_ae, early_exit=early_exit, bbox_scale=bbox_scale, stats=stats,
+    )
+
+
+def _assemble_result(
+    pil: Image.Image,
+    img_path: Optional[str],
+    crops: List[Tuple[float, Box]],
+    inv: np.ndarray,
+    scores: _CropScores,
+    min_prob: float,
+    dedup: bool,
+    topk_limit: int,
+    aggregate: bool,
+    require_ae: bool,
+    early_exit: bool,
+    bbox_scale: Tuple[float, float],
+    stats: Dict[str, Any],
+) -> Dict[str, Any]:
+    """대표 crop 결과를 crop 별 detection 으로 펼치고 aggregate 여부에 따라 결과 dict 를 만든다"""
+    W, H = pil.size
+    sx, sy = bbox_scale
+
+    def orig_box(x1, y1, x2, y2) -> List[int]:
+        return [int(round(x1 * sx)), int(round(y1 * sy)), int(round(x2 * sx)), int(round(y2 * sy))]
+
+    if early_exit:
+        stats["early_exit"] = {
+            "crops": len(scores.labels),
+            "tta_skipped": int((~scores.tta_used).sum()),
+            "ae_skipped": sum("ae_skipped" in sc for sc in scores.shortcuts),
+        }
+
+    detections: List[Dict[str, Any]] = []
     per_label_scores: Dict[str, float] = {}
     per_label_counts: Dict[str, int] = {}
     items_raw: List[Dict[str, Any]] = []
 
+    # 대표 결과 → 원래 crop 순서로 펼침
+    probs_all = scores.probs[inv]
+    pred_idx = scores.pred[inv]
+    pred_lbl = [scores.labels[k] for k in inv]
+    ae_checks = [scores.checks[k] for k in inv]
+    shortcuts = [list(scores.shortcuts[k]) for k in inv]
+
     total = 0
-    for crop, c, (x1, y1, x2, y2) in crops:
-        probs = _predict_probs_tta(crop)
-        idx = int(probs.argmax())
-        lbl = CLASS_NAMES[idx]
+    for i, ((c, (x1, y1, x2, y2)), probs) in enumerate(zip(crops, probs_all)):
+        idx = int(pred_idx[i])
+        lbl = pred_lbl[i]
         p = float(probs[idx])
 
         #AE로 한 번 더 검증
         ae_ok: Optional[bool] = None
         if require_ae:
-            ok, err, thr = _ae_check_crop(crop, lbl)
+            ok, err, thr = ae_checks[i]
             ae_ok = ok
             if not (ok is True):
                 detections.append(
                     {
-                        "bbox": [int(x1), int(y1), int(x2), int(y2)],
+                        "bbox": orig_box(x1, y1, x2, y2),
                         "label": lbl,
                         "prob": p,
                         "yolo_conf": c,
                         "weight": 0.0,
                         "ae_ok": ae_ok,
+                        **({"shortcuts": shortcuts[i]} if early_exit else {}),
                     }
                 )
                 continue
@@ -355,13 +1146,15 @@ def detect_food_labels(
         w = (0.5 + 0.5 * min(1.0, c)) * (0.6 + 0.4 * area)
 
         det = {
-            "bbox": [int(x1), int(y1), int(x2), int(y2)],
+            "bbox": orig_box(x1, y1, x2, y2),
             "label": lbl,
             "prob": p,
             "yolo_conf": c,
             "weight": w,
             "ae_ok": ae_ok,
         }
+        if early_exit:
+            det["shortcuts"] = shortcuts[i]
         detections.append(det)
 
         items_raw.append({"label": lbl, "confidence": p, "weight": w})
@@ -399,6 +1192,7 @@ def detect_food_labels(
             "num_detections": len(kept),
             "items": items,
             "detections": kept,  
+            "stats": stats,
         }
 
     # =========================
@@ -427,6 +1221,7 @@ def detect_food_labels(
             ),
             "items": items,
             "detections": detections,
+            "stats": stats,
         }
 
     vals = np.array(list(per_label_scores.values()), float)
@@ -454,4 +1249,5 @@ def detect_food_labels(
         "num_detections": total,
         "items": filtered,
         "detections": detections,
+        "stats": stats,
     }
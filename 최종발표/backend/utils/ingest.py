@@ -0,0 +1,80 @@
+"""
+업로드 이미지 ingest (디코딩 한 번, 필요한 해상도까지만)
+
+휴대폰 사진(12~48MP)을 원본 해상도로 디코딩하지 않는다.
+  1) JPEG 은 draft() 로 DCT 단계에서 1/2·1/4·1/8 축소 디코딩 (max_side 이상이 되는 가장 작은 배율)
+  2) EXIF orientation 적용 (세로 사진이 누운 채로 탐지되지 않도록)
+  3) 긴 변을 max_side 로 제한 (YOLO 는 960, 분류기 crop 은 380 만 본다)
+
+좌표계: "원본" = EXIF 회전까지 적용한 원본 해상도 이미지.
+작업 이미지에서 얻은 bbox 에 scale(sx, sy)을 곱하면 원본 좌표가 된다 (detect_food_labels(bbox_scale=...)).
+
+설정: INGEST_MAX_SIDE (기본 1600, 0 이면 제한 없음)
+      타일 탐지 대상(넓은 상차림, tiling.should_tile)이면 TILE_MAX_SIDE 까지 유지
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple, Union
+import io
+
+from PIL import Image, ImageOps
+
+from backend.utils.tiling import working_max_side
+
+# EXIF orientation 값 중 가로/세로가 바뀌는 것 (transpose / rotate 90 / transverse / rotate 270)
+_SWAP_ORIENTATIONS = {5, 6, 7, 8}
+_EXIF_ORIENTATION = 0x0112
+
+
+@dataclass
+class IngestedImage:
+    pil: Image.Image                  # 작업용 RGB 이미지 (축소됨)
+    orig_size: Tuple[int, int]        # EXIF 회전 적용 후 원본 (W, H)
+    format: Optional[str]             # JPEG / PNG / WEBP ... (디코딩 전 포맷)
+
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """작업 좌표 → 원본 좌표 배율 (sx, sy)"""
+        w, h = self.pil.size
+        return self.orig_size[0] / max(1, w), self.orig_size[1] / max(1, h)
+
+
+def _orientation(im: Image.Image) -> int:
+    try:
+        return int(im.getexif().get(_EXIF_ORIENTATION, 1) or 1)
+    except Exception:
+        return 1
+
+
+def ingest(src: Union[bytes, str, Path], max_side: Optional[int] = None) -> IngestedImage:
+    """
+    bytes 또는 파일 경로 → IngestedImage. 디코딩 실패 시 PIL 예외를 그대로 올린다.
+    max_side=None 이면 원본 크기로 정한다 (tiling.working_max_side: 기본 INGEST_MAX_SIDE, 타일 대상은 TILE_MAX_SIDE)
+    """
+    im = Image.open(io.BytesIO(src) if isinstance(src, (bytes, bytearray)) else src)
+    fmt = im.format
+    W, H = im.size
+    orient = _orientation(im)
+    if max_side is None:
+        max_side = working_max_side(W, H)
+
+    if max_side and max(W, H) > max_side:
+        r = max_side / max(W, H)
+        # 요청 크기 이상을 유지하는 가장 작은 배율로 디코딩 (JPEG 외 포맷은 no-op)
+        im.draft("RGB", (max(1, int(W * r + 0.5)), max(1, int(H * r + 0.5))))
+
+    im = ImageOps.exif_transpose(im)
+    if im.mode != "RGB":
+        im = im.convert("RGB")
+    if max_side and max(im.size) > max_side:
+        im.thumbnail((max_side, max_side), Image.BILINEAR)
+
+    orig = (H, W) if orient in _SWAP_ORIENTATIONS else (W, H)
+    return IngestedImage(pil=im, orig_size=orig, format=fmt)
+
+
+def decode_full(raw: bytes) -> Image.Image:
+    """원본 해상도 RGB (EXIF 회전 적용) — 재인코딩 저장 같은 드문 경로용"""
+    im = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+    return im if im.mode == "RGB" else im.convert("RGB")
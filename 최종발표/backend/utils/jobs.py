@@ -0,0 +1,403 @@
+"""
+비동기 작업 저장소 + 워커 (업로드 async 모드용)
+
+작업은 DB upload_jobs 표(models/upload_job.py)에 둔다 → uvicorn/gunicorn 워커가 여러 개여도
+어느 워커에서든 상태 조회 / SSE / dedup 이 같고, 서버를 재시작해도 대기 중인 작업은 남는다.
+
+- submit()  : 작업 행을 INSERT 하고 job id 를 바로 돌려준다. 같은 dedup key(내용 해시 등)의 작업이
+              TTL 안에 있으면 (대기/실행/완료) 새로 만들지 않고 그 작업을 돌려준다 → 재시도해도 추론을 다시 돌리지 않음
+              (dedup_key UNIQUE 라 워커가 달라도 하나만 생긴다)
+- 워커      : 프로세스마다 asyncio 태스크 N 개. 자기 프로세스에서 넣은 작업은 바로, 그 밖의 대기 작업은
+              UPLOAD_JOB_POLL 초마다 표에서 찾아 status='queued' 조건부 UPDATE 로 하나씩 선점해
+              handler(params, data, progress) 를 await (무거운 일은 handler 가 run_inference / run_db 로 넘긴다)
+- progress  : handler 가 단계마다 progress(stage, info) 를 부르면 이벤트로 쌓이고 표에 기록 → SSE 구독자는 표를 polling
+- heartbeat : 실행 중에는 heartbeat_at 을 갱신한다. UPLOAD_JOB_STALE 초 넘게 갱신이 없는 running 작업은
+              처리하던 워커가 죽은 것으로 보고 failed(503) 처리 (food_logs 가 이미 기록됐을 수 있어 재실행하지 않음)
+- TTL       : 끝난 작업(done / failed)은 UPLOAD_JOB_TTL 초 뒤 삭제. failed 는 dedup 대상에서 바로 빠진다 (재시도 허용)
+
+HTTPException 으로 끝난 작업은 status_code / detail / headers 를 그대로 error 에 남긴다.
+설정: UPLOAD_JOB_WORKERS (프로세스당, 기본 INFER_POOL_SIZE), UPLOAD_JOB_TTL (초, 기본 600),
+      UPLOAD_JOB_MAX_QUEUE (전체 대기 작업 수, 기본 64), UPLOAD_JOB_POLL (초, 기본 1), UPLOAD_JOB_STALE (초, 기본 120)
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import socket
+import time
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.utils.executors import INFER_POOL_SIZE, run_db
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", str(INFER_POOL_SIZE)))
+UPLOAD_JOB_TTL = float(os.getenv("UPLOAD_JOB_TTL", "600"))
+UPLOAD_JOB_MAX_QUEUE = int(os.getenv("UPLOAD_JOB_MAX_QUEUE", "64"))
+UPLOAD_JOB_POLL = float(os.getenv("UPLOAD_JOB_POLL", "1.0"))
+UPLOAD_JOB_STALE = float(os.getenv("UPLOAD_JOB_STALE", "120"))
+
+Progress = Callable[[str, Optional[Dict[str, Any]]], None]
+Handler = Callable[[Dict[str, Any], bytes, Progress], Awaitable[Dict[str, Any]]]
+SessionFactory = Callable[[], Session]
+
+FINISHED = ("done", "failed")
+
+_SNAPSHOT_COLS = "id, status, stage, events, result, error, created_at, finished_at"
+
+
+def _hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _snapshot(row: Any) -> Dict[str, Any]:
+    m = row._mapping
+    return {
+        "job_id": m["id"],
+        "status": m["status"],
+        "stage": m["stage"],
+        "events": json.loads(m["events"] or "[]"),
+        "result": json.loads(m["result"]) if m["result"] else None,
+        "error": json.loads(m["error"]) if m["error"] else None,
+        "created_at": m["created_at"],
+        "finished_at": m["finished_at"],
+    }
+
+
+@dataclass
+class _Running:
+    """이 프로세스에서 실행 중인 작업의 이벤트 (flusher 가 표에 옮겨 적는다)"""
+    id: str
+    created_at: float
+    stage: str = "running"
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    closed: bool = False
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def emit(self, stage: str, info: Optional[Dict[str, Any]] = None) -> None:
+        self.stage = stage
+        self.events.append({"stage": stage, "t": round(time.time() - self.created_at, 3), **(info or {})})
+        self._changed.set()
+
+
+class JobQueue:
+    """라우트 / 워커는 같은 이벤트 루프. DB 접근은 run_db 로 루프 밖에서"""
+
+    def __init__(
+        self,
+        handler: Handler,
+        session_factory: SessionFactory,
+        workers: int = 2,
+        ttl: float = 600.0,
+        max_queue: int = 64,
+        poll: float = 1.0,
+        stale: float = 120.0,
+        name: str = "jobs",
+    ):
+        self.handler = handler
+        self.session_factory = session_factory
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.max_queue = max_queue
+        self.poll = poll
+        self.stale = stale
+        self.name = name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"[:64]
+        self._wakeup: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # 이 프로세스 기준 카운터
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    # ---------- 저장소 (동기, run_db 로 호출) ----------
+    def _purge(self, db: Session, now: float) -> None:
+        db.execute(
+            text("DELETE FROM upload_jobs WHERE expires_at IS NOT NULL AND expires_at < :now"), {"now": now}
+        )
+        # heartbeat 가 끊긴 running 작업: 처리하던 워커가 죽음 → failed (dedup 해제)
+        err = json.dumps(
+            {"status_code": 503, "detail": "작업을 처리하던 서버가 중단되었습니다. 다시 업로드해 주세요.", "headers": {}},
+            ensure_ascii=False,
+        )
+        db.execute(
+            text("""
+                UPDATE upload_jobs
+                SET status = 'failed', stage = 'failed', error = :err, dedup_key = NULL,
+                    params = NULL, data = NULL, finished_at = :now, expires_at = :exp
+                WHERE status = 'running' AND heartbeat_at < :cutoff
+            """),
+            {"err": err, "now": now, "exp": now + self.ttl, "cutoff": now - self.stale},
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """→ 작업 snapshot (없거나 만료면 None)"""
+        db = self.session_factory()
+        try:
+            row = db.execute(
+                text(f"""
+                    SELECT {_SNAPSHOT_COLS} FROM upload_jobs
+                    WHERE id = :id AND (expires_at IS NULL OR expires_at >= :now)
+                """),
+                {"id": job_id, "now": time.time()},
+            ).fetchone()
+            return _snapshot(row) if row is not None else None
+        finally:
+            db.close()
+
+    def _insert(self, params: Dict[str, Any], data: bytes, key: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        db = self.session_factory()
+        try:
+            now = time.time()
+            self._purge(db, now)
+            db.commit()
+            hkey = _hash_key(key) if key is not None else None
+            if hkey is not None:
+                row = db.execute(
+                    text(f"SELECT {_SNAPSHOT_COLS} FROM upload_jobs WHERE dedup_key = :k"), {"k": hkey}
+                ).fetchone()
+                if row is not None:
+                    return _snapshot(row), True
+
+            queued = db.execute(text("SELECT COUNT(*) FROM upload_jobs WHERE status = 'queued'")).scalar()
+            if queued >= self.max_queue:
+                raise HTTPException(status_code=503, detail="처리 대기 중인 업로드가 많습니다. 잠시 후 다시 시도해 주세요.")
+
+            job_id = secrets.token_hex(12)
+            events = [{"stage": "queued", "t": 0.0, "queue_size": int(queued) + 1}]
+            try:
+                db.execute(
+                    text("""
+                        INSERT INTO upload_jobs (id, dedup_key, status, stage, params, data, events, created_at)
+                        VALUES (:id, :k, 'queued', 'queued', :params, :data, :events, :now)
+                    """),
+                    {
+                        "id": job_id, "k": hkey, "params": json.dumps(params, ensure_ascii=False),
+                        "data": data, "events": json.dumps(events), "now": now,
+                    },
+                )
+                db.commit()
+            except IntegrityError:
+                # 다른 워커가 같은 dedup key 로 먼저 넣음
+                db.rollback()
+                row = db.execute(
+                    text(f"SELECT {_SNAPSHOT_COLS} FROM upload_jobs WHERE dedup_key = :k"), {"k": hkey}
+                ).fetchone()
+                if row is None:
+                    raise
+                return _snapshot(row), True
+            row = db.execute(text(f"SELECT {_SNAPSHOT_COLS} FROM upload_jobs WHERE id = :id"), {"id": job_id}).fetchone()
+            return _snapshot(row), False
+        finally:
+            db.close()
+
+    def _claim(self, job_id: Optional[str]) -> Optional[Tuple[_Running, Dict[str, Any], bytes]]:
+        """
+        job_id 가 있으면 그 작업, 없으면 가장 오래된 대기 작업을 선점 → (실행 상태, params, data)
+        status='queued' 조건부 UPDATE 라 여러 워커가 같은 작업을 동시에 가져가지 않는다
+        """
+        db = self.session_factory()
+        try:
+            now = time.time()
+            if job_id is not None:
+                candidates = [job_id]
+            else:
+                self._purge(db, now)
+                db.commit()
+                candidates = [r[0] for r in db.execute(text("""
+                    SELECT id FROM upload_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 8
+                """))]
+            for jid in candidates:
+                taken = db.execute(
+                    text("""
+                        UPDATE upload_jobs SET status = 'running', owner = :o, heartbeat_at = :now
+                        WHERE id = :id AND status = 'queued'
+                    """),
+                    {"o": self.owner, "now": now, "id": jid},
+                ).rowcount
+                db.commit()
+                if not taken:
+                    continue
+                row = db.execute(
+                    text("SELECT created_at, events, params, data FROM upload_jobs WHERE id = :id"), {"id": jid}
+                ).fetchone()
+                job = _Running(jid, float(row[0]), events=json.loads(row[1] or "[]"))
+                return job, json.loads(row[2] or "{}"), bytes(row[3] or b"")
+            return None
+        finally:
+            db.close()
+
+    def _save_progress(self, job_id: str, stage: str, events: List[Dict[str, Any]]) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(
+                text("""
+                    UPDATE upload_jobs SET stage = :stage, events = :events, heartbeat_at = :now
+                    WHERE id = :id AND status = 'running'
+                """),
+                {"stage": stage, "events": json.dumps(events, ensure_ascii=False, default=str),
+                 "now": time.time(), "id": job_id},
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish(
+        self, job_id: str, status: str, events: List[Dict[str, Any]],
+        result: Optional[Dict[str, Any]], error: Optional[Dict[str, Any]],
+    ) -> None:
+        now = time.time()
+        db = self.session_factory()
+        try:
+            db.execute(
+                text(f"""
+                    UPDATE upload_jobs
+                    SET status = :status, stage = :status, events = :events, result = :result, error = :error,
+                        params = NULL, data = NULL, finished_at = :now, expires_at = :exp
+                        {", dedup_key = NULL" if status == "failed" else ""}
+                    WHERE id = :id
+                """),
+                {
+                    "status": status,
+                    "events": json.dumps(events, ensure_ascii=False, default=str),
+                    "result": json.dumps(jsonable_encoder(result), ensure_ascii=False) if result is not None else None,
+                    "error": json.dumps(jsonable_encoder(error), ensure_ascii=False) if error is not None else None,
+                    "now": now,
+                    "exp": now + self.ttl,
+                    "id": job_id,
+                },
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------- 제출 ----------
+    def start(self) -> None:
+        """워커 태스크 시작 (이벤트 루프 안에서. 서버 시작 시 / 첫 submit 때)"""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Queue()
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}") for i in range(self.workers)
+            ]
+
+    async def submit(
+        self, params: Dict[str, Any], data: bytes = b"", key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """→ (작업 snapshot, deduplicated). 전체 대기 작업이 max_queue 이상이면 HTTPException(503)"""
+        self.start()
+        snap, deduplicated = await run_db(self._insert, params, data, key)
+        if deduplicated:
+            self.deduplicated += 1
+        else:
+            self._wakeup.put_nowait(snap["job_id"])
+        return snap, deduplicated
+
+    # ---------- 워커 ----------
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job_id = await asyncio.wait_for(self._wakeup.get(), timeout=self.poll)
+            except asyncio.TimeoutError:
+                job_id = None
+            try:
+                claimed = await run_db(self._claim, job_id)
+                if claimed is not None:
+                    await self._run(*claimed)
+            except Exception:
+                logger.exception("[%s] 작업 선점 / 실행 실패", self.name)
+                await asyncio.sleep(self.poll)
+
+    async def _flush(self, job: _Running) -> None:
+        """이벤트가 쌓이면 표에 기록, 변화가 없어도 heartbeat 주기마다 기록"""
+        beat = max(1.0, self.stale / 4)
+        while not job.closed:
+            try:
+                await asyncio.wait_for(job._changed.wait(), timeout=beat)
+            except asyncio.TimeoutError:
+                pass
+            job._changed.clear()
+            if job.closed:
+                return
+            await run_db(self._save_progress, job.id, job.stage, list(job.events))
+
+    async def _run(self, job: _Running, params: Dict[str, Any], data: bytes) -> None:
+        job_id = job.id
+        flusher = asyncio.create_task(self._flush(job))
+        status, result, error = "failed", None, None
+        try:
+            result = await self.handler(params, data, job.emit)
+            status = "done"
+            self.completed += 1
+        except HTTPException as e:
+            error = {"status_code": e.status_code, "detail": e.detail, "headers": dict(e.headers or {})}
+        except Exception as e:
+            logger.exception("[%s] 작업 %s 실패", self.name, job_id)
+            error = {"status_code": 500, "detail": f"업로드 처리 중 오류: {e}", "headers": {}}
+        finally:
+            if status == "failed":
+                self.failed += 1
+            job.emit(status, {"status_code": error["status_code"]} if error else None)
+            job.closed = True
+            await flusher
+            await run_db(self._finish, job_id, status, job.events, result, error)
+
+    # ---------- 구독 ----------
+    async def follow(self, job_id: str, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        지난 이벤트부터 끝날 때까지 이벤트를 차례로 내보낸다 (표를 poll 초마다 읽음, 다른 워커의 작업도 동일).
+        keepalive 초 동안 변화가 없으면 None. 작업이 만료 / 삭제되면 끝
+        """
+        sent = 0
+        last = time.monotonic()
+        interval = min(self.poll, 0.5)
+        while True:
+            snap = await run_db(self.get, job_id)
+            if snap is None:
+                return
+            events = snap["events"]
+            while sent < len(events):
+                yield events[sent]
+                sent += 1
+                last = time.monotonic()
+            if snap["status"] in FINISHED:
+                if not events or events[-1]["stage"] != snap["status"]:
+                    # heartbeat 만료로 failed 처리된 작업 등: 마지막 이벤트가 없으면 만들어 보낸다
+                    yield {"stage": snap["status"], "t": None}
+                return
+            if time.monotonic() - last >= keepalive:
+                last = time.monotonic()
+                yield None
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                text("""
+                    SELECT status, COUNT(*) FROM upload_jobs
+                    WHERE expires_at IS NULL OR expires_at >= :now GROUP BY status
+                """),
+                {"now": time.time()},
+            ).fetchall()
+        finally:
+            db.close()
+        by_status = {str(s): int(n) for s, n in rows}
+        return {
+            "workers": self.workers,
+            "queued": by_status.get("queued", 0),
+            "jobs": by_status,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+            "ttl_s": self.ttl,
+        }
@@ -0,0 +1,129 @@
+"""
+분류기 라벨 → foods 행 해석표 (서버 시작 시 한 번)
+
+분류기는 class_names.json 의 고정된 라벨만 내보내므로 업로드마다 이름 매칭 + Food 조회를 하지 않고
+시작할 때 라벨마다 ALIASES / trigram 매칭(nutrition_matcher.food_index)으로 음식 하나를 정해 둔다.
+1인분 영양정보까지 들고 있어서 업로드 시에는 dict 조회만 한다.
+
+- 해석되지 않은 라벨은 시작 로그에 출력한다 (foods 에 행을 추가하거나 ALIASES 를 보강할 대상)
+- 표에 없는 라벨(class_names 밖)은 이름 색인으로 찾는다 (여러 라벨이어도 foods 조회는 한 번)
+- 음식 카탈로그를 고친 뒤에는 POST /admin/label-map/rebuild 로 다시 만든다
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from backend.models.food import Food
+from backend.utils.model_config import load_class_names
+from backend.utils.nutrition_matcher import food_index, food_per_serving_dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ResolvedFood:
+    food_id: int
+    food_name: str
+    per_serving: Dict[str, float]   # food_per_serving_dict 결과
+    score: float                    # 1.0 = 별칭/부분 일치, 그 외 trigram + edit 유사도
+
+    @classmethod
+    def from_food(cls, food: Food, score: float = 1.0) -> "ResolvedFood":
+        return cls(int(food.id), food.name, food_per_serving_dict(food), score)
+
+
+def _lookup(db: Session, labels: List[str]) -> Dict[str, Optional[ResolvedFood]]:
+    """라벨마다 이름 색인 1순위 → foods 는 한 번에 조회"""
+    best = {}
+    for lbl in labels:
+        hits = food_index.search(lbl, k=1)
+        best[lbl] = hits[0] if hits else None
+
+    ids = {m.food_id for m in best.values() if m is not None}
+    foods = {f.id: f for f in db.query(Food).filter(Food.id.in_(ids)).all()} if ids else {}
+    out: Dict[str, Optional[ResolvedFood]] = {}
+    for lbl, m in best.items():
+        food = foods.get(m.food_id) if m is not None else None
+        out[lbl] = ResolvedFood.from_food(food, m.score) if food is not None else None
+    return out
+
+
+class LabelFoodMap:
+    def __init__(self):
+        self._table: Dict[str, Optional[ResolvedFood]] = {}
+        self._lock = threading.Lock()
+        self.unresolved: List[str] = []
+        self.built_at: Optional[float] = None
+        self.build_ms = 0.0
+        self.hits = 0
+        self.fallbacks = 0
+
+    def rebuild(self, db: Session, labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        """라벨 전체를 다시 해석해서 표를 통째로 교체 → 요약 (stats)"""
+        t0 = time.perf_counter()
+        labels = list(dict.fromkeys(labels if labels is not None else load_class_names()))
+        with self._lock:
+            food_index.refresh(db)
+            table = _lookup(db, labels)
+            self._table = table
+            self.unresolved = [lbl for lbl, r in table.items() if r is None]
+            self.built_at = time.time()
+            self.build_ms = (time.perf_counter() - t0) * 1000
+
+        logger.info(
+            "[label_map] 라벨 %d개 중 %d개 해석 (%.1fms)",
+            len(table), len(table) - len(self.unresolved), self.build_ms,
+        )
+        if self.unresolved:
+            logger.warning(
+                "[label_map] 매칭되는 음식이 없는 라벨 %d개: %s", len(self.unresolved), ", ".join(self.unresolved)
+            )
+        return self.stats()
+
+    def resolve_many(self, db: Session, labels: Iterable[str]) -> Dict[str, Optional[ResolvedFood]]:
+        """
+        업로드 시: 표에 있는 라벨은 dict 조회, 없는 라벨(class_names 밖)만 이름 색인으로 찾아
+        foods 를 한 번의 IN 조회로 읽는다.
+        """
+        table = self._table
+        out: Dict[str, Optional[ResolvedFood]] = {}
+        missing: List[str] = []
+        for lbl in dict.fromkeys(labels):
+            if lbl in table:
+                out[lbl] = table[lbl]
+            else:
+                missing.append(lbl)
+        self.hits += len(out)
+        if missing:
+            self.fallbacks += len(missing)
+            food_index.ensure_fresh(db)
+            out.update(_lookup(db, missing))
+        return out
+
+    def resolve(self, db: Session, label: str) -> Optional[ResolvedFood]:
+        return self.resolve_many(db, [label])[label]
+
+    def entries(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        return {
+            lbl: None if r is None else {"food_id": r.food_id, "food_name": r.food_name, "score": r.score}
+            for lbl, r in self._table.items()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "labels": len(self._table),
+            "resolved": len(self._table) - len(self.unresolved),
+            "unresolved": list(self.unresolved),
+            "built_at": self.built_at,
+            "build_ms": round(self.build_ms, 2),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+        }
+
+
+label_food_map = LabelFoodMap()
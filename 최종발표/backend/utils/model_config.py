@@ -0,0 +1,138 @@
+"""
+모델 경로 / 설정 (torch 를 import 하지 않는 가벼운 모듈)
+
+auth / dashboard 등 ML 과 무관한 코드가 경로·클래스 이름만 필요할 때 사용한다.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import List, Optional
+import hashlib
+import json
+import os
+
+# =========================
+#  경로
+# =========================
+BASE_DIR     = Path(__file__).resolve().parents[1]
+WEIGHTS_DIR  = Path(os.getenv("MODEL_WEIGHTS_DIR", str(BASE_DIR / "weights")))
+
+YOLO_WEIGHTS = WEIGHTS_DIR / "yolo" / "best.pt"
+CLS_WEIGHTS  = WEIGHTS_DIR / "efficientnet" / "cls_food_best.pth"
+CLASS_JSON   = WEIGHTS_DIR / "efficientnet" / "class_names.json"
+
+AE_WEIGHTS_DIR = WEIGHTS_DIR
+AE_SHARED_WEIGHTS_DIR = WEIGHTS_DIR / "ae_shared"
+
+# AE feature extractor(efficientnet_b4) 로컬 가중치. 없으면 timm pretrained 를 받는다(warm-up 중에만)
+AE_BACKBONE_WEIGHTS = WEIGHTS_DIR / "efficientnet" / "ae_backbone.pth"
+
+# INT8 정적 양자화 분류기 (python -m backend.utils.quantize 로 생성, TorchScript)
+CLS_INT8_WEIGHTS = WEIGHTS_DIR / "efficientnet" / "cls_food_int8.ts"
+
+# =========================
+#  설정 (환경변수)
+# =========================
+IMG_SIZE = 380
+
+# 분류기 한 번의 forward 에 넣을 최대 텐서 수(crop + flip 포함) — 메모리 상한
+CLS_MAX_BATCH = int(os.getenv("CLS_MAX_BATCH", "16"))
+
+# AE 입력 feature 출처
+#   "separate" → 별도 efficientnet_b4(ImageNet) feature extractor (기존 방식, weights/ae_<class>.pth)
+#   "shared"   → 분류기(tf_efficientnet_b4_ns) backbone 의 pooled feature 재사용
+#                (weights/ae_shared/ae_<class>.pth, ae_calibrate.py 로 재학습)
+AE_FEATURE_SOURCE = os.getenv("AE_FEATURE_SOURCE", "separate").strip().lower()
+
+# 추론 백엔드: eager | torchscript | onnx (export_models 로 만든 파일이 없으면 eager)
+INFER_BACKEND = os.getenv("INFER_BACKEND", "eager").strip().lower()
+
+# 양자화 모드: none | int8 (CPU 전용)
+#   int8 → 분류기는 CLS_INT8_WEIGHTS(정적 PTQ), AE bank 는 Linear 동적 양자화
+INFER_QUANT = os.getenv("INFER_QUANT", "none").strip().lower()
+
+# 요청 간 마이크로배칭: 동시 요청의 YOLO 입력 / 분류기 crop 을 모아 한 번에 forward
+INFER_MICROBATCH = os.getenv("INFER_MICROBATCH", "0") == "1"
+MICROBATCH_CLS_MAX = int(os.getenv("MICROBATCH_CLS_MAX", "32"))      # 분류기 텐서 수
+MICROBATCH_YOLO_MAX = int(os.getenv("MICROBATCH_YOLO_MAX", "8"))     # YOLO 이미지 수
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "10"))
+
+# 서버 시작 직후 백그라운드에서 모델을 미리 로드할지 (0 이면 첫 업로드 때 로드)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") != "0"
+# 업로드 요청이 모델 준비를 기다리는 최대 시간(초)
+MODEL_READY_TIMEOUT = float(os.getenv("MODEL_READY_TIMEOUT", "120"))
+
+# 업로드 ingest 작업 해상도(긴 변, 축소 디코딩 + EXIF 회전). 0 이면 원본 해상도
+INGEST_MAX_SIDE = int(os.getenv("INGEST_MAX_SIDE", "1600"))
+
+# YOLO 해상도 cascade: 학습 해상도(640)로 먼저 돌리고, 박스가 없거나 애매한 conf 의 박스가 있을 때만 960 재실행
+YOLO_CASCADE = os.getenv("YOLO_CASCADE", "0") == "1"
+YOLO_CASCADE_IMGSZ = int(os.getenv("YOLO_CASCADE_IMGSZ", "640"))
+# [yolo_conf, YOLO_CASCADE_AMBIG_CONF) 구간의 박스가 하나라도 있으면 애매한 것으로 보고 상위 해상도로
+YOLO_CASCADE_AMBIG_CONF = float(os.getenv("YOLO_CASCADE_AMBIG_CONF", "0.40"))
+
+# 타일(slice) 탐지 (tiling.py): auto | on | off
+#   auto 면 원본이 TILE_MIN_MP 메가픽셀 이상이거나 가로세로 비가 TILE_MIN_ASPECT 이상일 때만 (넓은 상차림 사진)
+TILE_MODE = os.getenv("TILE_MODE", "auto").strip().lower()
+TILE_MIN_MP = float(os.getenv("TILE_MIN_MP", "20"))
+TILE_MIN_ASPECT = float(os.getenv("TILE_MIN_ASPECT", "2.0"))
+# 타일 대상 이미지의 ingest 작업 해상도(긴 변) / 타일 한 변(작업 좌표, YOLO imgsz 로도 사용) / 겹침 비율
+TILE_MAX_SIDE = int(os.getenv("TILE_MAX_SIDE", "3200"))
+TILE_SIZE = int(os.getenv("TILE_SIZE", "960"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+# 타일 + 전체 이미지 박스 병합: nms | soft_nms | wbf
+TILE_MERGE = os.getenv("TILE_MERGE", "wbf").strip().lower()
+TILE_MERGE_IOU = float(os.getenv("TILE_MERGE_IOU", "0.55"))
+
+# confidence 기반 early exit (TTA flip 생략 / FAR 낮은 클래스 AE 생략), 클래스별 임계값은 JSON (early_exit.py)
+EARLY_EXIT = os.getenv("EARLY_EXIT", "0") == "1"
+EARLY_EXIT_CONFIG = Path(os.getenv("EARLY_EXIT_CONFIG", str(WEIGHTS_DIR / "early_exit.json")))
+
+# non-food 사전 필터 (food_gate.py): probe 가 없으면 꺼진 것으로 동작
+FOOD_GATE = os.getenv("FOOD_GATE", "0") == "1"
+FOOD_GATE_PROBE = WEIGHTS_DIR / "food_gate" / "probe.pt"
+FOOD_GATE_BACKBONE = WEIGHTS_DIR / "food_gate" / "backbone.pth"
+
+# crop 전처리: pil (박스마다 PIL crop + transform) | roi (이미지 텐서 1회 변환 + roi_align 일괄 리샘플)
+CROP_MODE = os.getenv("CROP_MODE", "pil").strip().lower()
+
+# crop dedup: IoU 가 이 값 이상인 YOLO 박스는 분류 결과를 공유 (0 이면 끔)
+CROP_DEDUP_IOU = float(os.getenv("CROP_DEDUP_IOU", "0"))
+
+# 탐지 결과 캐시 (pHash): 항목 수(0 이면 끔) / 근접 중복 Hamming 거리 / JSON 영속화 경로(비우면 메모리만)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_HAMMING = int(os.getenv("RESULT_CACHE_HAMMING", "2"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "").strip() or None
+
+
+_class_names: Optional[List[str]] = None
+
+
+def load_class_names() -> List[str]:
+    """class_names.json → 분류기 출력 순서의 라벨 리스트 (한 번만 읽음)"""
+    global _class_names
+    if _class_names is None:
+        with open(CLASS_JSON, "r", encoding="utf-8") as f:
+            _class_names = json.load(f)
+    return list(_class_names)
+
+
+def ae_weights_dir() -> Path:
+    return AE_SHARED_WEIGHTS_DIR if AE_FEATURE_SOURCE == "shared" else AE_WEIGHTS_DIR
+
+
+def model_version() -> str:
+    """
+    가중치 파일(경로/크기/mtime) + 추론 모드로 만든 짧은 해시.
+    가중치를 교체하면 값이 바뀌므로 결과 캐시 키에 넣어 자동 무효화한다.
+    """
+    files = [YOLO_WEIGHTS, CLS_WEIGHTS, CLASS_JSON, CLS_INT8_WEIGHTS, AE_BACKBONE_WEIGHTS, FOOD_GATE_PROBE]
+    ae_dir = ae_weights_dir()
+    if ae_dir.is_dir():
+        files += sorted(ae_dir.glob("ae_*"))
+    h = hashlib.sha1()
+    for p in files:
+        if p.exists():
+            st = p.stat()
+            h.update(f"{p}:{st.st_size}:{st.st_mtime_ns};".encode())
+    h.update(f"{AE_FEATURE_SOURCE}|{INFER_BACKEND}|{INFER_QUANT}|{FOOD_GATE}".encode())
+    return h.hexdigest()[:12]
@@ -0,0 +1,133 @@
+"""
+ML 모델 지연 로딩 / 백그라운드 warm-up 레지스트리 (torch 를 import 하지 않음)
+
+- backend.main 을 import 해도 torch / timm / ultralytics 는 로드되지 않는다.
+- 서버 시작 후 start_background() 가 별도 스레드에서
+  import(torch, timm, ultralytics, inference) → 모델 로드(yolo, classifier, AE ...) 순으로 진행하고
+  단계별 소요 시간을 기록한다.
+- 업로드 라우트는 ensure_loaded() 로 준비를 기다린 뒤 inference 모듈을 받아 쓴다.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyValue(Generic[T]):
+    """처음 get() 할 때 한 번만 만들어지는 값 (lock 으로 중복 생성 방지)"""
+
+    def __init__(self, loader: Callable[[], T]):
+        self._loader = loader
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._loader()
+                    self._loaded = True
+        return self._value  # type: ignore
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+class ModelRegistry:
+    """
+    status: "idle" → "loading" → "ready" | "failed"
+    stages: {"import:torch": 1.23, "load:classifier": 4.56, ...} (초)
+    """
+
+    def __init__(
+        self,
+        module_name: str = "backend.utils.inference",
+        import_stages: Tuple[str, ...] = ("torch", "timm", "ultralytics"),
+    ):
+        self.module_name = module_name
+        self.import_stages = import_stages
+        self.status = "idle"
+        self.error: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self._module: Any = None
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    # ---------- 내부 ----------
+    def _timed(self, stage: str, fn: Callable[[], Any]) -> Any:
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        self.stages[stage] = round(dt, 3)
+        logger.info("[warmup] %s %.3fs", stage, dt)
+        return out
+
+    def _run(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            for mod in self.import_stages:
+                self._timed(f"import:{mod}", lambda m=mod: importlib.import_module(m))
+            module = self._timed("import:inference", lambda: importlib.import_module(self.module_name))
+            for name, fn in module.warmup_stages():
+                self._timed(f"load:{name}", fn)
+            self._module = module
+            self.status = "ready"
+        except Exception as e:  # 실패해도 서버(비 ML 라우트)는 계속 동작
+            self.error = f"{type(e).__name__}: {e}"
+            self.status = "failed"
+            logger.exception("[warmup] failed")
+        finally:
+            self.stages["total"] = round(time.perf_counter() - t0, 3)
+            self._done.set()
+
+    # ---------- 공개 API ----------
+    def start_background(self) -> None:
+        """warm-up 스레드를 (한 번만) 시작"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.status = "loading"
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        self.start_background()
+        self._done.wait(timeout)
+        return self.ready
+
+    def ensure_loaded(self, timeout: Optional[float] = None) -> Any:
+        """
+        준비될 때까지 기다린 뒤 inference 모듈 반환.
+        timeout 안에 준비되지 않거나 로딩이 실패하면 RuntimeError.
+        """
+        if self.ready:
+            return self._module
+        if not self.wait_ready(timeout):
+            if self.status == "failed":
+                raise RuntimeError(f"모델 로딩 실패: {self.error}")
+            raise RuntimeError("모델 준비 중입니다. 잠시 후 다시 시도해 주세요.")
+        return self._module
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"status": self.status, "stages": dict(self.stages), "error": self.error}
+
+
+inference_registry = ModelRegistry()
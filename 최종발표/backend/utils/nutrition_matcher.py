@@ -1,10 +1,50 @@
+"""
+탐지 라벨 → foods 행 매칭
 
-import re
-from typing import List, Tuple
+요청마다 LIKE '%..%' (인덱스를 못 탐) 와 foods 전체 로드 + Python SequenceMatcher 를 돌지 않도록
+활성 음식 이름을 메모리 역색인(FoodNameIndex)으로 들고 있는다.
+
+- 정규화: NFKC → 소문자 → 공백/기호 제거. 한글 음절은 자모로 분해해서 trigram 을 만든다
+          ("김밥" 은 음절 trigram 이 0개지만 ^ㄱㅣㅁㅂㅏㅂ$ 는 6개, "자장면"/"짜장면" 도 자모 하나 차이)
+- 1단계 (부분 일치, 기존 LIKE): 별칭 후보를 이름에 포함하는 행. 후보의 trigram 을 모두 가진 행만 골라 확인
+- 2단계 (유사도): trigram 포스팅을 모아 np.bincount 로 교집합 → Jaccard 를 한 번에 계산,
+          FOOD_MATCH_MIN_TRIGRAM 이상인 행만 edit ratio 를 계산한다.
+          점수 = 0.7 * trigram + 0.3 * edit. trigram 내림차순으로 보다가 남은 행이 top-k 에 들 수 없으면 멈춘다.
+- 갱신: FOOD_INDEX_REFRESH_S 초마다 foods 의 (COUNT, MAX(id), MAX(updated_at)) 만 확인하고
+        바뀌었으면 새 id / updated_at 이 지난 행만 다시 읽는다 (삭제가 있으면 전체 재구성).
+        인덱스는 불변 스냅샷을 통째로 교체하므로 검색은 lock 없이 동시에 돈다.
+
+설정: FOOD_INDEX_REFRESH_S (기본 30, 0 이면 매 요청 확인), FOOD_MATCH_MIN_TRIGRAM (기본 0.25)
+"""
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from datetime import datetime
 from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from sqlalchemy import text
 from sqlalchemy.orm import Session
+
 from backend.models.food import Food
 
+logger = logging.getLogger(__name__)
+
+FOOD_INDEX_REFRESH_S = float(os.getenv("FOOD_INDEX_REFRESH_S", "30"))
+FOOD_MATCH_MIN_TRIGRAM = float(os.getenv("FOOD_MATCH_MIN_TRIGRAM", "0.25"))
+
+TRIGRAM_WEIGHT = 0.7
+EDIT_WEIGHT = 0.3
+
+# 삭제/이름 변경으로 죽은 자리가 이 비율을 넘으면 증분 대신 전체 재구성
+_MAX_DEAD_RATIO = 0.25
+
 ALIASES = {
     "ramen": ["라면","라멘","ramyeon"],
     "kimbap": ["김밥","gimbap","kimbob","kimbap"],
@@ -17,71 +57,334 @@ ALIASES = {
     "bossam": ["보쌈"],
 }
 
+
+# =========================
+#  정규화 / 자모 분해
+# =========================
 def _normalize(s: str) -> str:
-    t = (s or "").strip().lower()
+    t = unicodedata.normalize("NFKC", s or "").strip().lower()
     t = re.sub(r"[\s\-\_]+", "", t)
     t = re.sub(r"[^\w가-힣]+", "", t)
     return t
 
-def _generate_candidates(raw_label: str) -> List[str]:
-    t = _normalize(raw_label)
-    for k, vals in ALIASES.items():
-        if t == _normalize(k) or t in [_normalize(v) for v in vals]:
-            norm_vals = {_normalize(v) for v in vals}
-            norm_vals.add(_normalize(k))
-            return list(norm_vals)
-    return [t]
 
-def _trigrams(s: str) -> set:
-    return { s[i:i+3] for i in range(0, max(0, len(s)-2)) }
+# 한글 음절 = 0xAC00 + (초성 * 21 + 중성) * 28 + 종성  → 호환 자모로 펼친다
+_CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONG = " ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"
+
+
+def _jamo(s: str) -> str:
+    """정규화된 문자열의 한글 음절을 자모로 분해 (그 외 문자는 그대로)"""
+    out = []
+    for ch in s:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(_CHO[code // 588])
+            out.append(_JUNG[(code % 588) // 28])
+            if code % 28:
+                out.append(_JONG[code % 28])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _trigrams(s: str) -> Set[str]:
+    return {s[i:i+3] for i in range(0, max(0, len(s)-2))}
+
+
+def _padded_trigrams(j: str) -> Set[str]:
+    """유사도용: 앞뒤 경계(^ $)를 붙여 짧은 이름도 trigram 이 나오게"""
+    return _trigrams(f"^{j}$")
 
-def _trigram_sim(a: str, b: str) -> float:
-    if not a or not b: return 0.0
-    A, B = _trigrams(a), _trigrams(b)
-    if not A or not B: return 0.0
-    return len(A & B) / len(A | B)
 
 def _edit_ratio(a: str, b: str) -> float:
     return SequenceMatcher(None, a, b).ratio()
 
+
+def _alias_groups() -> Dict[str, List[str]]:
+    groups: Dict[str, List[str]] = {}
+    for k, vals in ALIASES.items():
+        norm_vals = {_normalize(v) for v in vals}
+        norm_vals.add(_normalize(k))
+        for v in norm_vals:
+            groups[v] = sorted(norm_vals)
+    return groups
+
+
+_ALIAS_GROUPS = _alias_groups()
+
+
+def _generate_candidates(raw_label: str) -> List[str]:
+    t = _normalize(raw_label)
+    return list(_ALIAS_GROUPS.get(t, [t]))
+
+
+# =========================
+#  역색인
+# =========================
+class FoodMatch(NamedTuple):
+    food_id: int
+    name: str
+    score: float
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """검색 중에는 바뀌지 않는 인덱스 상태 (갱신은 새 스냅샷을 만들어 교체)"""
+    ids: np.ndarray                     # pos → food id
+    names: Tuple[str, ...]              # pos → 원래 이름
+    norms: Tuple[str, ...]              # pos → _normalize(name)
+    jamos: Tuple[str, ...]              # pos → _jamo(norm)
+    grams: np.ndarray                   # pos → trigram 개수 (Jaccard 분모)
+    alive: np.ndarray                   # pos → 활성 여부 (이름 변경/비활성화된 자리는 False)
+    postings: Dict[str, np.ndarray]     # trigram → pos 배열
+    pos_of: Dict[int, int]              # food id → 살아 있는 pos
+    max_id: int
+    total_rows: int                     # foods 전체 행 수 (비활성 포함, 삭제 감지용)
+    updated_at: Optional[datetime]
+
+    @property
+    def size(self) -> int:
+        return len(self.pos_of)
+
+
+def _build(rows: Iterable[Tuple[int, str]], max_id: int, total_rows: int,
+           updated_at: Optional[datetime]) -> _Snapshot:
+    ids, names, norms, jamos, grams = [], [], [], [], []
+    lists: Dict[str, List[int]] = {}
+    for fid, name in rows:
+        norm = _normalize(name)
+        if not norm:
+            continue
+        j = _jamo(norm)
+        tri = _padded_trigrams(j)
+        pos = len(ids)
+        for g in tri:
+            lists.setdefault(g, []).append(pos)
+        ids.append(int(fid)); names.append(name); norms.append(norm); jamos.append(j); grams.append(len(tri))
+    return _Snapshot(
+        ids=np.asarray(ids, dtype=np.int64),
+        names=tuple(names), norms=tuple(norms), jamos=tuple(jamos),
+        grams=np.asarray(grams, dtype=np.float32),
+        alive=np.ones(len(ids), dtype=bool),
+        postings={g: np.asarray(v, dtype=np.int32) for g, v in lists.items()},
+        pos_of={fid: i for i, fid in enumerate(ids)},
+        max_id=max_id, total_rows=total_rows, updated_at=updated_at,
+    )
+
+
+def _apply_delta(snap: _Snapshot, rows: List[Tuple[int, str, bool]], max_id: int, total_rows: int,
+                 updated_at: Optional[datetime]) -> _Snapshot:
+    """바뀐 행만 반영: 기존 자리는 죽이고(alive=False) 활성 행은 끝에 덧붙인다. 건드린 포스팅만 새 배열"""
+    alive = snap.alive.copy()
+    pos_of = dict(snap.pos_of)
+    ids, names, norms, jamos, grams = [], [], [], [], []
+    added: Dict[str, List[int]] = {}
+    base = len(snap.ids)
+    for fid, name, active in rows:
+        old = pos_of.pop(int(fid), None)
+        if old is not None:
+            alive[old] = False
+        norm = _normalize(name)
+        if not active or not norm:
+            continue
+        j = _jamo(norm)
+        tri = _padded_trigrams(j)
+        pos = base + len(ids)
+        for g in tri:
+            added.setdefault(g, []).append(pos)
+        pos_of[int(fid)] = pos
+        ids.append(int(fid)); names.append(name); norms.append(norm); jamos.append(j); grams.append(len(tri))
+
+    postings = dict(snap.postings)
+    for g, v in added.items():
+        new = np.asarray(v, dtype=np.int32)
+        postings[g] = np.concatenate([postings[g], new]) if g in postings else new
+    return _Snapshot(
+        ids=np.concatenate([snap.ids, np.asarray(ids, dtype=np.int64)]),
+        names=snap.names + tuple(names), norms=snap.norms + tuple(norms), jamos=snap.jamos + tuple(jamos),
+        grams=np.concatenate([snap.grams, np.asarray(grams, dtype=np.float32)]),
+        alive=np.concatenate([alive, np.ones(len(ids), dtype=bool)]),
+        postings=postings, pos_of=pos_of,
+        max_id=max_id, total_rows=total_rows, updated_at=updated_at,
+    )
+
+
+def _unchanged(snap: _Snapshot, fid: int, name: str, active: bool) -> bool:
+    pos = snap.pos_of.get(fid)
+    if pos is None:
+        return not active
+    return active and snap.names[pos] == name
+
+
+_EMPTY = _build([], 0, 0, None)
+
+
+class FoodNameIndex:
+    """활성 foods 이름의 trigram 역색인 (프로세스당 하나: food_index)"""
+
+    def __init__(self, refresh_s: float = FOOD_INDEX_REFRESH_S, min_trigram: float = FOOD_MATCH_MIN_TRIGRAM):
+        self.refresh_s = refresh_s
+        self.min_trigram = min_trigram
+        self._snap: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.full_builds = 0
+        self.incremental = 0
+        self.last_build_ms = 0.0
+
+    # ---------- 갱신 ----------
+    def invalidate(self) -> None:
+        """다음 ensure_fresh 때 전체 재구성 (foods 를 대량으로 바꾼 직후 등)"""
+        with self._lock:
+            self._snap = None
+            self._checked_at = 0.0
+
+    def ensure_fresh(self, db: Session) -> None:
+        """처음이면 전체 구성, 이후 refresh_s 초마다 foods 변경 여부만 확인"""
+        if self._snap is not None and time.monotonic() - self._checked_at < self.refresh_s:
+            return
+        with self._lock:
+            # 다른 스레드가 방금 갱신했으면 그대로
+            if self._snap is not None and time.monotonic() - self._checked_at < self.refresh_s:
+                return
+            self._refresh(db)
+            self._checked_at = time.monotonic()
+
+    def refresh(self, db: Session, full: bool = False) -> None:
+        with self._lock:
+            if full:
+                self._snap = None
+            self._refresh(db)
+            self._checked_at = time.monotonic()
+
+    def _refresh(self, db: Session) -> None:
+        t0 = time.perf_counter()
+        total, max_id, updated_at = db.execute(
+            text("SELECT COUNT(*), COALESCE(MAX(id), 0), MAX(updated_at) FROM foods")
+        ).fetchone()
+        total, max_id = int(total or 0), int(max_id or 0)
+        snap = self._snap
+
+        if snap is not None and (total, max_id, updated_at) == (snap.total_rows, snap.max_id, snap.updated_at):
+            return
+
+        if snap is not None:
+            # 새 id 또는 마지막 확인 이후 수정된 행만 (같은 초에 바뀐 행을 놓치지 않도록 >=)
+            rows = db.execute(
+                text("""
+                    SELECT id, name, is_active FROM foods
+                    WHERE id > :max_id OR (:since IS NOT NULL AND updated_at >= :since)
+                """),
+                {"max_id": snap.max_id, "since": snap.updated_at},
+            ).fetchall()
+            new_rows = sum(1 for r in rows if int(r[0]) > snap.max_id)
+            # since 와 같은 시각의 행은 매번 다시 읽히므로 이름 / 활성 여부가 그대로인 행은 뺀다
+            changed = [(int(r[0]), r[1], bool(r[2])) for r in rows if not _unchanged(snap, int(r[0]), r[1], bool(r[2]))]
+            dead = int((~snap.alive).sum()) + sum(1 for r in changed if r[0] in snap.pos_of)
+            # 행 수가 새 id 만큼만 늘지 않았으면 삭제가 있었던 것 → 전체 재구성
+            if snap.total_rows + new_rows == total and dead <= _MAX_DEAD_RATIO * max(1, len(snap.ids) + len(changed)):
+                self._snap = _apply_delta(snap, changed, max_id, total, updated_at) if changed else replace(
+                    snap, max_id=max_id, total_rows=total, updated_at=updated_at
+                )
+                self.incremental += 1
+                self.last_build_ms = (time.perf_counter() - t0) * 1000
+                return
+
+        rows = db.execute(text("SELECT id, name FROM foods WHERE is_active = 1 ORDER BY id")).fetchall()
+        self._snap = _build(((r[0], r[1]) for r in rows), max_id, total, updated_at)
+        self.full_builds += 1
+        self.last_build_ms = (time.perf_counter() - t0) * 1000
+        logger.info("[food_index] %d개 음식 이름 색인 (%.1fms)", self._snap.size, self.last_build_ms)
+
+    # ---------- 검색 ----------
+    def _contains(self, snap: _Snapshot, cand: str) -> np.ndarray:
+        """이름에 cand 를 포함하는 살아 있는 pos (기존 LIKE '%cand%')"""
+        grams = _trigrams(_jamo(cand))
+        if grams:
+            lists = [snap.postings.get(g) for g in grams]
+            if any(v is None for v in lists):
+                return np.empty(0, dtype=np.int64)
+            counts = np.bincount(np.concatenate(lists), minlength=len(snap.ids))
+            pos = np.flatnonzero((counts == len(grams)) & snap.alive)
+        else:
+            pos = np.flatnonzero(snap.alive)  # 자모 2개 이하 후보 ("차" 등): 전체 확인
+        return np.asarray([p for p in pos if cand in snap.norms[p]], dtype=np.int64)
+
+    def _substring_match(self, snap: _Snapshot, cands: List[str], target_j: str) -> Optional[FoodMatch]:
+        pos = np.unique(np.concatenate([self._contains(snap, c) for c in cands])) if cands else []
+        if len(pos) == 0:
+            return None
+        # edit ratio 가 가장 높은 행, 같으면 id 가 작은 행
+        best = max(pos, key=lambda p: (_edit_ratio(target_j, snap.jamos[p]), -snap.ids[p]))
+        return FoodMatch(int(snap.ids[best]), snap.names[best], 1.0)
+
+    def _similar(self, snap: _Snapshot, target_j: str, k: int) -> List[FoodMatch]:
+        q = _padded_trigrams(target_j)
+        lists = [snap.postings[g] for g in q if g in snap.postings]
+        if not lists:
+            return []
+        inter = np.bincount(np.concatenate(lists), minlength=len(snap.ids)).astype(np.float32)
+        jacc = inter / np.maximum(len(q) + snap.grams - inter, 1.0)
+        jacc[~snap.alive] = 0.0
+        cand = np.flatnonzero(jacc >= self.min_trigram)
+        if len(cand) == 0:
+            return []
+
+        # trigram 내림차순(같으면 id 오름차순). 남은 행의 상한(0.7*tri + 0.3)이 k 번째 점수 이하면 중단
+        cand = cand[np.lexsort((snap.ids[cand], -jacc[cand]))]
+        scored: List[Tuple[float, int]] = []
+        for p in cand:
+            tri = float(jacc[p])
+            if len(scored) >= k and TRIGRAM_WEIGHT * tri + EDIT_WEIGHT <= scored[k - 1][0]:
+                break
+            score = TRIGRAM_WEIGHT * tri + EDIT_WEIGHT * _edit_ratio(target_j, snap.jamos[p])
+            scored.append((score, int(p)))
+            scored.sort(key=lambda t: (-t[0], snap.ids[t[1]]))
+            del scored[k:]
+        return [FoodMatch(int(snap.ids[p]), snap.names[p], round(s, 4)) for s, p in scored[:k]]
+
+    def search(self, raw_label: str, k: int = 5) -> List[FoodMatch]:
+        """
+        라벨 → 후보 음식 top-k (점수 내림차순).
+        별칭/부분 일치가 있으면 그 행 하나(score=1.0), 없으면 trigram + edit 유사도 순.
+        """
+        snap = self._snap or _EMPTY
+        target = _normalize(raw_label)
+        if not target or snap.size == 0:
+            return []
+        target_j = _jamo(target)
+        hit = self._substring_match(snap, _generate_candidates(raw_label), target_j)
+        if hit is not None:
+            return [hit]
+        return self._similar(snap, target_j, max(1, k))
+
+    def stats(self) -> Dict[str, object]:
+        snap = self._snap or _EMPTY
+        return {
+            "foods": snap.size,
+            "trigrams": len(snap.postings),
+            "dead_slots": int((~snap.alive).sum()),
+            "full_builds": self.full_builds,
+            "incremental_refreshes": self.incremental,
+            "last_build_ms": round(self.last_build_ms, 2),
+            "refresh_s": self.refresh_s,
+        }
+
+
+food_index = FoodNameIndex()
+
+
 def find_food_by_name(db: Session, raw_label: str):
     """
     YOLO/EfficientNet에서 추출된 음식 이름(raw_label)을 DB의 Food 테이블과 매칭
     """
-    cands = _generate_candidates(raw_label)
-    rows = []
-
-    for c in cands:
-        q = f"%{c}%"
-        row = db.query(Food).filter(Food.is_active == True, Food.name.like(q)).first()
-        if row:
-            rows.append(row)
-
-    if rows:
-        norm_target = _normalize(raw_label)
-        rows = sorted(rows, key=lambda r: 1.0 - _edit_ratio(norm_target, _normalize(r.name)))
-        return rows[0]
-
-    all_names = db.query(Food.name, Food.id).filter(Food.is_active == True).all()
-    if not all_names:
-        return None
-
-    norm_target = _normalize(raw_label)
-    scored: List[Tuple[float, int, str]] = []
-    for name, fid in all_names:
-        ns = _normalize(name)
-        tri = _trigram_sim(norm_target, ns)
-        if tri >= 0.25:
-            ed = _edit_ratio(norm_target, ns)
-            score = 0.7*tri + 0.3*ed
-            scored.append((score, fid, name))
-
-    if not scored:
+    food_index.ensure_fresh(db)
+    hits = food_index.search(raw_label, k=1)
+    if not hits:
         return None
-
-    scored.sort(key=lambda t: t[0], reverse=True)
-    best_fid = scored[0][1]
-    return db.query(Food).get(best_fid)
+    return db.get(Food, hits[0].food_id)
 
 def food_per_serving_dict(food) -> dict:
     """DB에서 불러온 Food 객체를 1인분 영양정보 dict로 변환"""
@@ -0,0 +1,235 @@
+"""
+분류기(tf_efficientnet_b4_ns) INT8 정적 양자화(PTQ) + fp32 대비 정확도 리포트
+
+사용:
+    # 샘플 이미지 폴더로 calibration → weights/efficientnet/cls_food_int8.ts
+    python -m backend.utils.quantize --calib /data/calib --holdout /data/holdout
+
+    # 이미 만든 int8 모델로 리포트만
+    python -m backend.utils.quantize --holdout /data/holdout --skip-quantize
+
+- calibration 폴더: 이미지 파일 (하위 폴더 포함, 라벨 불필요)
+- holdout 폴더   : <class_name>/*.jpg 구조면 정확도까지, 아니면 fp32 와의 top-1 일치율만 계산
+- 리포트         : cls_food_int8_report.json (int8 모델 옆)
+  top1_agree / acc_fp32 / acc_int8 / acc_delta / max_prob_diff / 지연(ms/img) / 파일 크기
+  AE bank 가 있으면 fp32 경로와 int8 경로(분류기 int8 + AE 동적 양자화)의 AE 판정 일치율도 포함
+
+서버에서는 INFER_QUANT=int8 로 켠다 (CPU 전용).
+"""
+from __future__ import annotations
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import torch
+
+from backend.utils import inference as inf
+from backend.utils.ae_bank import AEBank
+from backend.utils.backends import ClsWithFeatures, EagerBackend, TorchScriptBackend
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def _list_images(folder: Path) -> List[Path]:
+    return sorted(p for p in folder.rglob("*") if p.is_file() and p.suffix.lower() in IMG_EXTS)
+
+
+def _load_batch(paths: List[Path]) -> torch.Tensor:
+    return torch.stack([inf._base_tf(Image.open(p).convert("RGB")) for p in paths], 0)
+
+
+def _batches(paths: List[Path], batch_size: int):
+    for i in range(0, len(paths), batch_size):
+        yield paths[i:i + batch_size]
+
+
+def _non_traceable_classes() -> List[type]:
+    """
+    tf_ 계열의 Conv2dSame 은 입력 크기로 padding 을 계산해 FX symbolic trace 가 안 된다.
+    해당 모듈은 float 로 남기고 나머지(대부분의 conv / linear)만 양자화한다.
+    """
+    try:
+        from timm.layers import Conv2dSame
+    except ImportError:  # 구버전 timm
+        from timm.models.layers import Conv2dSame
+    return [Conv2dSame]
+
+
+# =========================
+#  정적 양자화 (FX graph mode PTQ)
+# =========================
+@torch.no_grad()
+def quantize_classifier(
+    calib_paths: List[Path],
+    out_path: Path = inf.CLS_INT8_WEIGHTS,
+    batch_size: int = 8,
+) -> Path:
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.fx.custom_config import PrepareCustomConfig
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    if not calib_paths:
+        raise SystemExit("calibration 이미지가 없습니다")
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+
+    model = copy.deepcopy(inf._get_classifier()).cpu().eval()
+    num_features = int(model.num_features)
+    example = (torch.randn(1, 3, inf.IMG_SIZE, inf.IMG_SIZE),)
+
+    prepared = prepare_fx(
+        ClsWithFeatures(model).eval(),
+        get_default_qconfig_mapping(engine),
+        example_inputs=example,
+        prepare_custom_config=PrepareCustomConfig().set_non_traceable_module_classes(_non_traceable_classes()),
+    )
+    t0 = time.perf_counter()
+    for chunk in _batches(calib_paths, batch_size):
+        prepared(_load_batch(chunk))
+    print(f"[quant] calibration {len(calib_paths)}장 ({time.perf_counter() - t0:.1f}s)")
+
+    quantized = convert_fx(prepared).eval()
+    traced = torch.jit.trace(quantized, example)
+    meta = {
+        "num_features": num_features,
+        "quant": f"int8-static-fx/{engine}",
+        "calib_images": len(calib_paths),
+        "source": inf.CLS_WEIGHTS.name,
+    }
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(traced, str(out_path), _extra_files={"meta.json": json.dumps(meta)})
+    print(f"[quant] saved {out_path} ({out_path.stat().st_size / 2**20:.1f} MB)")
+    return out_path
+
+
+# =========================
+#  fp32 vs int8 리포트
+# =========================
+def _label_of(path: Path, root: Path) -> Optional[str]:
+    rel = path.relative_to(root)
+    if len(rel.parts) >= 2 and rel.parts[0] in inf.CLASS_NAMES:
+        return rel.parts[0]
+    return None
+
+
+@torch.no_grad()
+def _run(backend, paths: List[Path], batch_size: int) -> Tuple[torch.Tensor, torch.Tensor, float]:
+    """→ (probs [N, C], feats [N, D], 이미지당 ms)"""
+    probs, feats, spent = [], [], 0.0
+    for chunk in _batches(paths, batch_size):
+        x = _load_batch(chunk)
+        t0 = time.perf_counter()
+        logits, pooled = backend(x)
+        spent += time.perf_counter() - t0
+        probs.append(torch.softmax(logits.float(), 1))
+        feats.append(pooled.float())
+    return torch.cat(probs, 0), torch.cat(feats, 0), spent * 1000.0 / max(1, len(paths))
+
+
+def _ae_agreement(fp32_feats: torch.Tensor, int8_feats: torch.Tensor, labels: List[str]) -> Optional[Dict[str, float]]:
+    """
+    예측 라벨 기준 AE 판정(ok) 일치율: (fp32 feature, fp32 bank) vs (int8 feature, 동적 양자화 bank)
+    separate 모드의 AE 입력은 별도 extractor feature 라 분류기 양자화와 무관 → shared 모드에서만 계산
+    """
+    if inf.AE_FEATURE_SOURCE != "shared":
+        return None
+    dim = fp32_feats.shape[1]
+    bank = AEBank.load(inf._ae_weights_dir(), inf.CLASS_NAMES, dim)
+    if len(bank) == 0:
+        return None
+    qbank = AEBank.load(inf._ae_weights_dir(), inf.CLASS_NAMES, dim, quantize=True)
+    ref = bank.score(fp32_feats, labels)
+    out = qbank.score(int8_feats, labels)
+    pairs = [(a[0], b[0]) for a, b in zip(ref, out) if a[0] is not None]
+    if not pairs:
+        return None
+    return {
+        "n": len(pairs),
+        "ae_decision_agree": float(np.mean([a == b for a, b in pairs])),
+        "ae_ok_rate_fp32": float(np.mean([a for a, _ in pairs])),
+        "ae_ok_rate_int8": float(np.mean([b for _, b in pairs])),
+    }
+
+
+def accuracy_report(
+    holdout: Path,
+    int8_path: Path = inf.CLS_INT8_WEIGHTS,
+    batch_size: int = 8,
+) -> Dict[str, Any]:
+    paths = _list_images(holdout)
+    if not paths:
+        raise SystemExit(f"이미지가 없습니다: {holdout}")
+    torch.set_grad_enabled(False)
+
+    model = inf._get_classifier().cpu().eval()
+    fp32 = EagerBackend(ClsWithFeatures(model), model.num_features)
+    int8 = TorchScriptBackend(int8_path, device="cpu")
+
+    p_ref, f_ref, ms_ref = _run(fp32, paths, batch_size)
+    p_q, f_q, ms_q = _run(int8, paths, batch_size)
+    top_ref, top_q = p_ref.argmax(1), p_q.argmax(1)
+
+    report: Dict[str, Any] = {
+        "n": len(paths),
+        "top1_agree": float((top_ref == top_q).float().mean()),
+        "max_prob_diff": float((p_ref - p_q).abs().max()),
+        "mean_top1_prob_diff": float((p_ref.max(1).values - p_q.max(1).values).abs().mean()),
+        "latency_ms_fp32": round(ms_ref, 2),
+        "latency_ms_int8": round(ms_q, 2),
+        "size_mb_fp32": round(inf.CLS_WEIGHTS.stat().st_size / 2**20, 2) if inf.CLS_WEIGHTS.exists() else None,
+        "size_mb_int8": round(int8_path.stat().st_size / 2**20, 2),
+    }
+
+    labels = [_label_of(p, holdout) for p in paths]
+    idx = [i for i, y in enumerate(labels) if y is not None]
+    if idx:
+        y = torch.tensor([inf.CLASS_NAMES.index(labels[i]) for i in idx])
+        acc_ref = float((top_ref[idx] == y).float().mean())
+        acc_q = float((top_q[idx] == y).float().mean())
+        report.update({"n_labeled": len(idx), "acc_fp32": acc_ref, "acc_int8": acc_q, "acc_delta": acc_q - acc_ref})
+
+    pred = [inf.CLASS_NAMES[i] for i in top_ref.tolist()]
+    ae = _ae_agreement(f_ref, f_q, pred)
+    if ae:
+        report["ae"] = ae
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="분류기 INT8 정적 양자화 + fp32 대비 리포트")
+    ap.add_argument("--calib", type=Path, default=None, help="calibration 이미지 폴더")
+    ap.add_argument("--holdout", type=Path, default=None, help="리포트용 held-out 폴더 (<class>/*.jpg 권장)")
+    ap.add_argument("--out", type=Path, default=inf.CLS_INT8_WEIGHTS)
+    ap.add_argument("--max-calib", type=int, default=512, help="calibration 에 쓸 최대 이미지 수")
+    ap.add_argument("--batch-size", type=int, default=8)
+    ap.add_argument("--skip-quantize", action="store_true", help="양자화 없이 리포트만")
+    args = ap.parse_args(argv)
+
+    if not args.skip_quantize:
+        if args.calib is None:
+            ap.error("--calib 가 필요합니다 (리포트만 하려면 --skip-quantize)")
+        paths = _list_images(args.calib)
+        if len(paths) > args.max_calib:
+            rng = np.random.default_rng(0)
+            paths = sorted(rng.choice(paths, args.max_calib, replace=False).tolist())
+        quantize_classifier(paths, args.out, args.batch_size)
+
+    if args.holdout is not None:
+        report = accuracy_report(args.holdout, args.out, args.batch_size)
+        report_path = args.out.with_name(args.out.stem + "_report.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        for k, v in report.items():
+            print(f"[quant][report] {k}={v}")
+        print(f"[quant] report → {report_path}")
+
+
+if __name__ == "__main__":
+    main()
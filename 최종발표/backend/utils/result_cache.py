@@ -0,0 +1,213 @@
+"""
+탐지 결과 캐시 (perceptual hash 기반)
+
+같은 사진을 다시 올리는 경우(프론트 timeout 후 재시도 등) YOLO + 분류기 + AE 를 다시 돌리지 않도록
+디코딩된 이미지의 pHash + 추론 파라미터 + 모델 버전으로 detect_food_labels 결과를 캐시한다.
+
+- pHash: 32x32 grayscale → 2D DCT → 좌상단 8x8 (DC 제외) 을 median 으로 이진화한 64bit
+- 근접 중복: 같은 파라미터 버킷 안에서 Hamming 거리 <= max_hamming 이면 hit (재압축/리사이즈 대응)
+  저장 당시와 해상도가 다르면 bbox 를 현재 크기로 스케일한다.
+- LRU: max_entries 초과 시 가장 오래 안 쓴 항목부터 제거
+- 영속화(선택): JSON 파일. 로드 시 모델 버전이 다른 항목은 버린다.
+- 모델 버전: 가중치 파일 경로/크기/mtime + 추론 모드 해시 (model_config.model_version)
+
+설정: RESULT_CACHE_SIZE (0 이면 끔), RESULT_CACHE_HAMMING, RESULT_CACHE_PATH
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import copy
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_DCT_N = 32
+_HASH_N = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0, :] = np.sqrt(1.0 / n)
+    return m
+
+
+_DCT = _dct_matrix(_DCT_N)
+
+
+def phash(pil: Image.Image) -> int:
+    """64bit perceptual hash"""
+    g = np.asarray(pil.convert("L").resize((_DCT_N, _DCT_N), Image.BILINEAR), dtype=np.float64)
+    d = (_DCT @ g @ _DCT.T)[:_HASH_N, :_HASH_N].flatten()
+    bits = d > np.median(d[1:])
+    bits[0] = False  # DC 성분은 밝기만 반영 → 제외
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _scale_result(result: Dict[str, Any], src_size: Tuple[int, int], dst_size: Tuple[int, int]) -> Dict[str, Any]:
+    if tuple(src_size) == tuple(dst_size):
+        return result
+    sx = dst_size[0] / max(1, src_size[0])
+    sy = dst_size[1] / max(1, src_size[1])
+    for det in result.get("detections") or []:
+        x1, y1, x2, y2 = det["bbox"]
+        det["bbox"] = [int(round(x1 * sx)), int(round(y1 * sy)), int(round(x2 * sx)), int(round(y2 * sy))]
+    return result
+
+
+class ResultCache:
+    def __init__(
+        self,
+        model_version: str,
+        max_entries: int = 256,
+        max_hamming: int = 2,
+        persist_path: Optional[Path] = None,
+        persist_every: int = 16,
+    ):
+        self.model_version = model_version
+        self.max_entries = int(max_entries)
+        self.max_hamming = int(max_hamming)
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_every = max(1, int(persist_every))
+
+        # (params_key, phash) → {"size": [W, H], "result": {...}}
+        self._entries: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.persist_path is not None:
+            self._load()
+
+    # ---------- 조회 / 저장 ----------
+    def _find(self, pkey: str, h: int) -> Optional[Tuple[str, int]]:
+        if (pkey, h) in self._entries:
+            return (pkey, h)
+        if self.max_hamming <= 0:
+            return None
+        best, best_d = None, self.max_hamming + 1
+        for key in self._entries:
+            if key[0] != pkey:
+                continue
+            d = hamming(key[1], h)
+            if d < best_d:
+                best, best_d = key, d
+        return best
+
+    def get(
+        self,
+        pil: Image.Image,
+        params: Dict[str, Any],
+        h: Optional[int] = None,
+        size: Optional[Tuple[int, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """size: 결과 bbox 좌표계의 이미지 크기 (기본 pil.size)"""
+        h = phash(pil) if h is None else h
+        pkey = params_key(params)
+        with self._lock:
+            key = self._find(pkey, h)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if key[1] == h:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            entry = self._entries[key]
+            result = copy.deepcopy(entry["result"])
+        return _scale_result(result, entry["size"], size or pil.size)
+
+    def put(
+        self,
+        pil: Image.Image,
+        params: Dict[str, Any],
+        result: Dict[str, Any],
+        h: Optional[int] = None,
+        size: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        h = phash(pil) if h is None else h
+        key = (params_key(params), h)
+        with self._lock:
+            self._entries[key] = {"size": list(size or pil.size), "result": copy.deepcopy(result)}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty += 1
+            flush = self.persist_path is not None and self._dirty >= self.persist_every
+        if flush:
+            self.save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+                "model_version": self.model_version,
+            }
+
+    # ---------- 영속화 ----------
+    def save(self) -> None:
+        if self.persist_path is None:
+            return
+        with self._lock:
+            payload = {
+                "model_version": self.model_version,
+                "entries": [
+                    {"params": k[0], "phash": format(k[1], "016x"), **v} for k, v in self._entries.items()
+                ],
+            }
+            self._dirty = 0
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.persist_path.with_suffix(self.persist_path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, self.persist_path)
+
+    def _load(self) -> None:
+        if not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("[result_cache] 캐시 파일을 읽지 못해 무시: %s", e)
+            return
+        if payload.get("model_version") != self.model_version:
+            logger.info("[result_cache] 모델 버전 변경 → 저장된 캐시 폐기")
+            return
+        for e in payload.get("entries", [])[-self.max_entries:]:
+            self._entries[(e["params"], int(e["phash"], 16))] = {"size": e["size"], "result": e["result"]}
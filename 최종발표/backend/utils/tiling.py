@@ -0,0 +1,79 @@
+"""
+타일(slice) 탐지 보조 함수 — 반찬이 많은 넓은 상차림 사진용
+
+큰 이미지를 960px 한 장으로 줄이면 작은 반찬 그릇이 min_box 아래로 떨어지거나 놓친다.
+타일 모드에서는
+  1) ingest 작업 해상도를 TILE_MAX_SIDE 까지 올리고
+  2) 겹치는 TILE_SIZE 타일들 + 전체 이미지 1장을 YOLO 한 번(batch)에 넣은 뒤
+  3) 타일 내부 경계에 걸린(잘렸을 가능성이 큰) 박스는 버리고 — 겹침 영역 덕분에 작은 그릇은
+     다른 타일에 온전히 들어 있고, 큰 접시는 전체 이미지 pass 가 잡는다
+  4) 나머지를 원본 좌표로 옮겨 boxes.merge (기본 WBF) 로 합친다
+
+자동 전환 (TILE_MODE=auto): 원본이 TILE_MIN_MP 메가픽셀 이상이거나 가로세로 비가 TILE_MIN_ASPECT 이상일 때만.
+보통 사진은 기존 경로 그대로.
+"""
+from __future__ import annotations
+from typing import List, Tuple
+
+import numpy as np
+
+from backend.utils.model_config import (
+    INGEST_MAX_SIDE, TILE_MODE, TILE_MIN_MP, TILE_MIN_ASPECT, TILE_MAX_SIDE,
+)
+
+Box = Tuple[int, int, int, int]
+
+
+def should_tile(w: int, h: int, mode: str = TILE_MODE) -> bool:
+    """원본 크기 (EXIF 회전 후) 기준 타일 모드 사용 여부"""
+    if mode == "on":
+        return True
+    if mode != "auto" or w <= 0 or h <= 0:
+        return False
+    return (w * h) / 1e6 >= TILE_MIN_MP or max(w, h) / min(w, h) >= TILE_MIN_ASPECT
+
+
+def working_max_side(w: int, h: int, mode: str = TILE_MODE) -> int:
+    """ingest 작업 해상도(긴 변). 타일 대상이면 TILE_MAX_SIDE 까지 허용 (0 = 제한 없음)"""
+    if INGEST_MAX_SIDE and should_tile(w, h, mode):
+        return max(INGEST_MAX_SIDE, TILE_MAX_SIDE)
+    return INGEST_MAX_SIDE
+
+
+def _starts(length: int, tile: int, stride: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    out = list(range(0, length - tile, stride))
+    out.append(length - tile)  # 마지막 타일은 이미지 끝에 맞춤
+    return out
+
+
+def make_tiles(W: int, H: int, tile: int, overlap: float) -> List[Box]:
+    """겹치는 정사각 타일 목록 (x1, y1, x2, y2). 이미지가 tile 보다 작은 축은 타일 하나."""
+    tile = max(32, int(tile))
+    stride = max(1, int(tile * (1.0 - overlap)))
+    return [
+        (x, y, min(W, x + tile), min(H, y + tile))
+        for y in _starts(H, tile, stride)
+        for x in _starts(W, tile, stride)
+    ]
+
+
+def drop_edge_boxes(boxes: np.ndarray, tile: Box, W: int, H: int, margin: int = 2) -> np.ndarray:
+    """
+    boxes: 타일 좌표 (N, 6). 이미지 경계가 아닌 타일 경계에 margin 이내로 붙은 박스 제거
+    """
+    if boxes.size == 0:
+        return boxes
+    tx1, ty1, tx2, ty2 = tile
+    tw, th = tx2 - tx1, ty2 - ty1
+    keep = np.ones(len(boxes), dtype=bool)
+    if tx1 > 0:
+        keep &= boxes[:, 0] > margin
+    if ty1 > 0:
+        keep &= boxes[:, 1] > margin
+    if tx2 < W:
+        keep &= boxes[:, 2] < tw - margin
+    if ty2 < H:
+        keep &= boxes[:, 3] < th - margin
+    return boxes[keep]
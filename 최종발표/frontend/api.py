@@ -1,5 +1,7 @@
 
 import os
+import json
+import uuid
 import requests
 from dotenv import load_dotenv
 from typing import Optional
@@ -41,6 +43,11 @@ def _auth(token: Optional[str]):
     return {"Authorization": f"Bearer {token}"} if token else {}
 
 
+def new_idempotency_key() -> str:
+    """업로드 Idempotency-Key (재시도 때 같은 값을 다시 보내야 의미가 있다)"""
+    return uuid.uuid4().hex
+
+
 def _json_or_error(res: requests.Response):
     """
     응답을 JSON으로 파싱해 dict로 반환.
@@ -129,10 +136,13 @@ def upload_food(
     servings: float,
     meal_index: int,
     token: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
 ) -> dict:
     """
     /food/upload 로 멀티파트 폼 업로드.
     백엔드 응답(JSON) 그대로 반환.
+    idempotency_key: 같은 업로드를 다시 보낼 때 같은 값을 주면 서버가 처음 결과를 돌려준다 (중복 기록 없음).
+                     없으면 호출마다 새로 만든다.
     """
     files = {"file": (filename, file_bytes, "image/jpeg")}
     data = {
@@ -140,7 +150,7 @@ def upload_food(
         "meal_index": str(meal_index),
         "servings": str(servings),
     }
-    headers = {}
+    headers = {"Idempotency-Key": idempotency_key or new_idempotency_key()}
     if token:
         headers["Authorization"] = f"Bearer {token}"
 
@@ -149,6 +159,85 @@ def upload_food(
     return r.json()
 
 
+def upload_food_batch(
+    images: list,
+    username: str,
+    token: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    """
+    POST /food/upload/batch — 여러 장을 한 번에.
+    images: [{"bytes", "filename", "meal_index", "servings"}, ...]
+    반환: {"succeeded", "failed", "results": [이미지별 ok / matched / summary 또는 status_code / detail], "today_totals"}
+    """
+    files = [("files", (im["filename"], im["bytes"], "image/jpeg")) for im in images]
+    data = {
+        "username": username,
+        "meal_index": [str(im["meal_index"]) for im in images],
+        "servings": [str(im.get("servings", 1.0)) for im in images],
+    }
+    headers = {"Idempotency-Key": idempotency_key or new_idempotency_key(), **_auth(token)}
+    r = requests.post(f"{BASE}/food/upload/batch", files=files, data=data, headers=headers, timeout=120)
+    r.raise_for_status()
+    return r.json()
+
+
+def upload_food_async(
+    file_bytes: bytes,
+    filename: str,
+    username: str,
+    servings: float,
+    meal_index: int,
+    token: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    """
+    POST /food/upload/async → {"job_id", "status", "deduplicated", "status_url", "events_url"}
+    같은 사진을 다시 보내도 서버가 기존 작업 id 를 돌려주므로 재시도해도 추론이 다시 돌지 않는다.
+    """
+    files = {"file": (filename, file_bytes, "image/jpeg")}
+    data = {
+        "username": username,
+        "meal_index": str(meal_index),
+        "servings": str(servings),
+    }
+    headers = {"Idempotency-Key": idempotency_key or new_idempotency_key(), **_auth(token)}
+    r = requests.post(f"{BASE}/food/upload/async", files=files, data=data, headers=headers, timeout=30)
+    r.raise_for_status()
+    return r.json()
+
+
+def get_upload_job(job_id: str, token: Optional[str] = None) -> dict:
+    """GET /food/jobs/{job_id} → {"status": queued|running|done|failed, "stage", "events", "result", "error"}"""
+    r = requests.get(f"{BASE}/food/jobs/{job_id}", headers=_auth(token), timeout=15)
+    r.raise_for_status()
+    return r.json()
+
+
+def follow_upload_job(job_id: str, token: Optional[str] = None, timeout: float = 300.0):
+    """
+    GET /food/jobs/{job_id}/events (SSE) 를 읽으며 (event, data) 를 차례로 yield.
+    event: "stage" (data = {"stage", "t", ...}) → 마지막에 "done" / "failed" (data = 작업 snapshot)
+    """
+    headers = {"Accept": "text/event-stream", **_auth(token)}
+    with requests.get(f"{BASE}/food/jobs/{job_id}/events", headers=headers, stream=True, timeout=(10, timeout)) as r:
+        r.raise_for_status()
+        event, data = "message", []
+        for line in r.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if line == "":
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith(":"):
+                continue  # keepalive
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+
+
 def get_dashboard(username, token: Optional[str]):
     """GET /dashboard/{username} → dict 또는 {"error": "..."}"""
     url = f"{BASE_URL}/dashboard/{username}"
@@ -186,9 +275,14 @@ def get_weekly_report(
 
 
 __all__ = [
+    "new_idempotency_key",
     "signup",
     "login",
     "upload_food",
+    "upload_food_batch",
+    "upload_food_async",
+    "get_upload_job",
+    "follow_upload_job",
     "get_dashboard",
     "get_recommend",
     "get_weekly_report",
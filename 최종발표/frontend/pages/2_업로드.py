@@ -1,10 +1,12 @@
+import hashlib
 import io
+import time
 from PIL import Image
 import streamlit as st
 
 from state import init_state
 from ui import app_shell, guard_login, page_header
-from api import upload_food
+from api import follow_upload_job, get_upload_job, new_idempotency_key, upload_food_async
 
 init_state()
 st.set_page_config(page_title="업로드칸", page_icon="🍱", layout="centered")
@@ -13,6 +15,17 @@ app_shell("🏠 홈 (업로드)", active="home", show_tabs=True)
 guard_login()
 page_header("📤 음식 업로드")
 
+# async 업로드 작업 단계 → 진행 표시
+STAGE_PROGRESS = {"queued": 0.05, "user": 0.1, "decode": 0.2, "model": 0.3, "detect": 0.4, "match": 0.85}
+STAGE_TEXT = {
+    "queued": "대기 중...",
+    "user": "사용자 확인 중...",
+    "decode": "이미지 읽는 중...",
+    "model": "모델 준비 중...",
+    "detect": "음식 탐지 중...",
+    "match": "영양 정보 매칭 중...",
+}
+
 with st.form("upload_form", clear_on_submit=False):
     file = st.file_uploader("이미지 업로드 (jpg/png)", type=["jpg", "jpeg", "png"])
     servings = st.number_input("인분", min_value=0.1, max_value=10.0, step=0.5, value=1.0)
@@ -35,22 +48,52 @@ if submit:
                 st.warning(f"미리보기 로드 실패: {e}")
 
             
-            with st.spinner("탐지 및 영양 계산 중..."):
-                username = st.session_state.get("username", "demo")
-                token = st.session_state.get("token")
+            username = st.session_state.get("username", "demo")
+            token = st.session_state.get("token")
+            # 같은 사진 · 끼니 · 인분으로 "기록 완료"를 다시 누르면 같은 Idempotency-Key 를 보낸다
+            #   → 서버가 처음 결과를 돌려주고 food_logs 를 중복 기록하지 않는다
+            submit_id = hashlib.sha256(file_bytes).hexdigest() + f"|{meal_map[meal_label]}|{float(servings):g}"
+            idem_keys = st.session_state.setdefault("upload_idempotency_keys", {})
+            idem_key = idem_keys.setdefault(submit_id, new_idempotency_key())
+
+            progress = st.progress(0.0, text="업로드 중...")
+            try:
+                job = upload_food_async(
+                    file_bytes,
+                    file.name,
+                    username,
+                    servings=float(servings),
+                    meal_index=meal_map[meal_label],
+                    token=token,
+                    idempotency_key=idem_key,
+                )
+                final = None
                 try:
-                    resp = upload_food(
-                        file_bytes,         
-                        file.name,
-                        username,
-                        servings=float(servings),
-                        meal_index=meal_map[meal_label],
-                        token=token
-                    )
-                    st.session_state["last_upload_result"] = resp
+                    # SSE 로 단계별 진행 표시
+                    for event, data in follow_upload_job(job["job_id"], token=token):
+                        if event == "stage":
+                            stage = data.get("stage", "")
+                            progress.progress(STAGE_PROGRESS.get(stage, 0.0), text=STAGE_TEXT.get(stage, stage))
+                        elif event in ("done", "failed"):
+                            final = data
+                            break
+                except Exception:
+                    final = None
+                # 스트림이 끊기면 polling 으로 마무리 (작업은 서버에 남아 있으므로 다시 올리지 않는다)
+                while final is None or final.get("status") not in ("done", "failed"):
+                    time.sleep(1.0)
+                    final = get_upload_job(job["job_id"], token=token)
+
+                progress.empty()
+                if final["status"] == "done":
+                    st.session_state["last_upload_result"] = final["result"]
                     st.success("업로드 및 탐지 완료!")
-                except Exception as e:
-                    st.error(f"업로드 실패: {e}")
+                else:
+                    err = final.get("error") or {}
+                    st.error(f"업로드 실패: {err.get('detail', err)}")
+            except Exception as e:
+                progress.empty()
+                st.error(f"업로드 실패: {e}")
 
 
 def render_detected_cards(resp: dict):